@@ -0,0 +1,36 @@
+"""
+HTTP inference API, the counterpart of app.py for programmatic clients:
+
+    python api.py
+    python api.py --host 127.0.0.1 --port 9000
+
+POST /predict takes one image as the raw body or several as multipart/form-data,
+GET /healthz and GET /metrics are for the load balancer and the monitoring.
+"""
+import argparse
+from dataclasses import replace
+from aiohttp import web
+from src.CNNClassifier import logger
+from src.CNNClassifier.config import ConfigurationManager, parse_overrides
+from src.CNNClassifier.serving.http_api import InferenceAPI
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=None, help="overrides serving.host")
+    parser.add_argument("--port", type=int, default=None, help="overrides serving.port")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="ROOT.KEY=VALUE",
+                        help="override any config.yaml or params.yaml value, e.g. config.serving.max_in_flight=64")
+    args = parser.parse_args()
+
+    config = ConfigurationManager(overrides=parse_overrides(args.overrides)).get_serving_config()
+    config = replace(config, host=args.host or config.host, port=args.port or config.port)
+    logger.info(f"serving {config.model_path} on http://{config.host}:{config.port}")
+    web.run_app(InferenceAPI(config).app(), host=config.host, port=config.port, access_log=None)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        raise e
@@ -1,25 +1,69 @@
 import streamlit as st
-from PIL import Image
-import tensorflow as tf
 import numpy as np
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.serving import BatchingPredictor, InferenceEngine, PredictionCache, registry
+from src.CNNClassifier.utils.preprocessing import load_image
 """
 # deep Classifier project
 
 """
-model = tf.keras.models.load_model("C:/Complete_Content/All_Project/fdsdcnnclassifier/artifacts/training/model.h5")
+
+@st.cache_resource
+def get_predictor():
+    # one model, one batching worker and one prediction cache per process, shared by every session;
+    # Streamlit reruns this script on every interaction but not cached resources
+    serving_config = ConfigurationManager().get_serving_config()
+    served = registry.get(
+        serving_config.model_path,
+        warmup_batch_sizes=serving_config.warmup_batch_sizes,
+        warmup_runs=serving_config.warmup_runs
+    )
+    # TTA variants and ensemble members of one request run as a single batched forward pass
+    engine = InferenceEngine.from_config(serving_config)
+    if not engine.is_plain:
+        engine.warm_up(serving_config.warmup_batch_sizes)
+    predictor = BatchingPredictor(
+        predict_fn=engine.predict,
+        max_batch_size=serving_config.max_batch_size,
+        max_wait_ms=serving_config.max_wait_ms,
+        max_queue_size=serving_config.max_queue_size,
+        input_shape=served.input_shape
+    )
+    cache = PredictionCache(
+        serving_config.prediction_cache_path,
+        served.fingerprint,
+        max_memory_bytes=int(serving_config.prediction_cache_memory_mb * 2**20),
+        max_disk_rows=serving_config.prediction_cache_max_rows,
+        key_salt=f"{serving_config.params_preprocessing}:{served.input_shape}:{engine.signature()}"
+    )
+    return served, predictor.start(), cache, serving_config.request_timeout_s
+
+
+served, predictor, cache, request_timeout_s = get_predictor()
 uploaded_file = st.file_uploader("Choose a file")
 if uploaded_file is not None:
     # To read file as bytes:
+    image_bytes = uploaded_file.getvalue()
+
+    def predict():
+        # only decoded on a cache miss; RGB uint8 at the model input size, the batcher
+        # normalizes it together with concurrent uploads
+        img_array = load_image(image_bytes, served.input_shape) # [row, col, channel]
+        return predictor.predict(img_array, timeout=request_timeout_s) # [0.99, 0.01]
 
-    image = Image.open(uploaded_file)
-    img = image.resize((224,224))
-    img_array = np.array(img)
-    img_array = np.expand_dims(img_array, axis=0) # [batch_size, row, col, channel]
-    result = model.predict(img_array) # [[0.99, 0.01], [0.99, 0.01]]
+    result, _ = cache.get_or_compute(image_bytes, predict)
 
-    argmax_index = np.argmax(result, axis=1) # [0, 0]
-    if argmax_index[0] == 0:
-        st.image(image, caption="predicted: cat")
+    argmax_index = np.argmax(result) # 0
+    if argmax_index == 0:
+        st.image(image_bytes, caption="predicted: cat")
     else:
-        st.image(image, caption='predicted: dog')
-        
\ No newline at end of file
+        st.image(image_bytes, caption='predicted: dog')
+
+with st.sidebar.expander("Model"):
+    st.json(served.metrics())
+
+with st.sidebar.expander("Serving metrics"):
+    st.json(predictor.stats.snapshot())
+
+with st.sidebar.expander("Prediction cache"):
+    st.json(cache.stats.snapshot())
@@ -0,0 +1,121 @@
+"""
+Cost of loading the configuration at every stage start.
+
+Each stage script is its own process, so it parses configs/config.yaml and
+params.yaml and builds its config entity from scratch. For every stage
+getter this times, in fresh interpreters, importing the config package,
+constructing the ConfigurationManager and calling the getter. In-process it
+compares the parse the manager did before (`yaml.safe_load`, the pure
+Python loader) with the C loader, and a first ConfigurationManager with one
+served from the cache.
+
+    python benchmarks/config_load.py
+    python benchmarks/config_load.py --repeats 20 --output config_load.json
+
+Run from the directory holding configs/ and params.yaml.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse
+import json
+import subprocess
+import time
+import numpy as np
+import yaml
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+GETTERS = (
+    "get_data_ingestion_config",
+    "get_image_validation_config",
+    "get_data_split_config",
+    "get_prepare_base_model_config",
+    "get_image_cache_config",
+    "get_training_config",
+    "get_validation_config",
+    "get_model_export_config",
+    "get_serving_config",
+    "get_batch_prediction_config",
+)
+STAGE_START = """
+import time
+started = time.perf_counter()
+from src.CNNClassifier.config import ConfigurationManager
+imported = time.perf_counter()
+manager = ConfigurationManager()
+constructed = time.perf_counter()
+manager.{getter}()
+finished = time.perf_counter()
+print(imported - started, constructed - imported, finished - constructed)
+"""
+
+
+def stage_start(getter: str, repeats: int) -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    runs = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", STAGE_START.format(getter=getter)], env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{getter} failed:\n{result.stderr[-2000:]}")
+        runs.append([float(value) * 1000.0 for value in result.stdout.split()[-3:]])
+    import_ms, manager_ms, getter_ms = np.median(runs, axis=0)
+    return {"import_ms": import_ms, "manager_ms": manager_ms, "getter_ms": getter_ms}
+
+
+def timeit(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1000.0
+
+
+def in_process(repeats: int) -> dict:
+    from src.CNNClassifier.config import loader
+    from src.CNNClassifier.config import ConfigurationManager
+    from src.CNNClassifier.constants import CONFIG_FILE_PATH, PARAMS_FILE_PATH
+    texts = [open(path).read() for path in (CONFIG_FILE_PATH, PARAMS_FILE_PATH)]
+
+    def uncached():
+        loader._files.clear()
+        loader._compiled.clear()
+        ConfigurationManager()
+
+    return {
+        "parse_safe_load_ms": timeit(lambda: [yaml.load(text, Loader=yaml.SafeLoader) for text in texts], repeats),
+        "parse_c_loader_ms": timeit(lambda: [yaml.load(text, Loader=loader.YAML_LOADER) for text in texts], repeats),
+        "manager_uncached_ms": timeit(uncached, repeats),
+        "manager_cached_ms": timeit(ConfigurationManager, repeats),
+        "c_loader": hasattr(yaml, "CSafeLoader"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=10, help="fresh interpreters per getter, median counts")
+    parser.add_argument("--output", default=None, help="optional path for a JSON report")
+    args = parser.parse_args()
+
+    results = {"in_process": in_process(max(args.repeats, 50)), "stage_start": {}}
+    process = results["in_process"]
+    print(f"parse both files    safe_load {process['parse_safe_load_ms']:.2f} ms, "
+          f"{'CSafeLoader' if process['c_loader'] else 'SafeLoader (libyaml missing)'} "
+          f"{process['parse_c_loader_ms']:.2f} ms")
+    print(f"ConfigurationManager  first {process['manager_uncached_ms']:.2f} ms, "
+          f"cached {process['manager_cached_ms']:.3f} ms")
+
+    print(f"\n{'stage getter':<32}{'import ms':>10}{'manager ms':>11}{'getter ms':>10}")
+    for getter in GETTERS:
+        result = stage_start(getter, args.repeats)
+        results["stage_start"][getter] = result
+        print(f"{getter:<32}{result['import_ms']:>10.1f}{result['manager_ms']:>11.2f}{result['getter_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
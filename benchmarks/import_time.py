@@ -0,0 +1,115 @@
+"""
+Import-time budget for every pipeline entry point.
+
+Each stage script is launched as its own process by the orchestrator, so the
+imports at the top of the script are paid on every run. This collects those
+imports (without executing the stage), times them in a fresh interpreter with
+`python -X importtime`, and fails when a stage goes over its budget or a stage
+that never needs TensorFlow ends up importing it.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeats 5 --scale 2.0
+
+Exits non-zero on any violation so it can run as a CI check. The TensorFlow
+part, which does not depend on the host's speed, also runs under pytest in
+tests/unit/test_import_time.py.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse
+import ast
+import re
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PIPELINE_DIR = ROOT / "src" / "CNNClassifier" / "pipeline"
+
+# cold-start budget in milliseconds for the imports of each entry point,
+# and whether the entry point may import TensorFlow / Keras at all
+BUDGETS = {
+    "src.CNNClassifier.components": (400, False),
+    "stage_01_data_ingestion.py": (400, False),
+    "stage_02_base_model.py": (8000, True),
+    "stage_03_train.py": (8000, True),
+    "stage_04_eval.py": (8000, True),
+    "stage_05_image_cache.py": (500, False),
+    "stage_06_validate_images.py": (500, False),
+    "stage_07_export_model.py": (500, False),
+    "stage_08_backbone_benchmark.py": (500, False),
+    "stage_09_split_dataset.py": (500, False),
+    "batch_predict.py": (500, False),
+    "launch_local_workers.py": (500, False),
+}
+HEAVY_MODULES = ("tensorflow", "keras")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def entry_point_imports(script: Path) -> str:
+    """
+    Module level import statements of a pipeline script, as source that can
+    be executed without running the stage itself.
+    """
+    text = script.read_text()
+    statements = [ast.get_source_segment(text, node) for node in ast.parse(text).body
+                  if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(statements)
+
+
+def measure(source: str):
+    """
+    Returns:
+        tuple: (total import time in ms, set of imported top-level package names)
+    """
+    env = dict(os.environ, PYTHONPATH=str(ROOT), TF_CPP_MIN_LOG_LEVEL="3")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", source], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import failed:\n{source}\n{result.stderr[-2000:]}")
+
+    total_us, packages = 0, set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, _, _, module = match.groups()
+        total_us += int(self_us)
+        packages.add(module.split(".")[0])
+    return total_us / 1000.0, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3, help="runs per entry point, the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, e.g. for slow CI hosts")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'entry point':<34}{'import ms':>10}{'budget ms':>11}  heavy")
+    for name, (budget_ms, heavy_allowed) in BUDGETS.items():
+        script = PIPELINE_DIR / name
+        source = entry_point_imports(script) if script.suffix == ".py" else f"import {name}"
+        runs = [measure(source) for _ in range(args.repeats)]
+        elapsed_ms = min(ms for ms, _ in runs)
+        heavy = sorted(set().union(*(packages for _, packages in runs)) & set(HEAVY_MODULES))
+        budget_ms *= args.scale
+
+        status = []
+        if elapsed_ms > budget_ms:
+            status.append(f"over budget by {elapsed_ms - budget_ms:.0f} ms")
+        if heavy and not heavy_allowed:
+            status.append(f"imports {', '.join(heavy)}")
+        if status:
+            failures.append(f"{name}: {'; '.join(status)}")
+        print(f"{name:<34}{elapsed_ms:>10.0f}{budget_ms:>11.0f}  {','.join(heavy) or '-'}"
+              f"{'  FAIL' if status else ''}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
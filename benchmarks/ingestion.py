@@ -0,0 +1,114 @@
+"""
+Data ingestion against a local HTTP stand-in and a synthetic zip.
+
+Serves a generated PetImages-style archive from a local HTTP server that
+honours Range requests and drops the first connection half way, so the
+run exercises resume, the size/sha256 check, parallel extraction and the
+manifest-based skip on a second pass.
+
+    python benchmarks/ingestion.py --files 5000 --workers 8
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse
+import hashlib
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+from src.CNNClassifier.entity import DataIngestionConfig
+from src.CNNClassifier.components.stage_01_data_ingestion import DataIngestion
+
+
+def make_zip(path: Path, num_files: int, file_size: int):
+    payload = os.urandom(file_size)
+    with ZipFile(path, "w") as zf:
+        for i in range(num_files):
+            class_name = "Cat" if i % 2 else "Dog"
+            # random bytes do not compress, like JPEGs; store most, deflate a few
+            compression = ZIP_DEFLATED if i % 10 == 0 else ZIP_STORED
+            zf.writestr(f"PetImages/{class_name}/{i}.jpg", payload[i % 97:] + payload[:i % 97],
+                        compress_type=compression)
+        zf.writestr("PetImages/Cat/Thumbs.db", b"not an image")
+        zf.writestr("readme[1].txt", b"license")
+
+
+def make_handler(blob: bytes, fail_after: int):
+    state = {"failed": False}
+
+    class RangeHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            start = 0
+            match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+            if match:
+                start = int(match.group(1))
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(blob) - 1}/{len(blob)}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(blob) - start))
+            self.end_headers()
+            end = len(blob)
+            if not state["failed"]:
+                state["failed"] = True
+                end = min(end, start + fail_after)
+            self.wfile.write(blob[start:end])
+
+    return RangeHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-size", type=int, default=30_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = tmp / "source.zip"
+        make_zip(source, args.files, args.file_size)
+        blob = source.read_bytes()
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(blob, fail_after=len(blob) // 2))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        config = DataIngestionConfig(
+            root_dir=tmp / "ingestion",
+            source_url=f"http://127.0.0.1:{server.server_port}/data.zip",
+            local_data_file=tmp / "ingestion" / "data.zip",
+            unzip_dir=tmp / "ingestion",
+            source_sha256=hashlib.sha256(blob).hexdigest(),
+            num_workers=args.workers,
+            max_retries=3
+        )
+        ingestion = DataIngestion(config)
+
+        started = time.perf_counter()
+        ingestion.download_file()
+        download_s = time.perf_counter() - started
+        started = time.perf_counter()
+        ingestion.unzip_and_clean()
+        extract_s = time.perf_counter() - started
+        started = time.perf_counter()
+        ingestion.download_file()
+        ingestion.unzip_and_clean()
+        rerun_s = time.perf_counter() - started
+        server.shutdown()
+
+        extracted = sorted(p for p in (tmp / "ingestion" / "PetImages").rglob("*") if p.is_file())
+        assert len(extracted) == args.files, f"expected {args.files} images, found {len(extracted)}"
+        print(f"archive:      {len(blob) / 1e6:.1f} MB, {args.files} images")
+        print(f"download:     {download_s:.2f}s ({len(blob) / 1e6 / download_s:.1f} MB/s, one forced resume)")
+        print(f"extract:      {extract_s:.2f}s ({args.files / extract_s:.0f} files/s, {args.workers} workers)")
+        print(f"second pass:  {rerun_s:.3f}s (skipped via download meta and manifest)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Closed-loop load test of the HTTP inference API (api.py).
+
+For each concurrency level, that many clients send POST /predict back to
+back for `--duration` seconds (or `--requests` in total) and the throughput,
+p50/p99 latency, errors and 503s shed by backpressure are reported. The
+images are synthetic JPEGs; requests carry `Cache-Control: no-cache` so the
+model does the work, unless `--use-cache` is given.
+
+    python api.py &
+    python benchmarks/load_test.py --url http://127.0.0.1:8080
+    python benchmarks/load_test.py --spawn --concurrency 1 8 32 --duration 10 --images-per-request 4
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse
+import asyncio
+import io
+import json
+import subprocess
+import time
+import numpy as np
+from aiohttp import ClientSession, ClientTimeout, FormData
+from PIL import Image
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def synthetic_jpegs(count: int, size: int) -> list:
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(buffer, format="JPEG")
+        images.append(buffer.getvalue())
+    return images
+
+
+def request_body(images: list, offset: int, per_request: int):
+    chosen = [images[(offset + i) % len(images)] for i in range(per_request)]
+    if per_request == 1:
+        return chosen[0], {"Content-Type": "image/jpeg"}
+    form = FormData()
+    for index, image in enumerate(chosen):
+        form.add_field("image", image, filename=f"image_{index}.jpg", content_type="image/jpeg")
+    return form, {}
+
+
+async def wait_until_healthy(url: str, timeout_s: float):
+    deadline = time.perf_counter() + timeout_s
+    async with ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(f"{url}/healthz") as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"{url} did not become healthy within {timeout_s:.0f}s")
+
+
+async def run_level(url: str, concurrency: int, images: list, args) -> dict:
+    latencies, statuses = [], {}
+    issued = 0
+    headers = {} if args.use_cache else {"Cache-Control": "no-cache"}
+    deadline = time.perf_counter() + args.duration
+
+    def more():
+        return issued < args.requests if args.requests else time.perf_counter() < deadline
+
+    async def client(session):
+        nonlocal issued
+        while more():
+            offset = issued * args.images_per_request
+            issued += 1
+            body, content_headers = request_body(images, offset, args.images_per_request)
+            started = time.perf_counter()
+            try:
+                async with session.post(f"{url}/predict", data=body, headers={**headers, **content_headers}) as response:
+                    await response.read()
+                    status = response.status
+            except (OSError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with ClientSession(timeout=ClientTimeout(total=args.timeout)) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.get(200, 0)
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return {
+        "concurrency": concurrency,
+        "requests": sum(statuses.values()),
+        "rps": ok / elapsed,
+        "images_per_s": ok * args.images_per_request / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)) if ok else None,
+        "p99_ms": float(np.percentile(latencies_ms, 99)) if ok else None,
+        "shed_503": statuses.get(503, 0),
+        "errors": sum(count for status, count in statuses.items() if status not in (200, 503)),
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+async def run(args) -> list:
+    images = synthetic_jpegs(args.distinct_images, args.image_size)
+    await wait_until_healthy(args.url, args.startup_timeout)
+    results = []
+    print(f"{'clients':>8}{'requests':>10}{'req/s':>9}{'img/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'503':>7}{'errors':>8}")
+    for concurrency in args.concurrency:
+        result = await run_level(args.url, concurrency, images, args)
+        results.append(result)
+        p50 = f"{result['p50_ms']:.1f}" if result["p50_ms"] is not None else "-"
+        p99 = f"{result['p99_ms']:.1f}" if result["p99_ms"] is not None else "-"
+        print(f"{concurrency:>8}{result['requests']:>10}{result['rps']:>9.1f}{result['images_per_s']:>9.1f}"
+              f"{p50:>9}{p99:>9}{result['shed_503']:>7}{result['errors']:>8}")
+    async with ClientSession() as session:
+        async with session.get(f"{args.url}/metrics", params={"format": "json"}) as response:
+            batcher = (await response.json())["batcher"]
+    print(f"server batcher: {json.dumps(batcher)}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--spawn", action="store_true", help="start api.py for the test and stop it afterwards")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--requests", type=int, default=0, help="requests per level instead of --duration")
+    parser.add_argument("--images-per-request", type=int, default=1)
+    parser.add_argument("--image-size", type=int, default=224, help="side of the synthetic JPEGs")
+    parser.add_argument("--distinct-images", type=int, default=64)
+    parser.add_argument("--use-cache", action="store_true", help="let the server answer repeats from its cache")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request, seconds")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="optional path for a JSON report")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        port = args.url.rsplit(":", 1)[-1].split("/")[0]
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "api.py"), "--host", "127.0.0.1",
+                                   "--port", port])
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "images_per_request": args.images_per_request,
+                       "use_cache": args.use_cache, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Training steps/sec and final accuracy per performance mode.
+
+Trains the stage_02 model (VGG16 backbone, frozen, with the Flatten/Dense
+head) on a fixed synthetic two-class dataset under each combination of
+JIT_COMPILE and MIXED_PRECISION. The images are normalized with the
+pipeline's PREPROCESSING and the backbone has the ImageNet weights the
+pipeline starts from, so reduced precision sees real activation ranges;
+with `--weights none` only the timings are meaningful, a random backbone
+maps [0, 1] inputs to near-constant features. Every mode runs in a fresh
+process so XLA caches and dtype policies do not leak between modes. The first epoch, which
+includes tracing and XLA compilation, is reported separately from the
+steady-state steps/sec.
+
+    python benchmarks/performance_modes.py
+    python benchmarks/performance_modes.py --modes float32 xla_bf16 --threads 8
+    python benchmarks/performance_modes.py --weights none --preprocessing vgg16
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse
+import json
+import multiprocessing
+import time
+import numpy as np
+
+MODES = {
+    "float32": (False, "float32"),
+    "xla": (True, "float32"),
+    "bf16": (False, "mixed_bfloat16"),
+    "xla_bf16": (True, "mixed_bfloat16"),
+    "fp16": (False, "mixed_float16"),
+}
+
+
+def make_dataset(samples: int, image_size: int, preprocessing: str, seed: int = 0):
+    # class 1 images are brighter; raw uint8 pixels go through the same preprocess_batch as the
+    # training pipeline, so every mode sees the input range it sees in a real run
+    from src.CNNClassifier.utils.preprocessing import preprocess_batch
+
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 2, size=samples)
+    pixels = rng.integers(0, 150, size=(samples, image_size, image_size, 3), dtype=np.uint8)
+    pixels[labels == 1] += 100
+    images = preprocess_batch(pixels, (image_size, image_size), preprocessing)
+    return images, np.eye(2, dtype=np.float32)[labels]
+
+
+def run_mode(mode, args):
+    import tensorflow as tf
+    from src.CNNClassifier.entity import PerformanceConfig
+    from src.CNNClassifier.components.performance import configure_threads, prepare_for_training
+    from src.CNNClassifier.components.stage_02_prepare_base_model import PrepareBaseModel
+
+    jit_compile, precision = MODES[mode]
+    performance = PerformanceConfig(params_jit_compile=jit_compile, params_mixed_precision=precision,
+                                    params_intra_op_threads=args.threads, params_inter_op_threads=min(2, args.threads))
+    configure_threads(performance)
+    tf.keras.utils.set_random_seed(0)
+
+    images, labels = make_dataset(args.samples, args.image_size, args.preprocessing)
+    split = int(0.8 * len(images))
+    backbone = tf.keras.applications.vgg16.VGG16(
+        input_shape=(args.image_size, args.image_size, 3),
+        weights=None if args.weights == "none" else args.weights, include_top=False
+    )
+    model = PrepareBaseModel.prepare_full_model(model=backbone, classes=2, freeze_all=not args.train_backbone,
+                                                freeze_till=None, learning_rate=args.learning_rate)
+    model = prepare_for_training(model, performance)
+
+    epoch_times = []
+
+    class EpochTimer(tf.keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.started = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            self.last_batch_end = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            # up to the last training step, so the validation pass is not counted
+            epoch_times.append(self.last_batch_end - self.started)
+
+    history = model.fit(images[:split], labels[:split], batch_size=args.batch_size, epochs=args.epochs,
+                        validation_data=(images[split:], labels[split:]), callbacks=[EpochTimer()],
+                        shuffle=True, verbose=0)
+    steps = split // args.batch_size + (split % args.batch_size > 0)
+    steady = epoch_times[1:] or epoch_times
+    return {
+        "mode": mode,
+        "jit_compile": jit_compile,
+        "mixed_precision": precision,
+        "first_epoch_s": epoch_times[0],
+        "steps_per_sec": steps * len(steady) / sum(steady),
+        "val_accuracy": float(history.history["val_accuracy"][-1]),
+        "val_loss": float(history.history["val_loss"][-1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--samples", type=int, default=512)
+    parser.add_argument("--image-size", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--preprocessing", default="rescale", choices=["rescale", "vgg16"],
+                        help="PREPROCESSING mode applied to the synthetic pixels")
+    parser.add_argument("--weights", default="imagenet", help="backbone weights, imagenet, a file, or none")
+    parser.add_argument("--train-backbone", action="store_true",
+                        help="train every layer instead of only the head, as a compute-heavier workload")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 lets TensorFlow decide")
+    parser.add_argument("--output", default=None, help="optional path for a JSON report")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for mode in args.modes:
+            results.append(pool.apply(run_mode, (mode, args)))
+
+    baseline = next((r for r in results if r["mode"] == "float32"), results[0])
+    print(f"{'mode':<10}{'first epoch s':>15}{'steps/sec':>11}{'speedup':>9}{'val acc':>9}{'val loss':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['first_epoch_s']:>15.2f}{r['steps_per_sec']:>11.2f}"
+              f"{r['steps_per_sec'] / baseline['steps_per_sec']:>8.2f}x{r['val_accuracy']:>9.3f}{r['val_loss']:>10.4f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
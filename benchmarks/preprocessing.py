@@ -0,0 +1,101 @@
+"""
+Per-batch cost of the shared preprocessing in utils/preprocessing.py.
+
+Compares, for each batch size and PREPROCESSING mode, the per-image Python
+loop the stages used before (convert each image to float32 and scale it on
+its own, then stack) against `normalize_batch` on a uint8 batch, in place on
+the float32 batches ImageDataGenerator yields, and `normalize_tensor` as used
+inside tf.data. A second table compares resizing a decoded batch per image
+with PIL against one `resize_batch` call. Results of every path are checked
+against the loop before timing.
+
+    python benchmarks/preprocessing.py
+    python benchmarks/preprocessing.py --batch-sizes 32 256 --image-size 224 --repeats 50
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse
+import json
+import time
+import numpy as np
+from PIL import Image
+from src.CNNClassifier.utils.preprocessing import (PREPROCESSING_MODES, VGG16_MEAN_BGR, normalize_batch,
+                                                   normalize_tensor, resize_batch)
+
+
+def per_image_loop(batch, mode):
+    if mode == "rescale":
+        return np.stack([np.asarray(image, dtype=np.float32) * (1. / 255) for image in batch])
+    return np.stack([np.asarray(image, dtype=np.float32)[..., ::-1] - VGG16_MEAN_BGR for image in batch])
+
+
+def timeit(fn, repeats):
+    fn()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 32, 128])
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--source-size", type=int, default=375, help="decoded size before the resize comparison")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=None, help="optional path for a JSON report")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    size = (args.image_size, args.image_size)
+    results = []
+    print(f"{'mode':<9}{'batch':>6}{'path':>25}{'ms/batch':>11}{'us/image':>10}{'speedup':>9}")
+    for batch_size in args.batch_sizes:
+        pixels = rng.integers(0, 256, size=(batch_size,) + size + (3,), dtype=np.uint8)
+        for mode in PREPROCESSING_MODES:
+            reference = per_image_loop(pixels, mode)
+            generator_batch = pixels.astype(np.float32)
+            paths = {
+                "per_image_loop": lambda: per_image_loop(pixels, mode),
+                "normalize_batch": lambda: normalize_batch(pixels, mode),
+                # ImageDataGenerator hands over a fresh float32 batch each step; copyto stands in for it
+                "normalize_batch_inplace": lambda: normalize_batch(
+                    np.copyto(generator_batch, pixels) or generator_batch, mode, out=generator_batch),
+                "normalize_tensor": lambda: normalize_tensor(pixels, mode).numpy(),
+            }
+            for name, fn in paths.items():
+                np.testing.assert_allclose(fn(), reference, rtol=1e-6, atol=1e-4)
+            loop_ms = None
+            for name, fn in paths.items():
+                ms = timeit(fn, args.repeats)
+                loop_ms = loop_ms or ms
+                results.append({"kind": "normalize", "mode": mode, "batch_size": batch_size, "path": name, "ms": ms})
+                print(f"{mode:<9}{batch_size:>6}{name:>25}{ms:>11.3f}{ms * 1000.0 / batch_size:>10.1f}"
+                      f"{loop_ms / ms:>8.2f}x")
+
+    print(f"\nresize {args.source_size}x{args.source_size} -> {args.image_size}x{args.image_size}")
+    print(f"{'batch':>6}{'path':>25}{'ms/batch':>11}{'us/image':>10}{'speedup':>9}")
+    for batch_size in args.batch_sizes:
+        decoded = rng.integers(0, 256, size=(batch_size, args.source_size, args.source_size, 3), dtype=np.uint8)
+        paths = {
+            "pil_per_image": lambda: np.stack([
+                np.asarray(Image.fromarray(image).resize(size[::-1], Image.BILINEAR)) for image in decoded]),
+            "resize_batch": lambda: resize_batch(decoded, size),
+        }
+        loop_ms = None
+        for name, fn in paths.items():
+            ms = timeit(fn, args.repeats)
+            loop_ms = loop_ms or ms
+            results.append({"kind": "resize", "batch_size": batch_size, "path": name, "ms": ms})
+            print(f"{batch_size:>6}{name:>25}{ms:>11.3f}{ms * 1000.0 / batch_size:>10.1f}{loop_ms / ms:>8.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
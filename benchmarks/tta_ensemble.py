@@ -0,0 +1,142 @@
+"""
+Latency/accuracy trade-off of test-time augmentation and ensembling.
+
+Loads the images the evaluation stage scores, the held-out test subset of
+the split index, and predicts them under every combination of member and
+TTA variant budgets with the InferenceEngine: variants expanded in-graph
+and all members run over the one shared batch. For each combination it
+also times the naive way, one `predict_on_batch` per member and variant,
+so the gain of batched execution shows next to the accuracy gain.
+
+    python benchmarks/tta_ensemble.py
+    python benchmarks/tta_ensemble.py --members artifacts/training/model.h5 artifacts/sweep/trial_*/model.h5 \\
+        --variants identity hflip center_crop --batch-size 16 --output tta_ensemble.json
+
+Run from the directory holding configs/ and params.yaml, after the training stage.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse
+import json
+import time
+import numpy as np
+
+
+def load_evaluation_data(manager, max_samples: int):
+    from src.CNNClassifier.components.stage_04_evaluate import Evaluation
+
+    evaluation = Evaluation(manager.get_validation_config())
+    evaluation.valid_generator()
+    generator = evaluation.valid_generator
+    images, labels = [], []
+    for i in range(len(generator)):
+        batch_images, batch_labels = generator[i]
+        images.append(np.array(batch_images, dtype=np.float32))
+        labels.append(np.asarray(batch_labels))
+        if sum(len(batch) for batch in images) >= max_samples:
+            break
+    return (np.concatenate(images)[:max_samples], np.concatenate(labels)[:max_samples],
+            Evaluation.class_names(generator))
+
+
+def score(predict, images, labels, class_names, batch_size: int, repeats: int) -> dict:
+    from src.CNNClassifier.utils.metrics import StreamingClassificationMetrics
+
+    predict(images[:batch_size])  # tracing and first-call allocations
+    metrics = StreamingClassificationMetrics(num_classes=labels.shape[-1], class_names=class_names)
+    batch_ms = []
+    for repeat in range(repeats):
+        for start in range(0, len(images), batch_size):
+            started = time.perf_counter()
+            probabilities = predict(images[start:start + batch_size])
+            batch_ms.append((time.perf_counter() - started) * 1000.0)
+            if repeat == 0:
+                metrics.update(labels[start:start + batch_size], probabilities)
+    result = metrics.result()
+    return {
+        "accuracy": result["accuracy"],
+        "macro_f1": result["macro_f1"],
+        "loss": result["loss"],
+        "p50_batch_ms": float(np.percentile(batch_ms, 50)),
+        "p99_batch_ms": float(np.percentile(batch_ms, 99)),
+        "images_per_sec": len(images) * repeats / (sum(batch_ms) / 1000.0),
+    }
+
+
+def naive_predict(engines):
+    # what stacking TTA and ensembling on a plain predict looks like: one forward pass per member and variant
+    return lambda batch: np.mean([engine.predict(batch) for engine in engines], axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", nargs="+", default=None,
+                        help="model files, defaults to serving.ensemble_members")
+    parser.add_argument("--variants", nargs="+", default=["identity", "hflip", "center_crop", "crop_top_left",
+                                                          "crop_bottom_right"])
+    parser.add_argument("--variant-budgets", type=int, nargs="+", default=None,
+                        help="numbers of variants to try, defaults to 1, 2 and all")
+    parser.add_argument("--member-budgets", type=int, nargs="+", default=None,
+                        help="numbers of members to try, defaults to 1 and all")
+    parser.add_argument("--reduce", default=None, help="mean or geometric_mean, defaults to serving.ensemble_reduce")
+    parser.add_argument("--samples", type=int, default=512, help="at most this many evaluation images")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the images for the latency figures")
+    parser.add_argument("--no-naive", action="store_true", help="skip the one-pass-per-member-and-variant baseline")
+    parser.add_argument("--output", default=None, help="optional path for a JSON report")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    from src.CNNClassifier.config import ConfigurationManager
+    from src.CNNClassifier.serving.ensemble import InferenceEngine
+
+    manager = ConfigurationManager()
+    serving = manager.get_serving_config()
+    member_paths = args.members or [str(path) for path in serving.ensemble_members]
+    reduction = args.reduce or serving.ensemble_reduce
+    models = [tf.keras.models.load_model(path, compile=False) for path in member_paths]
+    images, labels, class_names = load_evaluation_data(manager, args.samples)
+    print(f"{len(images)} evaluation images, {len(models)} member(s), variants {', '.join(args.variants)}")
+
+    # evaluation batches are normalized already, so the engines take model inputs
+    engine = InferenceEngine(models, variants=args.variants, crop_fraction=serving.tta_crop_fraction,
+                             reduction=reduction, max_rows=serving.ensemble_max_rows)
+    variant_budgets = args.variant_budgets or sorted({1, min(2, len(args.variants)), len(args.variants)})
+    member_budgets = args.member_budgets or sorted({1, len(models)})
+
+    # one single-variant engine per member and variant, shared by every budget so each traces once
+    singles = {(member, variant): InferenceEngine([models[member]], variants=[variant],
+                                                  crop_fraction=serving.tta_crop_fraction)
+               for member in range(len(models)) for variant in args.variants}
+    results = []
+    for num_members in member_budgets:
+        for num_variants in variant_budgets:
+            result = {"members": num_members, "variants": num_variants}
+            result["engine"] = score(lambda batch: engine.predict(batch, num_variants, num_members),
+                                     images, labels, class_names, args.batch_size, args.repeats)
+            if not args.no_naive and num_members * num_variants > 1:
+                engines = [singles[member, variant] for member in range(num_members)
+                           for variant in args.variants[:num_variants]]
+                result["naive"] = score(naive_predict(engines), images, labels, class_names,
+                                        args.batch_size, args.repeats)
+            results.append(result)
+
+    baseline = results[0]["engine"]
+    print(f"\n{'members':>7}{'variants':>9}{'accuracy':>10}{'macro F1':>10}{'loss':>8}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'images/s':>10}{'x latency':>10}{'naive p50':>11}")
+    for result in results:
+        r = result["engine"]
+        naive = f"{result['naive']['p50_batch_ms']:>11.1f}" if "naive" in result else f"{'-':>11}"
+        print(f"{result['members']:>7}{result['variants']:>9}{r['accuracy']:>10.4f}{r['macro_f1']:>10.4f}"
+              f"{r['loss']:>8.4f}{r['p50_batch_ms']:>9.1f}{r['p99_batch_ms']:>9.1f}{r['images_per_sec']:>10.1f}"
+              f"{r['p50_batch_ms'] / baseline['p50_batch_ms']:>9.2f}x{naive}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"members": member_paths, "variants": args.variants, "reduction": reduction,
+                       "samples": int(len(images)), "batch_size": args.batch_size, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
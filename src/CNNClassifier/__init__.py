@@ -8,13 +8,25 @@ log_dir = "logs"
 
 log_filepath = os.path.join(log_dir,"running_logs.log")
 
-os.makedirs(log_dir, exist_ok=True)
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    FileHandler that creates the log directory and opens the file on the
+    first record instead of at import time.
+    """
+    def __init__(self, filename, mode="a", encoding=None):
+        super().__init__(filename, mode=mode, encoding=encoding, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
 
 logging.basicConfig(
     level=logging.INFO,
     format=logging_str,
     handlers=[
-        logging.FileHandler(log_filepath),
+        LazyFileHandler(log_filepath),
         logging.StreamHandler(sys.stdout)
     ]
 )
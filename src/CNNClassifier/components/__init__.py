@@ -1,7 +1,35 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
-from src.CNNClassifier.components.stage_01_data_ingestion import DataIngestion 
-from src.CNNClassifier.components.stage_02_prepare_base_model import PrepareBaseModel
-from src.CNNClassifier.components.stage_03_train import Training
-from src.CNNClassifier.components.stage_04_evaluate import Evaluation
\ No newline at end of file
+import importlib
+
+# Stage modules are imported on first attribute access (PEP 562) so that a stage
+# which never touches TensorFlow, e.g. data ingestion, does not pay for loading it.
+_COMPONENTS = {
+    "DataIngestion": "stage_01_data_ingestion",
+    "PrepareBaseModel": "stage_02_prepare_base_model",
+    "Training": "stage_03_train",
+    "Evaluation": "stage_04_evaluate",
+    "ImageCache": "stage_05_image_cache",
+    "ImageValidation": "stage_06_validate_images",
+    "ModelExport": "stage_07_export_model",
+    "BackboneBenchmark": "stage_08_backbone_benchmark",
+    "DatasetSplit": "stage_09_split_dataset",
+    "HyperparameterSweep": "sweep",
+    "BatchPrediction": "batch_prediction",
+}
+
+__all__ = list(_COMPONENTS)
+
+
+def __getattr__(name):
+    if name not in _COMPONENTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{_COMPONENTS[name]}")
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
\ No newline at end of file
@@ -0,0 +1,292 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import csv
+import hashlib
+import json
+import multiprocessing
+import time
+from collections import deque
+from pathlib import Path
+from typing import List
+from zipfile import ZipFile, is_zipfile
+import numpy as np
+from tqdm import tqdm
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import BatchPredictionConfig
+from src.CNNClassifier.utils.dataset import IMAGE_EXTENSIONS
+from src.CNNClassifier.utils.preprocessing import load_image, normalize_batch
+
+CHECKPOINT_VERSION = 1
+
+# per worker process, opened once by _init_worker
+_archive = None
+_source_dir = None
+
+
+def list_source_images(source: Path) -> List[str]:
+    """
+    Args:
+        source (Path): A directory tree or a zip archive
+
+    Returns:
+        list: Sorted image paths relative to the directory, or member names of the archive
+    """
+    source = Path(source)
+    if source.is_dir():
+        names = []
+        for root, _, filenames in os.walk(source):
+            for filename in filenames:
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    names.append(os.path.relpath(os.path.join(root, filename), source))
+        return sorted(names)
+    if is_zipfile(source):
+        with ZipFile(source) as zf:
+            return sorted(info.filename for info in zf.infolist()
+                          if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS))
+    raise ValueError(f"{source} is neither a directory nor a zip archive")
+
+
+def _init_worker(source):
+    global _archive, _source_dir
+    if os.path.isdir(source):
+        _source_dir = source
+    else:
+        _archive = ZipFile(source)
+
+
+def decode_chunk(names, image_size):
+    # runs in a worker process; uint8 keeps the pickled chunk 4x smaller than float32
+    height, width = image_size[:2]
+    images = np.zeros((len(names), height, width, 3), dtype=np.uint8)
+    errors = [None] * len(names)
+    for i, name in enumerate(names):
+        try:
+            source = _archive.read(name) if _archive is not None else os.path.join(_source_dir, name)
+            images[i] = load_image(source, image_size)
+        except Exception as e:
+            errors[i] = f"{type(e).__name__}: {e}"
+    return images, errors
+
+
+class CsvPredictionWriter:
+    """
+    Appends rows to one CSV file. The committed position is a byte offset, so
+    rows written after the last checkpoint are truncated away on resume.
+    """
+    def __init__(self, path: Path, columns: List[str], position: int = 0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "a+", newline="")
+        self.file.truncate(position)
+        self.file.seek(position)
+        self.writer = csv.writer(self.file)
+        if position == 0:
+            self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def commit(self) -> int:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetPredictionWriter:
+    """
+    Buffers rows and writes one part file per commit into a directory, the
+    committed position is the number of parts. Needs pyarrow or fastparquet.
+    """
+    def __init__(self, path: Path, columns: List[str], position: int = 0):
+        import pandas as pd
+
+        self.pd = pd
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.columns = columns
+        self.parts = position
+        self.rows = []
+        for stale in self.path.glob("part-*.parquet"):
+            if int(stale.stem.split("-")[1]) >= position:
+                stale.unlink()
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+    def commit(self) -> int:
+        if self.rows:
+            part = self.path / f"part-{self.parts:05d}.parquet"
+            tmp = part.with_suffix(".tmp")
+            self.pd.DataFrame(self.rows, columns=self.columns).to_parquet(tmp, index=False)
+            os.replace(tmp, part)
+            self.parts += 1
+            self.rows = []
+        return self.parts
+
+    def close(self):
+        pass
+
+
+class BatchPrediction:
+    def __init__(self, config: BatchPredictionConfig, model=None):
+        self.config = config
+        self.model = model
+
+    @property
+    def columns(self):
+        return ["path", "predicted_class", "confidence"] + \
+            [f"prob_{name}" for name in self.config.class_names] + ["error"]
+
+    def job_fingerprint(self, names):
+        # a different listing, output or model invalidates the checkpoint
+        model_stat = os.stat(self.config.model_path)
+        digest = hashlib.sha256()
+        for name in names:
+            digest.update(name.encode())
+            digest.update(b"\0")
+        digest.update(json.dumps({
+            "source": str(Path(self.config.source).resolve()),
+            "output": str(Path(self.config.output_path).resolve()),
+            "model": [model_stat.st_size, model_stat.st_mtime_ns],
+            "image_size": list(self.config.params_image_size[:2]),
+            "preprocessing": self.config.params_preprocessing,
+            "chunk_size": self.config.chunk_size,
+        }, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def load_checkpoint(self, fingerprint):
+        path = Path(self.config.checkpoint_path)
+        if path.exists():
+            with open(path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("version") == CHECKPOINT_VERSION and checkpoint.get("fingerprint") == fingerprint:
+                return checkpoint
+            logger.info(f"{path} belongs to a different job, starting over")
+        return {"version": CHECKPOINT_VERSION, "fingerprint": fingerprint, "chunks_done": 0,
+                "images_done": 0, "failed": 0, "position": 0, "complete": False}
+
+    def save_checkpoint(self, checkpoint):
+        path = Path(self.config.checkpoint_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(f"{path}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f, indent=4)
+        os.replace(tmp, path)
+
+    def open_writer(self, position):
+        if str(self.config.output_path).endswith(".parquet"):
+            return ParquetPredictionWriter(self.config.output_path, self.columns, position)
+        return CsvPredictionWriter(self.config.output_path, self.columns, position)
+
+    def load_model(self):
+        import tensorflow as tf
+        from src.CNNClassifier.components.performance import configure_threads
+
+        if self.model is None:
+            configure_threads(self.config.performance)
+            self.model = tf.keras.models.load_model(self.config.model_path, compile=False)
+        return self.model
+
+    def predict_rows(self, names, images, errors):
+        valid = np.array([error is None for error in errors])
+        probabilities = np.full((len(names), len(self.config.class_names)), np.nan, dtype=np.float32)
+        if valid.any():
+            batch = normalize_batch(images[valid], self.config.params_preprocessing)
+            probabilities[valid] = np.asarray(self.model.predict_on_batch(batch), dtype=np.float32)
+        rows = []
+        for name, probs, error in zip(names, probabilities, errors):
+            if error is None:
+                label = int(np.argmax(probs))
+                rows.append([name, self.config.class_names[label], float(probs[label])] +
+                            [float(p) for p in probs] + [""])
+            else:
+                rows.append([name, "", ""] + [""] * len(probs) + [error])
+        return rows
+
+    def run(self) -> dict:
+        """
+        Score every image under `config.source`. Workers decode and resize
+        chunks while the main process predicts; at most `max_pending_chunks`
+        decoded chunks are in flight. Output and checkpoint are committed
+        together every `checkpoint_every_batches` batches, so a rerun of an
+        interrupted job continues from the last commit.
+
+        Returns:
+            dict: Images scored, decode failures and throughput of this run
+        """
+        config = self.config
+        names = list_source_images(config.source)
+        if not names:
+            logger.warning(f"no images found under {config.source}")
+            return {"images": 0, "failed": 0, "images_per_sec": 0.0}
+        chunks = [names[i:i + config.chunk_size] for i in range(0, len(names), config.chunk_size)]
+        checkpoint = self.load_checkpoint(self.job_fingerprint(names))
+        if checkpoint["complete"]:
+            logger.info(f"{config.output_path} already holds predictions for all {len(names)} images, skipping")
+            return {"images": 0, "failed": 0, "images_per_sec": 0.0}
+        if checkpoint["chunks_done"]:
+            logger.info(f"resuming after {checkpoint['images_done']} of {len(names)} images")
+
+        self.load_model()
+        writer = self.open_writer(checkpoint["position"])
+        next_chunk = checkpoint["chunks_done"]
+        scored, failed, batches = 0, 0, 0
+        started = time.perf_counter()
+        context = multiprocessing.get_context("spawn")
+        try:
+            with context.Pool(processes=config.num_workers, initializer=_init_worker,
+                              initargs=(str(config.source),)) as pool, \
+                    tqdm(total=len(names), initial=checkpoint["images_done"], unit="img", desc="predict") as progress:
+                pending = deque()
+
+                def submit():
+                    nonlocal next_chunk
+                    while next_chunk < len(chunks) and len(pending) < config.max_pending_chunks:
+                        pending.append((next_chunk, pool.apply_async(
+                            decode_chunk, (chunks[next_chunk], config.params_image_size))))
+                        next_chunk += 1
+
+                submit()
+                batch_names, batch_images, batch_errors = [], [], []
+                while pending:
+                    chunk_index, result = pending.popleft()
+                    images, errors = result.get()
+                    submit()
+                    batch_names.extend(chunks[chunk_index])
+                    batch_images.append(images)
+                    batch_errors.extend(errors)
+                    if len(batch_names) < config.batch_size and pending:
+                        continue
+
+                    writer.write(self.predict_rows(batch_names, np.concatenate(batch_images), batch_errors))
+                    batch_failed = sum(error is not None for error in batch_errors)
+                    scored += len(batch_names)
+                    failed += batch_failed
+                    batches += 1
+                    progress.update(len(batch_names))
+                    checkpoint["chunks_done"] = chunk_index + 1
+                    checkpoint["images_done"] += len(batch_names)
+                    checkpoint["failed"] += batch_failed
+                    batch_names, batch_images, batch_errors = [], [], []
+
+                    if batches % config.checkpoint_every_batches == 0 or not pending:
+                        checkpoint["position"] = writer.commit()
+                        checkpoint["complete"] = not pending
+                        self.save_checkpoint(checkpoint)
+                        elapsed = time.perf_counter() - started
+                        logger.info(f"{checkpoint['images_done']}/{len(names)} images, "
+                                    f"{scored / max(elapsed, 1e-9):.1f} images/s")
+        finally:
+            writer.close()
+
+        elapsed = time.perf_counter() - started
+        summary = {"images": scored, "failed": failed, "seconds": elapsed,
+                   "images_per_sec": scored / max(elapsed, 1e-9)}
+        logger.info(f"scored {scored} images ({failed} undecodable) in {elapsed:.1f}s: "
+                    f"{summary['images_per_sec']:.1f} images/s with {config.num_workers} decode workers, "
+                    f"written to {config.output_path}")
+        return summary
@@ -0,0 +1,229 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import time
+from pathlib import Path
+import tensorflow as tf
+from src.CNNClassifier import logger
+from src.CNNClassifier.utils.instrumentation import RunRecorder
+
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    def __init__(self, batch_size: int, label: str = ""):
+        """
+        Logs training images/sec per epoch, excluding the validation pass.
+
+        Args:
+            batch_size (int): Images per training step
+            label (str): Tag for the log line, e.g. the input pipeline name
+        """
+        super().__init__()
+        self.batch_size = batch_size
+        self.label = label
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_started = time.perf_counter()
+        self._last_batch_end = self._epoch_started
+        self._steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._steps += 1
+        self._last_batch_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = self._last_batch_end - self._epoch_started
+        images = self._steps * self.batch_size
+        images_per_sec = images / elapsed if elapsed > 0 else 0.0
+        self.history.append(images_per_sec)
+        logger.info(f"[{self.label}] epoch {epoch + 1}: {images} images in {elapsed:.1f}s, "
+                    f"{images_per_sec:.1f} images/sec")
+
+    def on_train_end(self, logs=None):
+        if self.history:
+            logger.info(f"[{self.label}] mean training throughput: "
+                        f"{sum(self.history) / len(self.history):.1f} images/sec")
+
+
+class ProfilerWindow:
+    def __init__(self, log_dir: Path, start_step: int, stop_step: int):
+        """
+        Captures a TensorFlow profiler trace of steps [start_step, stop_step),
+        viewable in TensorBoard's Profile tab. Framework loop agnostic: the
+        caller reports each step, so `fit` callbacks and the evaluation loop
+        share it. Skipping the first steps keeps tracing out of the trace.
+
+        Args:
+            log_dir (Path): TensorBoard log directory for the trace
+            start_step (int): First global step traced
+            stop_step (int): First global step no longer traced
+        """
+        self.log_dir = Path(log_dir)
+        self.start_step = start_step
+        self.stop_step = stop_step
+        self.active = False
+
+    def before_step(self, step: int):
+        if step == self.start_step and not self.active:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            tf.profiler.experimental.start(str(self.log_dir))
+            self.active = True
+            logger.info(f"profiling steps {self.start_step}-{self.stop_step - 1} into {self.log_dir}")
+
+    def after_step(self, step: int):
+        if self.active and step + 1 >= self.stop_step:
+            self.close()
+
+    def close(self):
+        if self.active:
+            tf.profiler.experimental.stop()
+            self.active = False
+            logger.info(f"profiler trace written to {self.log_dir}")
+
+
+class InstrumentationCallback(tf.keras.callbacks.Callback):
+    def __init__(self, recorder: RunRecorder, batch_size: int, profiler: ProfilerWindow = None):
+        """
+        Feeds a RunRecorder from `fit`: per step, the time spent waiting for
+        the input pipeline and the time spent computing, plus per-epoch
+        wall-clock, memory and CPU. The split needs the training input
+        wrapped by `instrument_input`, which timestamps the moment each batch
+        reaches the training step; without it every step counts as compute.
+
+        Args:
+            recorder (RunRecorder): Run log to write to
+            batch_size (int): Images per step when the input reports none
+            profiler (ProfilerWindow, optional): Trace a window of global steps
+        """
+        super().__init__()
+        self.recorder = recorder
+        self.batch_size = batch_size
+        self.profiler = profiler
+
+    def on_train_begin(self, logs=None):
+        self.recorder.start()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.recorder.begin_epoch(epoch)
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.profiler is not None:
+            self.profiler.before_step(self.recorder.global_step)
+        self._batch_started = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        ended = time.perf_counter()
+        # the batch is fetched inside the train step, between batch begin and end
+        ready = self.recorder.pop_ready()
+        images = self.batch_size
+        data_ready = self._batch_started
+        if ready is not None:
+            images = ready[1] or images
+            # the first step traces the train function before fetching, which would read as data wait
+            if self.recorder.global_step > 0:
+                data_ready = min(max(ready[0], self._batch_started), ended)
+        self.recorder.record_step(images, data_ready - self._batch_started, ended - data_ready)
+        if self.profiler is not None:
+            self.profiler.after_step(self.recorder.global_step - 1)
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.recorder.end_epoch(logs)
+
+    def on_train_end(self, logs=None):
+        if self.profiler is not None:
+            self.profiler.close()
+        self.recorder.close()
+
+
+class CheckpointCallback(tf.keras.callbacks.Callback):
+    def __init__(self, checkpointer, steps_per_epoch: int, every_steps: int = 0, initial_step: int = 0):
+        """
+        Saves a checkpoint every `every_steps` steps and at the end of every
+        epoch. A run resumed at `initial_step` of its first epoch trains only
+        the remaining steps of that epoch: the epoch is cut short with
+        `stop_training`, which is cleared again at epoch end, so the epochs
+        after it line up with the input stream as in an uninterrupted run.
+        Put it first in the callback list, so a later callback stopping
+        training at the same epoch end still takes effect.
+
+        Args:
+            checkpointer (TrainingCheckpointer): Writes the checkpoints
+            steps_per_epoch (int): Steps of a full epoch
+            every_steps (int): Checkpoint interval within an epoch, 0 = epoch ends only
+            initial_step (int): Steps of the first epoch already trained by the interrupted run
+        """
+        super().__init__()
+        self.checkpointer = checkpointer
+        self.steps_per_epoch = steps_per_epoch
+        self.every_steps = every_steps
+        self.initial_step = initial_step
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch = epoch
+        self._cut_short = False
+
+    def on_train_batch_end(self, batch, logs=None):
+        step = self.initial_step + batch + 1
+        if self.every_steps and step % self.every_steps == 0 and step < self.steps_per_epoch:
+            self.checkpointer.save(self._epoch, step)
+        if self.initial_step and step >= self.steps_per_epoch and not self.model.stop_training:
+            self.model.stop_training = True
+            self._cut_short = True
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self._cut_short:
+            self.model.stop_training = False
+        self.initial_step = 0
+        self.checkpointer.save(epoch + 1, 0, logs)
+
+    def on_train_end(self, logs=None):
+        self.checkpointer.wait()
+
+
+class MedianStoppingCallback(tf.keras.callbacks.Callback):
+    def __init__(self, shared_history, trial_id: str, warmup_epochs: int = 1, min_trials: int = 2,
+                 monitor: str = "val_loss"):
+        """
+        Median stopping rule across the trials of a sweep: after `warmup_epochs`,
+        stop when this trial's best `monitor` so far is worse than the median of
+        the other trials' best values at the same epoch.
+
+        Args:
+            shared_history: Mapping shared between trial processes, e.g. a
+                `multiprocessing.Manager().dict()`, of trial id to per-epoch values
+            trial_id (str): Key of this trial in `shared_history`
+            warmup_epochs (int): Epochs every trial gets before it can be pruned
+            min_trials (int): Other trials that must have reached the epoch first
+            monitor (str): Lower-is-better metric from the epoch logs
+        """
+        super().__init__()
+        self.shared_history = shared_history
+        self.trial_id = trial_id
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+        self.monitor = monitor
+        self.values = []
+        self.pruned_epoch = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        value = (logs or {}).get(self.monitor)
+        if value is None:
+            return
+        self.values.append(float(value))
+        # proxies only see assignments, not in-place mutation of the stored list
+        self.shared_history[self.trial_id] = list(self.values)
+        if epoch + 1 < self.warmup_epochs:
+            return
+
+        best = min(self.values)
+        others = sorted(min(values[:epoch + 1]) for trial_id, values in self.shared_history.items()
+                        if trial_id != self.trial_id and len(values) > epoch)
+        if len(others) < self.min_trials:
+            return
+        middle = len(others) // 2
+        median = others[middle] if len(others) % 2 else (others[middle - 1] + others[middle]) / 2
+        if best > median:
+            self.pruned_epoch = epoch + 1
+            self.model.stop_training = True
+            logger.info(f"trial {self.trial_id} pruned after epoch {epoch + 1}: best {self.monitor} {best:.4f} "
+                        f"is worse than the median {median:.4f} of {len(others)} other trials")
\ No newline at end of file
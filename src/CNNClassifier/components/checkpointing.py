@@ -0,0 +1,173 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+import tensorflow as tf
+from src.CNNClassifier import logger
+
+CHECKPOINT_VERSION = 1
+STATE_FILE = "checkpoint.json"
+
+
+class TrainingCheckpointer:
+    def __init__(self, directory: Path, model: tf.keras.Model, fingerprint: str, max_to_keep: int = 3,
+                 read_only: bool = False):
+        """
+        Periodic, rotated checkpoints of a model being fit: weights, optimizer
+        state and the input position as (epoch, step within the epoch).
+
+        `save` only copies the variables to host memory on the training
+        thread; the file is written by a background thread while training
+        continues. At most one write is in flight, so a second save waits for
+        the first and memory holds no more than two snapshots.
+
+        Each checkpoint is an .npz of the variable values in `model.weights`
+        and `optimizer.variables` order, committed by an atomic rename before
+        checkpoint.json points at it. A run with a different `fingerprint`
+        does not resume from them.
+
+        In multi-worker training only the chief writes; the other workers
+        open the same directory `read_only` and just restore from it.
+
+        Args:
+            directory (Path): Where checkpoints and checkpoint.json live
+            model (tf.keras.Model): Compiled model being fit
+            fingerprint (str): Identifies the training setup the checkpoints belong to
+            max_to_keep (int): Newest checkpoints kept on disk, older ones are deleted
+            read_only (bool): Restore only, never save, delete or mark complete
+        """
+        self.directory = Path(directory)
+        self.model = model
+        self.fingerprint = fingerprint
+        self.max_to_keep = max(int(max_to_keep), 1)
+        self.read_only = read_only
+        self.state = None
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    @property
+    def optimizer(self):
+        return self.model.optimizer
+
+    def variables(self):
+        if not self.optimizer.built:
+            # slot variables (momentum etc.) only exist once the optimizer is built
+            self.optimizer.build(self.model.trainable_variables)
+        return list(self.model.weights) + list(self.optimizer.variables)
+
+    def _state_path(self) -> Path:
+        return self.directory / STATE_FILE
+
+    def _write_state(self, state: dict):
+        tmp = self.directory / f"{STATE_FILE}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp, self._state_path())
+
+    def _remove_checkpoints(self, names):
+        for name in names:
+            path = self.directory / name
+            if path.exists():
+                path.unlink()
+
+    def restore(self) -> Tuple[int, int]:
+        """
+        Load the newest checkpoint of an unfinished run with the same
+        fingerprint into the model and optimizer. Checkpoints of any other
+        run are deleted.
+
+        Returns:
+            tuple: (epoch, step within the epoch) to resume at, (0, 0) for a fresh run
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        state = None
+        if self._state_path().exists():
+            with open(self._state_path()) as f:
+                state = json.load(f)
+        fresh = {"version": CHECKPOINT_VERSION, "fingerprint": self.fingerprint, "checkpoints": [],
+                 "epoch": 0, "step": 0, "complete": False}
+        if state is None or not state.get("checkpoints"):
+            self.state = fresh
+            return 0, 0
+        if (state.get("version") != CHECKPOINT_VERSION or state.get("fingerprint") != self.fingerprint
+                or state.get("complete")):
+            reason = "a finished run" if state.get("complete") else "a different training setup"
+            logger.info(f"checkpoints in {self.directory} belong to {reason}, starting from scratch")
+            self.state = fresh
+            if not self.read_only:
+                self._remove_checkpoints(state.get("checkpoints", []))
+                self._write_state(self.state)
+            return 0, 0
+
+        latest = self.directory / state["checkpoints"][-1]
+        variables = self.variables()
+        with np.load(latest) as arrays:
+            if len(arrays.files) != len(variables):
+                raise ValueError(f"{latest} holds {len(arrays.files)} variables, the model and optimizer have "
+                                 f"{len(variables)}; delete {self.directory} to start over")
+            for i, variable in enumerate(variables):
+                value = arrays[f"v{i}"]
+                if tuple(value.shape) != tuple(variable.shape):
+                    raise ValueError(f"{latest}: variable {i} ({variable.path}) has shape {value.shape}, "
+                                     f"expected {tuple(variable.shape)}")
+                variable.assign(value)
+        self.state = state
+        logger.info(f"resumed from {latest} at epoch {state['epoch'] + 1}, step {state['step']}")
+        return state["epoch"], state["step"]
+
+    def save(self, epoch: int, step: int, logs: dict = None):
+        """
+        Snapshot the variables and write them in the background.
+
+        Args:
+            epoch (int): Epoch to resume at
+            step (int): Steps of that epoch already trained
+            logs (dict, optional): Metrics recorded alongside, e.g. the epoch logs
+        """
+        if self.read_only:
+            return
+        started = time.perf_counter()
+        # np.array copies, so training can keep updating the variables during the write
+        snapshot = {f"v{i}": np.array(variable.numpy()) for i, variable in enumerate(self.variables())}
+        self.wait()
+        self._pending = self._writer.submit(self._write, snapshot, epoch, step, dict(logs or {}))
+        logger.debug(f"checkpoint of epoch {epoch + 1}, step {step} handed off after "
+                     f"{(time.perf_counter() - started) * 1000.0:.0f} ms")
+
+    def _write(self, snapshot: dict, epoch: int, step: int, logs: dict):
+        number = int(self.state.get("saved", 0)) + 1
+        name = f"ckpt-{number:06d}.npz"
+        tmp = self.directory / f"{name}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **snapshot)
+        os.replace(tmp, self.directory / name)
+
+        checkpoints = self.state["checkpoints"] + [name]
+        stale, keep = checkpoints[:-self.max_to_keep], checkpoints[-self.max_to_keep:]
+        self.state.update({
+            "saved": number, "checkpoints": keep, "epoch": epoch, "step": step, "saved_at": time.time(),
+            "logs": {key: float(value) for key, value in logs.items() if isinstance(value, (int, float))},
+        })
+        self._write_state(self.state)
+        # the state no longer points at them, so a crash here leaves at worst an orphaned file
+        self._remove_checkpoints(stale)
+
+    def wait(self):
+        """Block until the last checkpoint is on disk, re-raising a failed write."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def mark_complete(self):
+        """Called once the trained model is saved, so the next run starts from scratch."""
+        if self.read_only:
+            return
+        self.wait()
+        self.state["complete"] = True
+        self._write_state(self.state)
+        self._writer.shutdown()
@@ -0,0 +1,223 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import math
+from typing import Optional, Tuple
+import numpy as np
+import tensorflow as tf
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import DistributedConfig
+
+COMMUNICATION = {
+    "auto": tf.distribute.experimental.CommunicationImplementation.AUTO,
+    "ring": tf.distribute.experimental.CommunicationImplementation.RING,
+    "nccl": tf.distribute.experimental.CommunicationImplementation.NCCL,
+}
+LR_SCALING = {
+    "linear": lambda workers: float(workers),
+    "sqrt": lambda workers: math.sqrt(workers),
+    "none": lambda workers: 1.0,
+}
+
+
+def cluster_spec(config: DistributedConfig) -> Optional[dict]:
+    """
+    TF_CONFIG of this worker: the TF_CONFIG environment variable when it is
+    set, e.g. by launch_local_workers.py or a cluster manager, otherwise
+    built from the workers in config.yaml.
+
+    Returns:
+        dict: The TF_CONFIG, or None when there are fewer than two workers
+    """
+    if os.environ.get("TF_CONFIG"):
+        tf_config = json.loads(os.environ["TF_CONFIG"])
+    else:
+        workers = list(config.workers)
+        if len(workers) < 2:
+            return None
+        if not 0 <= config.task_index < len(workers):
+            raise ValueError(f"task_index {config.task_index} is outside the {len(workers)} configured workers")
+        tf_config = {"cluster": {"worker": workers}, "task": {"type": "worker", "index": config.task_index}}
+    if len(tf_config.get("cluster", {}).get("worker", [])) < 2:
+        return None
+    return tf_config
+
+
+def make_strategy(config: DistributedConfig) -> Tuple[Optional[tf.distribute.Strategy], int, int]:
+    """
+    Join the worker cluster, if one is configured. Collective ops can only
+    be set up before TensorFlow initialises, so call this first thing in
+    the process.
+
+    Returns:
+        tuple: (MultiWorkerMirroredStrategy or None, number of workers, index of this worker)
+    """
+    tf_config = cluster_spec(config)
+    if tf_config is None:
+        return None, 1, 0
+    if config.communication not in COMMUNICATION:
+        raise ValueError(f"Unknown communication {config.communication!r}, expected one of {tuple(COMMUNICATION)}")
+
+    os.environ["TF_CONFIG"] = json.dumps(tf_config)
+    num_workers = len(tf_config["cluster"]["worker"])
+    worker_index = int(tf_config["task"]["index"])
+    try:
+        strategy = tf.distribute.MultiWorkerMirroredStrategy(
+            communication_options=tf.distribute.experimental.CommunicationOptions(
+                implementation=COMMUNICATION[config.communication]))
+    except RuntimeError as e:
+        raise RuntimeError("multi-worker training needs a fresh process, TensorFlow is already initialised in "
+                           "this one; run pipeline/stage_03_train.py on every worker, or "
+                           "pipeline/launch_local_workers.py on one machine") from e
+    logger.info(f"worker {worker_index} of {num_workers} ({tf_config['cluster']['worker'][worker_index]}), "
+                f"{strategy.num_replicas_in_sync} replicas in sync")
+    return strategy, num_workers, worker_index
+
+
+def shard_indices(indices: np.ndarray, num_workers: int, worker_index: int) -> np.ndarray:
+    """
+    The indices worker `worker_index` trains on: every `num_workers`-th one,
+    so on the class-sorted split indices each shard keeps the class balance.
+    The remainder that does not divide evenly is dropped, every worker has
+    to run the same number of steps for the per-step all-reduce.
+    """
+    indices = np.asarray(indices)
+    if num_workers == 1:
+        return indices
+    usable = len(indices) - len(indices) % num_workers
+    return indices[worker_index:usable:num_workers]
+
+
+def scale_learning_rate(optimizer, num_workers: int, rule: str) -> float:
+    """
+    Scale the learning rate for a global batch `num_workers` times
+    BATCH_SIZE, by the LR_SCALING rule.
+
+    Returns:
+        float: The new learning rate
+    """
+    learning_rate = float(np.asarray(optimizer.learning_rate)) * LR_SCALING[rule](num_workers)
+    optimizer.learning_rate = learning_rate
+    logger.info(f"learning rate scaled {rule} to {learning_rate:g} for {num_workers} workers")
+    return learning_rate
+
+
+def check_resume_position(strategy: tf.distribute.Strategy, start_step: int):
+    """
+    Fail fast unless every worker resumes at the same global step, e.g.
+    because checkpoint_dir is not on storage all workers share. Workers at
+    different steps would otherwise train out of step until the collectives
+    hang. Only SUM and MEAN reduce across workers: the positions agree when
+    their variance is zero.
+    """
+    step = tf.constant(float(start_step), tf.float64)
+    mean = float(strategy.reduce(tf.distribute.ReduceOp.MEAN, step, axis=None))
+    mean_square = float(strategy.reduce(tf.distribute.ReduceOp.MEAN, step * step, axis=None))
+    if mean_square - mean * mean > 0.0:
+        raise RuntimeError(f"this worker resumes at step {start_step}, the mean of all workers is {mean:g}; "
+                           "checkpoint_dir has to be on storage shared by all workers")
+
+
+def fit_distributed(strategy: tf.distribute.Strategy, model: tf.keras.Model, train_data, steps_per_epoch: int,
+                    epochs: int, global_batch_size: int, initial_epoch: int = 0, callbacks=(),
+                    validation_data=None, validation_steps: int = None) -> tf.keras.callbacks.History:
+    """
+    `model.fit` for MultiWorkerMirroredStrategy as a custom training loop:
+    Keras 3 `fit` cannot reduce its batches and metrics across workers. Each
+    worker steps through its own shard, the gradients are all-reduced and
+    every replica applies the same update, so the variables stay identical.
+    Callbacks get the same calls and logs ("loss", "accuracy", "val_loss",
+    "val_accuracy") as from `fit`, including `stop_training`.
+
+    Args:
+        strategy (tf.distribute.Strategy): The strategy the model and optimizer were built under
+        model (tf.keras.Model): Compiled model, its optimizer and loss are used
+        train_data (tf.data.Dataset): This worker's endless stream of per-worker batches
+        steps_per_epoch (int): Steps per epoch, the same on every worker
+        epochs (int): Last epoch to train
+        global_batch_size (int): Per-worker batch size times the number of workers
+        initial_epoch (int): Epoch to start at
+        callbacks (sequence, optional): Keras callbacks
+        validation_data (tf.data.Dataset, optional): This worker's validation batches
+        validation_steps (int, optional): Validation steps, the same on every worker
+
+    Returns:
+        tf.keras.callbacks.History: Epoch logs, like the return value of `fit`
+    """
+    optimizer = model.optimizer
+    loss = tf.keras.losses.get(model.loss)
+    # Loss.call is the unreduced per-example loss
+    per_example_loss = loss.call if isinstance(loss, tf.keras.losses.Loss) else loss
+
+    def distribute(dataset):
+        # the dataset already is this worker's shard in per-replica batches: no auto-sharding, no rebatching
+        return strategy.distribute_datasets_from_function(lambda input_context: dataset)
+
+    def correct(labels, predictions):
+        return tf.reduce_sum(tf.cast(tf.equal(tf.argmax(labels, -1), tf.argmax(predictions, -1)), tf.float32))
+
+    def sum_over_replicas(*values):
+        return [strategy.reduce(tf.distribute.ReduceOp.SUM, value, axis=None) for value in values]
+
+    @tf.function
+    def train_step(iterator):
+        def step(images, labels):
+            with tf.GradientTape() as tape:
+                predictions = model(images, training=True)
+                batch_loss = tf.nn.compute_average_loss(per_example_loss(labels, predictions),
+                                                        global_batch_size=global_batch_size)
+                if model.losses:
+                    batch_loss += tf.nn.scale_regularization_loss(tf.add_n(model.losses))
+                scaled_loss = optimizer.scale_loss(batch_loss)
+            gradients = tape.gradient(scaled_loss, model.trainable_variables)
+            optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+            return batch_loss, correct(labels, predictions), tf.cast(tf.shape(labels)[0], tf.float32)
+
+        return sum_over_replicas(*strategy.run(step, args=next(iterator)))
+
+    @tf.function
+    def test_step(iterator):
+        def step(images, labels):
+            predictions = model(images, training=False)
+            return (tf.reduce_sum(per_example_loss(labels, predictions)), correct(labels, predictions),
+                    tf.cast(tf.shape(labels)[0], tf.float32))
+
+        return sum_over_replicas(*strategy.run(step, args=next(iterator)))
+
+    history = tf.keras.callbacks.History()
+    callback_list = tf.keras.callbacks.CallbackList([*callbacks, history], model=model, epochs=epochs,
+                                                    steps=steps_per_epoch, verbose=0)
+    train_iterator = iter(distribute(train_data))
+    validation = distribute(validation_data) if validation_data is not None else None
+
+    model.stop_training = False
+    callback_list.on_train_begin()
+    logs = {}
+    for epoch in range(initial_epoch, epochs):
+        callback_list.on_epoch_begin(epoch)
+        total_loss, total_correct, total_images, steps = 0.0, 0.0, 0.0, 0
+        for step in range(steps_per_epoch):
+            callback_list.on_train_batch_begin(step)
+            batch_loss, batch_correct, batch_images = train_step(train_iterator)
+            steps += 1
+            total_loss += float(batch_loss)
+            total_correct += float(batch_correct)
+            total_images += float(batch_images)
+            logs = {"loss": total_loss / steps, "accuracy": total_correct / max(total_images, 1.0)}
+            callback_list.on_train_batch_end(step, logs)
+            if model.stop_training:
+                break
+
+        if validation is not None and validation_steps:
+            validation_iterator = iter(validation)
+            totals = np.zeros(3)
+            for _ in range(validation_steps):
+                totals += [float(value) for value in test_step(validation_iterator)]
+            logs["val_loss"] = totals[0] / max(totals[2], 1.0)
+            logs["val_accuracy"] = totals[1] / max(totals[2], 1.0)
+        callback_list.on_epoch_end(epoch, logs)
+        if model.stop_training:
+            break
+    callback_list.on_train_end(logs)
+    return history
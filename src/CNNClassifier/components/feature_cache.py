@@ -0,0 +1,203 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+import tensorflow as tf
+from tqdm import tqdm
+from src.CNNClassifier import logger
+
+FEATURES_FILE = "features.npy"
+LABELS_FILE = "labels.npy"
+META_FILE = "meta.json"
+# label of rows whose image never came out of the batches, e.g. an undecodable file the pipeline skipped
+MISSING_LABEL = -1
+
+
+def frozen_prefix_length(model: tf.keras.Model) -> int:
+    """
+    Number of leading layers that are frozen, i.e. the index of the first
+    layer of the trainable tail. For the model from `prepare_full_model` with
+    `freeze_all=True` that is the Dense head: the Flatten or pooling layer in
+    front of it has no weights and is frozen too.
+    """
+    boundary = len(model.layers)
+    while boundary > 0 and model.layers[boundary - 1].trainable:
+        boundary -= 1
+    if boundary == len(model.layers):
+        raise ValueError("model has no trainable layers at its end, nothing to train on cached features")
+    return boundary
+
+
+def split_model(model: tf.keras.Model, boundary: int) -> Tuple[tf.keras.Model, tf.keras.Model]:
+    """
+    Cut a functional model in front of `model.layers[boundary]`.
+
+    Both halves share their layer objects with `model`, so training the
+    returned tail updates the weights of the full model in place.
+    """
+    boundary_tensor = model.layers[boundary].input
+    prefix = tf.keras.Model(inputs=model.input, outputs=boundary_tensor, name="frozen_prefix")
+    suffix = tf.keras.Model(inputs=boundary_tensor, outputs=model.output, name="trainable_suffix")
+    return prefix, suffix
+
+
+def extracted_rows(labels: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """The entries of `rows` that have features, i.e. not MISSING_LABEL in the cached `labels`."""
+    rows = np.asarray(rows, dtype=np.int64)
+    return rows[np.asarray(labels)[rows] != MISSING_LABEL]
+
+
+def weights_fingerprint(model: tf.keras.Model) -> str:
+    digest = hashlib.sha256()
+    for weight in model.weights:
+        value = np.ascontiguousarray(weight.numpy())
+        digest.update(f"{getattr(weight, 'path', weight.name)}:{value.shape}:{value.dtype}".encode())
+        digest.update(value.data)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    def __init__(self, root_dir: Path, dtype: str = "float32"):
+        """
+        On-disk store of backbone outputs, one directory per key.
+
+        Args:
+            root_dir (Path): Directory holding one sub-directory per cached feature set
+            dtype (str): Storage dtype of the features, "float32" or "float16"
+        """
+        self.root_dir = Path(root_dir)
+        self.dtype = np.dtype(dtype)
+
+    def key(self, prefix: tf.keras.Model, image_size, dataset_fingerprint: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(weights_fingerprint(prefix).encode())
+        digest.update(json.dumps({
+            "output_layer": prefix.layers[-1].name,
+            "image_size": [int(dim) for dim in image_size[:2]],
+            "dataset": dataset_fingerprint,
+            "dtype": self.dtype.name,
+        }, sort_keys=True).encode())
+        return digest.hexdigest()[:32]
+
+    def load(self, key: str):
+        """
+        Returns:
+            tuple or None: (memory-mapped features, labels) if `key` is complete on disk
+        """
+        entry = self.root_dir / key
+        if not (entry / META_FILE).exists():
+            return None
+        return np.load(entry / FEATURES_FILE, mmap_mode="r"), np.load(entry / LABELS_FILE)
+
+    def get_or_build(
+        self,
+        prefix: tf.keras.Model,
+        batches: Iterable[np.ndarray],
+        labels: np.ndarray,
+        image_size,
+        dataset_fingerprint: str):
+        """
+        Run `prefix` once over `batches` and persist the outputs, unless the same
+        weights, image size and dataset were cached before.
+
+        Args:
+            prefix (tf.keras.Model): Frozen part of the network
+            batches (Iterable): Un-shuffled, un-augmented image batches covering `labels` in order,
+                or (images, rows) pairs naming the position in `labels` of every image; rows
+                no pair covers are cached with MISSING_LABEL, see `extracted_rows`
+            labels (np.ndarray): Integer label per image
+            image_size (tuple): Input size, part of the cache key
+            dataset_fingerprint (str): Fingerprint of the source images
+
+        Returns:
+            tuple: (memory-mapped features, labels)
+        """
+        return self.get_or_build_many([prefix], batches, labels, image_size, dataset_fingerprint)[0]
+
+    def get_or_build_many(
+        self,
+        prefixes: Sequence[tf.keras.Model],
+        batches: Iterable[np.ndarray],
+        labels: np.ndarray,
+        image_size,
+        dataset_fingerprint: str) -> List[tuple]:
+        """
+        `get_or_build` for several prefixes of the same network, e.g. the
+        frozen parts of successive fine-tuning phases. The ones not cached
+        yet are extracted together in one pass over `batches`: the images
+        are read and the shared early layers run once, not once per prefix.
+
+        Returns:
+            list: (memory-mapped features, labels) per prefix
+        """
+        keys = [self.key(prefix, image_size, dataset_fingerprint) for prefix in prefixes]
+        missing = {}
+        for prefix, key in zip(prefixes, keys):
+            if self.load(key) is None:
+                missing.setdefault(key, prefix)
+            else:
+                logger.info(f"reusing cached backbone features {self.root_dir / key}")
+        if missing:
+            self._build(missing, batches, labels)
+        return [self.load(key) for key in keys]
+
+    def _build(self, prefixes: Dict[str, tf.keras.Model], batches: Iterable[np.ndarray], labels: np.ndarray):
+        features = {}
+        for key, prefix in prefixes.items():
+            entry = self.root_dir / key
+            if entry.exists():
+                shutil.rmtree(entry)
+            entry.mkdir(parents=True)
+            feature_shape = tuple(int(dim) for dim in prefix.output.shape[1:])
+            features[key] = np.lib.format.open_memmap(
+                entry / FEATURES_FILE, mode="w+", dtype=self.dtype, shape=(len(labels),) + feature_shape
+            )
+        # the prefixes share their layers, so one model computes all their outputs
+        first = next(iter(prefixes.values()))
+        extractor = first if len(prefixes) == 1 else tf.keras.Model(
+            inputs=first.input, outputs=[prefix.output for prefix in prefixes.values()]
+        )
+
+        started = time.perf_counter()
+        position = 0
+        extracted = np.zeros(len(labels), dtype=bool)
+        for batch in tqdm(batches, desc="extracting backbone features"):
+            images, rows = batch if isinstance(batch, tuple) else (batch, None)
+            if rows is None:
+                rows = np.arange(position, position + len(images))
+                position += len(images)
+            if len(rows) and rows.max() >= len(labels):
+                raise ValueError(f"feature extraction produced rows up to {rows.max()} for {len(labels)} labels")
+            outputs = extractor.predict_on_batch(images)
+            if len(prefixes) == 1:
+                outputs = [outputs]
+            for destination, output in zip(features.values(), outputs):
+                destination[rows] = np.asarray(output)
+            extracted[rows] = True
+        missing = int(len(labels) - extracted.sum())
+        if missing == len(labels):
+            raise ValueError(f"feature extraction produced no rows for {len(labels)} labels")
+        if missing and position:
+            # plain batches carry no positions, after a gap every later row would be misaligned
+            raise ValueError(f"feature extraction produced {position} rows for {len(labels)} labels")
+        if missing:
+            logger.warning(f"{missing} of {len(labels)} images could not be read, their rows are left out of training")
+        labels = np.where(extracted, np.asarray(labels, dtype=np.int32), MISSING_LABEL).astype(np.int32)
+        elapsed = time.perf_counter() - started
+
+        for key, destination in features.items():
+            destination.flush()
+            entry = self.root_dir / key
+            np.save(entry / LABELS_FILE, labels)
+            with open(entry / META_FILE, "w") as f:
+                json.dump({"samples": len(labels), "missing": missing, "feature_shape": list(destination.shape[1:]),
+                           "dtype": self.dtype.name, "extraction_seconds": elapsed}, f)
+            logger.info(f"cached {len(labels)} backbone features of shape {tuple(destination.shape[1:])} "
+                        f"in {elapsed:.1f}s at {entry}")
+        features.clear()
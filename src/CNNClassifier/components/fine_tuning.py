@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import re
+from typing import Dict, List, Optional
+import tensorflow as tf
+from src.CNNClassifier import logger
+
+# block1_conv1 (VGG), conv5_block3_1_conv (ResNet), block_16_project (MobileNetV2), block7a_se_reduce
+# (EfficientNet), expanded_conv_10_depthwise (MobileNetV3)
+BLOCK_PATTERN = re.compile(r"^(block_?\d+[a-z]?|conv\d+_block\d+|expanded_conv(?:_\d+)?)_")
+
+
+def backbone_blocks(model: tf.keras.Model, head_start: int) -> List[List[int]]:
+    """
+    Group the backbone layers in front of `head_start` into blocks by layer
+    name, in model order. A layer without a block name belongs to the block
+    before it, so the 1x1 top convolution of MobileNet and EfficientNet is
+    unfrozen together with their last block; the stem in front of the first
+    block is never part of one.
+
+    Returns:
+        list: Per block, the indices of its layers in `model.layers`
+    """
+    blocks, current = [], None
+    for index, layer in enumerate(model.layers[:head_start]):
+        match = BLOCK_PATTERN.match(layer.name)
+        if match is not None and match.group(1) != current:
+            current = match.group(1)
+            blocks.append([])
+        if current is not None:
+            blocks[-1].append(index)
+    return blocks
+
+
+def unfreeze_blocks(model: tf.keras.Model, blocks: List[List[int]], count: int) -> Optional[int]:
+    """
+    Make the last `count` blocks trainable, the block-wise counterpart of
+    `prepare_full_model`'s `freeze_till`. BatchNormalization layers stay
+    frozen: their moving statistics would drift on small fine-tuning
+    batches and undo the pretrained features.
+
+    Returns:
+        int or None: Index of the first layer of the earliest unfrozen block, None for `count` 0
+    """
+    if count > len(blocks):
+        raise ValueError(f"cannot unfreeze {count} blocks, the backbone has {len(blocks)}")
+    for block in blocks[len(blocks) - count:]:
+        for index in block:
+            layer = model.layers[index]
+            if not isinstance(layer, tf.keras.layers.BatchNormalization):
+                layer.trainable = True
+    return blocks[len(blocks) - count][0] if count else None
+
+
+def layerwise_multipliers(model: tf.keras.Model, blocks: List[List[int]], count: int,
+                          decay: float) -> Dict[str, float]:
+    """
+    Learning rate multiplier per variable path: 1 for the head, `decay` for
+    the block next to it, `decay**2` for the one before and so on, so the
+    generic early features move least.
+    """
+    multipliers = {}
+    for distance, block in enumerate(reversed(blocks[len(blocks) - count:]), start=1):
+        for index in block:
+            for variable in model.layers[index].trainable_variables:
+                multipliers[variable.path] = decay ** distance
+    return multipliers
+
+
+_LAYERWISE_CLASSES = {}
+
+
+def layerwise_optimizer(optimizer, learning_rate: float, multipliers: Dict[str, float]):
+    """
+    A fresh optimizer of the same type and settings as `optimizer`, at
+    `learning_rate`, that scales each variable's gradient by its multiplier
+    before the update. For SGD, with or without momentum, that is the same
+    as a per-layer learning rate; adaptive optimizers like Adam normalize
+    the scale away.
+
+    The subclass is not serializable, recompile with a plain optimizer
+    before saving the model.
+    """
+    base = type(optimizer)
+    cls = _LAYERWISE_CLASSES.get(base)
+    if cls is None:
+        class Layerwise(base):
+            def apply(self, grads, trainable_variables=None):
+                variables = self._trainable_variables if trainable_variables is None else list(trainable_variables)
+                grads = [
+                    grad if grad is None or self.multipliers.get(variable.path, 1.0) == 1.0
+                    else grad * self.multipliers[variable.path]
+                    for grad, variable in zip(grads, variables)
+                ]
+                return super().apply(grads, trainable_variables)
+
+        Layerwise.__name__ = Layerwise.__qualname__ = f"Layerwise{base.__name__}"
+        cls = _LAYERWISE_CLASSES[base] = Layerwise
+    if not isinstance(optimizer, tf.keras.optimizers.SGD) and set(multipliers.values()) - {1.0}:
+        logger.warning(f"layer-wise learning rates scale gradients, {base.__name__} largely normalizes that away")
+    config = optimizer.get_config()
+    config["learning_rate"] = learning_rate
+    layerwise = cls.from_config(config)
+    layerwise.multipliers = dict(multipliers)
+    return layerwise
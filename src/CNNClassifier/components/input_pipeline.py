@@ -0,0 +1,391 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from typing import Callable, Optional
+import numpy as np
+import tensorflow as tf
+from src.CNNClassifier.utils.image_cache import ImageCacheReader
+from src.CNNClassifier.utils.preprocessing import normalize_batch, normalize_tensor
+
+
+class ImageCacheSequence(tf.keras.utils.Sequence):
+    def __init__(
+        self,
+        reader: ImageCacheReader,
+        indices: np.ndarray,
+        batch_size: int,
+        shuffle: bool = False,
+        seed: int = 0,
+        augment_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+        preprocessing: str = "rescale",
+        drop_remainder: bool = False):
+        """
+        Keras Sequence streaming batches out of the memory-mapped image cache.
+
+        Exposes `samples`, `batch_size` and `class_indices` like the
+        DirectoryIterator returned by `flow_from_directory`, so the training
+        and evaluation code can treat both sources the same way.
+
+        Args:
+            reader (ImageCacheReader): Opened cache
+            indices (np.ndarray): Global cache indices making up this subset
+            batch_size (int): Images per batch
+            shuffle (bool): Reshuffle the subset at the end of every epoch
+            seed (int): Base seed, combined with the epoch number
+            augment_fn (Callable, optional): Applied to each float32 batch
+            preprocessing (str): `normalize_batch` mode applied to the uint8 pixels
+            drop_remainder (bool): Skip the last partial batch, so that one
+                pass matches `samples // batch_size` training steps
+        """
+        super().__init__()
+        self.reader = reader
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.augment_fn = augment_fn
+        self.preprocessing = preprocessing
+        self.drop_remainder = drop_remainder
+        self.samples = len(self.indices)
+        self.num_classes = reader.num_classes
+        self.class_indices = {name: i for i, name in enumerate(reader.class_names)}
+        self.classes = np.asarray(reader.labels[self.indices])
+        self.epoch = 0
+        self._order = self.indices
+        self._set_order()
+
+    def _set_order(self):
+        if self.shuffle:
+            rng = np.random.default_rng(self.seed + self.epoch)
+            self._order = self.indices[rng.permutation(self.samples)]
+
+    def __len__(self):
+        if self.drop_remainder:
+            return self.samples // self.batch_size
+        return -(-self.samples // self.batch_size)
+
+    def __getitem__(self, idx):
+        batch_indices = self._order[idx * self.batch_size:(idx + 1) * self.batch_size]
+        if self.shuffle:
+            # gather in storage order for locality on the memory map, then restore batch order
+            storage_order = np.argsort(batch_indices, kind="stable")
+            pixels = np.empty((len(batch_indices),) + self.reader.image_size, dtype=np.uint8)
+            pixels[storage_order] = self.reader.read(batch_indices[storage_order])
+        else:
+            pixels = self.reader.read(batch_indices)
+
+        images = normalize_batch(pixels, self.preprocessing)
+        if self.augment_fn is not None:
+            images = self.augment_fn(images)
+        labels = np.zeros((len(batch_indices), self.num_classes), dtype=np.float32)
+        labels[np.arange(len(batch_indices)), self.reader.labels[batch_indices]] = 1.0
+        return images, labels
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self._set_order()
+
+
+class ArraySequence(tf.keras.utils.Sequence):
+    def __init__(
+        self,
+        features: np.ndarray,
+        labels: np.ndarray,
+        indices: np.ndarray,
+        num_classes: int,
+        batch_size: int,
+        shuffle: bool = False,
+        seed: int = 0,
+        drop_remainder: bool = False):
+        """
+        Batches rows of a (possibly memory-mapped) array with one-hot labels,
+        used to train the head on cached backbone features.
+        """
+        super().__init__()
+        self.features = features
+        self.labels = np.asarray(labels)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.num_classes = num_classes
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_remainder = drop_remainder
+        self.samples = len(self.indices)
+        self.epoch = 0
+        self._order = self.indices
+        self._set_order()
+
+    def _set_order(self):
+        if self.shuffle:
+            rng = np.random.default_rng(self.seed + self.epoch)
+            self._order = self.indices[rng.permutation(self.samples)]
+
+    def __len__(self):
+        if self.drop_remainder:
+            return self.samples // self.batch_size
+        return -(-self.samples // self.batch_size)
+
+    def __getitem__(self, idx):
+        batch_indices = self._order[idx * self.batch_size:(idx + 1) * self.batch_size]
+        rows = np.sort(batch_indices) if self.shuffle else batch_indices
+        batch = np.asarray(self.features[rows], dtype=np.float32)
+        labels = np.zeros((len(rows), self.num_classes), dtype=np.float32)
+        labels[np.arange(len(rows)), self.labels[rows]] = 1.0
+        return batch, labels
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self._set_order()
+
+
+class PreprocessedSequence(tf.keras.utils.Sequence):
+    def __init__(self, iterator, preprocessing: str = "rescale"):
+        """
+        Normalizes whole batches of a `flow_from_directory` style iterator
+        built without `rescale`. ImageDataGenerator standardizes one image at
+        a time; here each float32 batch it yields is normalized in place, so
+        the shared preprocessing costs one vectorized pass and no extra copy.
+        Other attributes (`samples`, `class_indices`, ...) pass through.
+        """
+        super().__init__()
+        self.iterator = iterator
+        self.preprocessing = preprocessing
+
+    def __getattr__(self, name):
+        iterator = self.__dict__.get("iterator")
+        if iterator is None:
+            raise AttributeError(name)
+        return getattr(iterator, name)
+
+    def __len__(self):
+        return len(self.iterator)
+
+    def __getitem__(self, idx):
+        images, labels = self.iterator[idx]
+        return normalize_batch(images, self.preprocessing, out=images), labels
+
+    def on_epoch_end(self):
+        self.iterator.on_epoch_end()
+
+
+def flow_from_file_list(datagenerator, directory, files, labels, class_names, shuffle, **dataflow_kwargs):
+    """
+    `flow_from_directory` restricted to an explicit file list, e.g. the
+    images that passed validation. `files` are relative to `directory`.
+    """
+    import pandas as pd
+    dataframe = pd.DataFrame({"filename": list(files), "class": [class_names[label] for label in labels]})
+    return datagenerator.flow_from_dataframe(
+        dataframe,
+        directory=str(directory),
+        x_col="filename",
+        y_col="class",
+        classes=list(class_names),
+        class_mode="categorical",
+        validate_filenames=False,
+        shuffle=shuffle,
+        **dataflow_kwargs
+    )
+
+
+def decode_and_resize(path, image_size):
+    """Read one file and return it resized to `image_size` as uint8 RGB."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, image_size, method="bilinear", antialias=True)
+    return tf.cast(tf.clip_by_value(tf.round(image), 0.0, 255.0), tf.uint8)
+
+
+def random_affine_batch(
+    images,
+    rotation_range=40.0,
+    width_shift_range=0.2,
+    height_shift_range=0.2,
+    shear_range=0.2,
+    zoom_range=0.2,
+    horizontal_flip=True):
+    """
+    Batch-level equivalent of the ImageDataGenerator augmentation used in
+    stage_03: every image gets its own rotation/shift/shear/zoom/flip, but all
+    of them are applied by a single ImageProjectiveTransformV3 call.
+
+    Ranges follow ImageDataGenerator: rotation and shear in degrees, shifts
+    as a fraction of the image size, zoom as +/- fraction per axis, and the
+    border is filled with the nearest pixel.
+    """
+    shape = tf.shape(images)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+    h, w = tf.cast(height, tf.float32), tf.cast(width, tf.float32)
+
+    def uniform(low, high):
+        return tf.random.uniform([batch_size], low, high)
+
+    theta = uniform(-rotation_range, rotation_range) * (np.pi / 180.0)
+    shear = uniform(-shear_range, shear_range) * (np.pi / 180.0)
+    zoom_x = uniform(1.0 - zoom_range, 1.0 + zoom_range)
+    zoom_y = uniform(1.0 - zoom_range, 1.0 + zoom_range)
+    shift_x = uniform(-width_shift_range, width_shift_range) * w
+    shift_y = uniform(-height_shift_range, height_shift_range) * h
+
+    # output pixel -> input pixel: A = rotation @ shear @ zoom, applied about the image centre
+    cos, sin = tf.cos(theta), tf.sin(theta)
+    a00 = cos * zoom_x
+    a01 = (-cos * tf.sin(shear) - sin * tf.cos(shear)) * zoom_y
+    a10 = sin * zoom_x
+    a11 = (-sin * tf.sin(shear) + cos * tf.cos(shear)) * zoom_y
+    cx, cy = (w - 1.0) / 2.0, (h - 1.0) / 2.0
+    a02 = cx - a00 * cx - a01 * cy + shift_x
+    a12 = cy - a10 * cx - a11 * cy + shift_y
+    zeros = tf.zeros_like(a00)
+    transforms = tf.stack([a00, a01, a02, a10, a11, a12, zeros, zeros], axis=1)
+
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=transforms,
+        output_shape=tf.stack([height, width]),
+        fill_value=0.0,
+        interpolation="BILINEAR",
+        fill_mode="NEAREST"
+    )
+    if horizontal_flip:
+        flip = uniform(0.0, 1.0) < 0.5
+        images = tf.where(flip[:, None, None, None], tf.reverse(images, axis=[2]), images)
+    return images
+
+
+def build_image_dataset(
+    filepaths,
+    labels,
+    num_classes: int,
+    image_size,
+    batch_size: int,
+    training: bool,
+    augment: bool = False,
+    cache: str = "",
+    seed: int = 0,
+    shuffle_buffer: int = 1024,
+    preprocessing: str = "rescale"):
+    """
+    tf.data pipeline over image files: parallel read/decode/resize, optional
+    cache of the decoded uint8 images, shuffling, batching, vectorized
+    augmentation and prefetch.
+
+    Args:
+        filepaths (list): Image paths
+        labels (np.ndarray): Integer labels aligned with `filepaths`
+        num_classes (int): Width of the one-hot labels
+        image_size (tuple): (height, width) to resize to
+        batch_size (int): Images per batch
+        training (bool): Shuffle and repeat forever
+        augment (bool): Apply `random_affine_batch` to every batch
+        cache (str): "" for no caching, "memory", or a file prefix for an on-disk cache;
+            an evaluation set (`training` False) is read once here to complete its cache
+        seed (int): Seed for the file order and augmentation
+        shuffle_buffer (int): Size of the per-epoch shuffle buffer
+        preprocessing (str): `normalize_tensor` mode applied to each batch
+
+    Returns:
+        tf.data.Dataset: Batches of (float32 model inputs, one-hot labels)
+    """
+    filepaths = np.asarray([str(path) for path in filepaths])
+    labels = np.asarray(labels, dtype=np.int32)
+    if training:
+        # listings are class-sorted, so shuffle once up front; the buffer below only reorders locally
+        order = np.random.default_rng(seed).permutation(len(filepaths))
+        filepaths, labels = filepaths[order], labels[order]
+
+    image_size = tuple(int(dim) for dim in image_size[:2])
+    dataset = tf.data.Dataset.from_tensor_slices((filepaths, labels))
+    dataset = dataset.map(
+        lambda path, label: (decode_and_resize(path, image_size), label),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not training
+    ).ignore_errors(log_warning=True)
+    if cache == "memory":
+        dataset = dataset.cache()
+    elif cache:
+        os.makedirs(os.path.dirname(cache) or ".", exist_ok=True)
+        dataset = dataset.cache(cache)
+    if cache and not training and not os.path.exists(f"{cache}.index"):
+        # fit reads only validation_steps full batches of an evaluation set, and an iterator that
+        # stops short never finalizes the cache (a disk cache keeps its lock file and partial shards);
+        # one complete pass here fills it, so every epoch after reads the finished cache
+        for _ in dataset:
+            pass
+
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True).repeat()
+    dataset = dataset.batch(batch_size, drop_remainder=training)
+
+    def to_model_inputs(images, batch_labels):
+        images = normalize_tensor(images, preprocessing)
+        if augment:
+            images = random_affine_batch(images)
+        return images, tf.one_hot(batch_labels, num_classes)
+
+    dataset = dataset.map(to_model_inputs, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def sequence_to_dataset(sequence, repeat: bool = False, start_step: int = 0, steps_per_pass: int = None):
+    """
+    tf.data view of a Keras Sequence: every batch in order, then
+    `on_epoch_end`, so Sequences that reshuffle themselves keep doing so.
+    Batches are produced one ahead on a background thread, the same as
+    `fit` does for a Sequence.
+
+    Args:
+        sequence (tf.keras.utils.Sequence): Yields (images, labels) batches
+        repeat (bool): Pass over the Sequence forever, for `fit` with `steps_per_epoch`
+        start_step (int): Batches of the endless stream to skip, i.e. where a
+            resumed run left off. Skipped passes only replay `on_epoch_end`,
+            so nothing is loaded for them.
+        steps_per_pass (int, optional): Batches taken from each pass before
+            `on_epoch_end`, all of them if None. With `steps_per_epoch` every
+            epoch is exactly one pass of full batches: a partial last batch is
+            left out instead of shifting every later epoch off its pass.
+    """
+    steps = len(sequence) if steps_per_pass is None else min(int(steps_per_pass), len(sequence))
+    if steps < 1:
+        raise ValueError(f"a subset of {getattr(sequence, 'samples', 'too few')} images does not fill one batch "
+                         f"of BATCH_SIZE {getattr(sequence, 'batch_size', '?')}, lower BATCH_SIZE or add images")
+    images, labels = sequence[0]
+    passes, first_index = divmod(start_step, steps)
+    for _ in range(passes):
+        sequence.on_epoch_end()
+    start = [first_index]
+
+    def spec(array):
+        return tf.TensorSpec((None,) + tuple(array.shape[1:]), tf.as_dtype(array.dtype))
+
+    def batches():
+        # only the first pass starts part-way through
+        for i in range(start.pop() if start else 0, steps):
+            yield sequence[i]
+        sequence.on_epoch_end()
+
+    dataset = tf.data.Dataset.from_generator(batches, output_signature=(spec(images), spec(labels)))
+    if repeat:
+        dataset = dataset.repeat()
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def instrument_input(data, recorder):
+    """
+    Timestamps each batch as the training step takes it off the prefetch
+    buffer, via `recorder.mark_ready`, so InstrumentationCallback can split
+    the step into data wait and compute.
+
+    Args:
+        data (tf.data.Dataset): Training input, a Sequence goes through `sequence_to_dataset` first
+        recorder (RunRecorder): Receives the timestamps
+
+    Returns:
+        tf.data.Dataset: The same batches
+    """
+    def stamp(images, labels):
+        # not parallel, so it runs when the consumer asks for the batch rather than ahead of it
+        ready = tf.numpy_function(recorder.mark_ready, [tf.shape(images)[0]], tf.float64, stateful=True)
+        with tf.control_dependencies([ready]):
+            return tf.identity(images), tf.identity(labels)
+
+    return data.map(stamp)
@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import tensorflow as tf
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import PerformanceConfig
+
+PRECISION_POLICIES = ("float32", "mixed_bfloat16", "mixed_float16")
+
+
+def configure_threads(config: PerformanceConfig):
+    """
+    Size TensorFlow's intra-op and inter-op thread pools, 0 keeps the default.
+    The pools can only be sized before the TF runtime initialises, so call this
+    before the first model is built or loaded.
+    """
+    threading = tf.config.threading
+    for size, getter, setter, name in (
+        (config.params_intra_op_threads, threading.get_intra_op_parallelism_threads,
+         threading.set_intra_op_parallelism_threads, "intra-op"),
+        (config.params_inter_op_threads, threading.get_inter_op_parallelism_threads,
+         threading.set_inter_op_parallelism_threads, "inter-op"),
+    ):
+        if size <= 0 or getter() == size:
+            continue
+        try:
+            setter(size)
+            logger.info(f"{name} thread pool set to {size}")
+        except RuntimeError:
+            logger.warning(f"TensorFlow is already initialised, {name} thread pool stays at {getter() or 'default'}")
+
+
+def cpu_supports_bfloat16() -> bool:
+    # without AVX512-BF16 / AMX the bfloat16 kernels are emulated and usually slower than float32
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def apply_precision_policy(model: tf.keras.Model, policy: str) -> tf.keras.Model:
+    """
+    Rebuild `model` with every layer computing in `policy`, except the output
+    layer which stays float32 so the softmax and the loss are numerically stable.
+    Layer configs saved in an .h5 pin their dtype, so the policy is set per
+    layer rather than through the global policy.
+
+    Returns:
+        tf.keras.Model: A new model carrying the trained weights of `model`
+    """
+    if policy not in PRECISION_POLICIES:
+        raise ValueError(f"Unknown MIXED_PRECISION {policy!r}, expected one of {PRECISION_POLICIES}")
+    if policy == "float32":
+        return model
+    if policy == "mixed_bfloat16" and not cpu_supports_bfloat16() and not tf.config.list_physical_devices("GPU"):
+        logger.warning("this CPU has no native bfloat16 support, mixed_bfloat16 will likely be slower")
+    if policy == "mixed_float16" and not tf.config.list_physical_devices("GPU"):
+        logger.warning("mixed_float16 has no fast CPU kernels, prefer mixed_bfloat16 on CPU")
+
+    output_layer = model.layers[-1]
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        config["dtype"] = "float32" if layer is output_layer else policy
+        return layer.__class__.from_config(config)
+
+    mixed = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    mixed.set_weights(model.get_weights())
+    return mixed
+
+
+def prepare_for_training(model: tf.keras.Model, config: PerformanceConfig) -> tf.keras.Model:
+    """
+    Apply the precision policy and recompile with XLA as configured. The
+    optimizer is rebuilt from its config, which also detaches it from the
+    variables of a model restored from .h5; under mixed_float16 it is wrapped
+    in a LossScaleOptimizer so small float16 gradients do not underflow to zero.
+
+    Returns:
+        tf.keras.Model: Compiled model ready for `fit`
+    """
+    optimizer = model.optimizer
+    if isinstance(optimizer, tf.keras.mixed_precision.LossScaleOptimizer):
+        optimizer = optimizer.inner_optimizer
+    loss = model.loss
+
+    model = apply_precision_policy(model, config.params_mixed_precision)
+    optimizer = type(optimizer).from_config(optimizer.get_config())
+    compile_for_training(model, optimizer, loss, config)
+    logger.info(f"training with precision policy {config.params_mixed_precision}, "
+                f"jit_compile={config.params_jit_compile}, optimizer {type(optimizer).__name__}")
+    return model
+
+
+def compile_for_training(model: tf.keras.Model, optimizer, loss, config: PerformanceConfig):
+    """
+    Compile `model` in place with a fresh `optimizer`, loss-scaled under
+    mixed_float16 and XLA-compiled as configured. Recompiling is how changed
+    `trainable` flags take effect, no reload or rebuild of the model needed.
+    """
+    if config.params_mixed_precision == "mixed_float16":
+        optimizer = tf.keras.mixed_precision.LossScaleOptimizer(optimizer)
+    model.compile(
+        optimizer=optimizer,
+        loss=loss,
+        metrics=["accuracy"],
+        jit_compile=config.params_jit_compile
+    )
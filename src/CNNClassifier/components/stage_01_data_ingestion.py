@@ -1,42 +1,207 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import re
+import time
 import urllib.request as request
+from urllib.error import HTTPError, URLError
+from http.client import HTTPException
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from zipfile import ZipFile
 from src.CNNClassifier import logger
 from pathlib import Path
 from tqdm import tqdm
 from src.CNNClassifier.entity import DataIngestionConfig
 from src.CNNClassifier.utils import utils
+from src.CNNClassifier.utils.hashing import CHUNK_SIZE, sha256_file
+
+MANIFEST_FILE = "extract_manifest.json"
+
+
+def extract_partition(zip_path, members, target_dir):
+    # runs in a worker process with its own ZipFile handle
+    extracted_bytes = 0
+    with ZipFile(file=zip_path, mode="r") as zf:
+        for member in members:
+            info = zf.getinfo(member)
+            zf.extract(info, target_dir)
+            extracted_bytes += info.file_size
+    return len(members), extracted_bytes
+
 
 class DataIngestion:
     def __init__(self,config:DataIngestionConfig):
         self.config=config
 
+    @property
+    def download_meta_path(self):
+        return Path(f"{self.config.local_data_file}.json")
+
+    @property
+    def partial_file_path(self):
+        return Path(f"{self.config.local_data_file}.part")
+
+    def _read_json(self, path):
+        if not Path(path).exists():
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_json(self, path, data):
+        tmp_path = Path(f"{path}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def is_downloaded(self):
+        meta = self._read_json(self.download_meta_path)
+        local_file = Path(self.config.local_data_file)
+        if not local_file.exists() or meta.get("source_url") != self.config.source_url:
+            return False
+        if local_file.stat().st_size != meta.get("size"):
+            return False
+        return not self.config.source_sha256 or meta.get("sha256") == self.config.source_sha256
+
     def download_file(self):
-        print(f"Debugging: source_url = {self.config.source_url}")
-        print(f"Debugging: local_data_file = {self.config.local_data_file}")
-        
         if not self.config.source_url or not self.config.source_url.startswith(("http://", "https://")):
             raise ValueError("Invalid or missing source URL.")
-        
-        request.urlretrieve(
-            url=self.config.source_url,
-            filename=self.config.local_data_file
-        )
-            
+
+        if self.is_downloaded():
+            logger.info(f"{self.config.local_data_file} already downloaded and verified, skipping download")
+            return
+
+        Path(self.config.local_data_file).parent.mkdir(parents=True, exist_ok=True)
+        for attempt in range(1, self.config.max_retries + 1):
+            try:
+                self._download_with_resume()
+                break
+            except (URLError, HTTPException, ConnectionError, TimeoutError) as e:
+                if attempt == self.config.max_retries:
+                    raise
+                logger.warning(f"download attempt {attempt} failed ({e}), resuming from "
+                               f"{self.partial_file_path.stat().st_size if self.partial_file_path.exists() else 0} bytes")
+                time.sleep(min(2 ** attempt, 30))
+
+        digest = sha256_file(self.partial_file_path)
+        if self.config.source_sha256 and digest != self.config.source_sha256:
+            self.partial_file_path.unlink()
+            raise ValueError(f"sha256 mismatch for {self.config.source_url}: expected "
+                             f"{self.config.source_sha256}, got {digest}")
+        size = self.partial_file_path.stat().st_size
+        os.replace(self.partial_file_path, self.config.local_data_file)
+        self._write_json(self.download_meta_path, {
+            "source_url": self.config.source_url, "size": size, "sha256": digest
+        })
+
+    def _download_with_resume(self):
+        offset = self.partial_file_path.stat().st_size if self.partial_file_path.exists() else 0
+        req = request.Request(self.config.source_url)
+        if offset:
+            req.add_header("Range", f"bytes={offset}-")
+
+        started = time.perf_counter()
+        try:
+            response = request.urlopen(req, timeout=60)
+        except HTTPError as e:
+            # 416: nothing left past `offset`, i.e. an earlier run got the whole file but stopped before the rename
+            if not offset or e.code != 416:
+                raise
+            e.close()
+            if self._partial_is_complete(offset, e.headers.get("Content-Range")):
+                logger.info(f"{self.partial_file_path} already holds the whole file, finishing the download")
+                return
+            logger.warning(f"server rejected the range request at {offset} bytes, restarting download from scratch")
+            self.partial_file_path.unlink()
+            return self._download_with_resume()
+
+        with response:
+            if offset and response.status != 206:
+                logger.info("server ignored the range request, restarting download from scratch")
+                offset = 0
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+
+            mode = "ab" if offset else "wb"
+            received = 0
+            with open(self.partial_file_path, mode) as f, \
+                    tqdm(total=total, initial=offset, unit="B", unit_scale=True, desc="download") as progress:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                    f.write(chunk)
+                    received += len(chunk)
+                    progress.update(len(chunk))
+
+        if total is not None and offset + received != total:
+            raise ConnectionError(f"download ended at {offset + received} of {total} bytes")
+        elapsed = time.perf_counter() - started
+        logger.info(f"downloaded {received / 1e6:.1f} MB in {elapsed:.1f}s "
+                    f"({received / 1e6 / max(elapsed, 1e-9):.1f} MB/s)")
+
+    def _partial_is_complete(self, size: int, content_range) -> bool:
+        # a 416 names the full size as "bytes */<size>"; without it only the expected sha256 can tell
+        match = re.fullmatch(r"bytes \*/(\d+)", (content_range or "").strip())
+        if match is not None and int(match.group(1)) != size:
+            return False
+        if self.config.source_sha256:
+            return sha256_file(self.partial_file_path) == self.config.source_sha256
+        return match is not None
 
     def get_updated_list_of_files(self,list_of_files):
         return [f for f in list_of_files if f.endswith(".jpg")]
 
-    def preprocess(self,zf,f,working_dir):
-        target_filepath=os.path.join(working_dir,f)
-        if not os.path.exists(target_filepath):
-            zf.extract(f,working_dir)
+    def _partition(self, infos):
+        # greedy size balancing, several partitions per worker so a resumed run loses little work
+        num_partitions = max(1, min(len(infos), self.config.num_workers * 4))
+        partitions = [[] for _ in range(num_partitions)]
+        loads = [0] * num_partitions
+        for info in sorted(infos, key=lambda i: i.compress_size, reverse=True):
+            target = loads.index(min(loads))
+            partitions[target].append(info.filename)
+            loads[target] += info.compress_size
+        return [sorted(p) for p in partitions if p]
 
     def unzip_and_clean(self):
+        unzip_dir = Path(self.config.unzip_dir)
+        manifest_path = unzip_dir / MANIFEST_FILE
+        stat = os.stat(self.config.local_data_file)
+        zip_fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        manifest = self._read_json(manifest_path)
+        if manifest.get("zip") != zip_fingerprint:
+            manifest = {"zip": zip_fingerprint, "partitions": None, "done": [], "complete": False}
+        if manifest["complete"]:
+            logger.info(f"{self.config.local_data_file} already extracted to {unzip_dir}, skipping")
+            return
+
         with ZipFile(file=self.config.local_data_file,mode="r") as zf:
-                list_of_file=zf.namelist()
-                updated_list_of_file=self.get_updated_list_of_files(list_of_file)
-                for f in tqdm(updated_list_of_file):
-                    self.preprocess(zf, f, self.config.unzip_dir)
+            wanted = set(self.get_updated_list_of_files(zf.namelist()))
+            infos = [info for info in zf.infolist() if info.filename in wanted]
+        if manifest["partitions"] is None:
+            manifest["partitions"] = self._partition(infos)
+            self._write_json(manifest_path, manifest)
+
+        # create every directory up front so workers never race on makedirs
+        for directory in {os.path.dirname(info.filename) for info in infos}:
+            (unzip_dir / directory).mkdir(parents=True, exist_ok=True)
+
+        pending = [i for i in range(len(manifest["partitions"])) if i not in set(manifest["done"])]
+        started = time.perf_counter()
+        files, extracted_bytes = 0, 0
+        with ProcessPoolExecutor(max_workers=self.config.num_workers) as pool:
+            futures = {
+                pool.submit(extract_partition, str(self.config.local_data_file),
+                            manifest["partitions"][i], str(unzip_dir)): i
+                for i in pending
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="extract"):
+                count, size = future.result()
+                files += count
+                extracted_bytes += size
+                manifest["done"].append(futures[future])
+                self._write_json(manifest_path, manifest)
+
+        manifest["complete"] = True
+        self._write_json(manifest_path, manifest)
+        elapsed = time.perf_counter() - started
+        logger.info(f"extracted {files} files ({extracted_bytes / 1e6:.1f} MB) in {elapsed:.1f}s: "
+                    f"{files / max(elapsed, 1e-9):.1f} files/s, {extracted_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s")
@@ -3,23 +3,98 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 from pathlib import Path
 import tensorflow as tf
+from src.CNNClassifier import logger
 from src.CNNClassifier.entity import PrepareBaseModelConfig
+from src.CNNClassifier.utils.preprocessing import input_adapter
+
+# BASE_MODEL -> (keras.applications constructor, input convention it was trained on, extra arguments)
+BACKBONES = {
+    "vgg16": ("VGG16", "caffe", {}),
+    "resnet50": ("ResNet50", "caffe", {}),
+    "mobilenet_v2": ("MobileNetV2", "tf", {}),
+    "mobilenet_v3_small": ("MobileNetV3Small", "raw", {"include_preprocessing": True}),
+    "mobilenet_v3_large": ("MobileNetV3Large", "raw", {"include_preprocessing": True}),
+    "efficientnet_b0": ("EfficientNetB0", "raw", {}),
+}
+HEAD_POOLINGS = ("flatten", "avg")
+
+
+def count_macs(model: tf.keras.Model) -> int:
+    """
+    Multiply-accumulates of one forward pass per image, counted over the
+    layers with a kernel (Conv2D, DepthwiseConv2D, Dense); normalization
+    and activations add comparatively little and are left out.
+    """
+    macs = 0
+    for layer in model.layers:
+        kernel = getattr(layer, "kernel", None)
+        if kernel is None:
+            continue
+        positions = 1
+        for dim in layer.output.shape[1:-1]:
+            positions *= int(dim)
+        weights = 1
+        for dim in kernel.shape:
+            weights *= int(dim)
+        macs += positions * weights
+    return macs
 
 
 class PrepareBaseModel:
     def __init__(self, config: PrepareBaseModelConfig):
         self.config = config
 
+    @staticmethod
+    def build_base_model(base_model: str, image_size, weights, include_top: bool, preprocessing: str):
+        """
+        A keras.applications backbone behind a frozen per-pixel adapter that
+        maps the PREPROCESSING of the input pipeline onto the normalization
+        the backbone's weights expect, so every backbone works with either
+        mode. The adapter is a Dense(3) on the channel axis, a built-in layer
+        that saves and converts like any other, and is left out when the
+        conventions already agree (vgg16 with PREPROCESSING: vgg16).
+
+        Args:
+            base_model (str): Key of BACKBONES
+            image_size (list): Input shape, (height, width, 3)
+            weights (str): "imagenet" or None
+            include_top (bool): Keep the ImageNet classifier
+            preprocessing (str): PREPROCESSING mode of the input pipeline
+
+        Returns:
+            tf.keras.Model: The backbone, with the adapter as its first layer
+        """
+        if base_model not in BACKBONES:
+            raise ValueError(f"Unknown BASE_MODEL {base_model!r}, expected one of {list(BACKBONES)}")
+        constructor, convention, kwargs = BACKBONES[base_model]
+        inputs = tf.keras.Input(shape=tuple(image_size), name="image")
+        outputs = inputs
+        adapter = input_adapter(preprocessing, convention)
+        if adapter is not None:
+            layer = tf.keras.layers.Dense(3, name="input_adapter", trainable=False)
+            outputs = layer(inputs)
+            layer.set_weights(list(adapter))
+        return getattr(tf.keras.applications, constructor)(
+            input_tensor=outputs,
+            weights=weights,
+            include_top=include_top,
+            **kwargs
+        )
+
     def get_base_model(self):
-        self.model = tf.keras.applications.vgg16.VGG16(
-            input_shape=self.config.params_image_size,
+        self.model = self.build_base_model(
+            base_model=self.config.params_base_model,
+            image_size=self.config.params_image_size,
             weights=self.config.params_weights,
-            include_top=self.config.params_include_top
+            include_top=self.config.params_include_top,
+            preprocessing=self.config.params_preprocessing
         )
+        logger.info(f"{self.config.params_base_model} backbone: {self.model.count_params():,} parameters, "
+                    f"{2 * count_macs(self.model) / 1e9:.2f} GFLOPs per image")
         self.save_model(path=self.config.base_model_path, model=self.model)
 
     @staticmethod
-    def prepare_full_model(model, classes, freeze_all, freeze_till, learning_rate):
+    def prepare_full_model(model, classes, freeze_all, freeze_till, learning_rate, pooling="flatten"):
         if freeze_all:
             for layer in model.layers:
                 layer.trainable = False  # Freeze individual layers
@@ -27,11 +102,17 @@ class PrepareBaseModel:
             for layer in model.layers[:-freeze_till]:
                 layer.trainable = False  # Freeze individual layers
 
-        flatten_out = tf.keras.layers.Flatten()(model.output)
+        if pooling not in HEAD_POOLINGS:
+            raise ValueError(f"Unknown HEAD_POOLING {pooling!r}, expected one of {HEAD_POOLINGS}")
+        # no weights, so it belongs to the frozen prefix and the feature cache stores pooled features
+        if pooling == "avg":
+            pool = tf.keras.layers.GlobalAveragePooling2D(trainable=False)
+        else:
+            pool = tf.keras.layers.Flatten(trainable=False)
         prediction = tf.keras.layers.Dense(
             units=classes,
             activation="softmax"
-        )(flatten_out)
+        )(pool(model.output))
 
         full_model = tf.keras.models.Model(
             inputs=model.input,
@@ -53,7 +134,8 @@ class PrepareBaseModel:
             classes=self.config.params_classes,
             freeze_all=True,
             freeze_till=None,
-            learning_rate=self.config.params_learning_rate
+            learning_rate=self.config.params_learning_rate,
+            pooling=self.config.params_head_pooling
         )
         self.save_model(path=self.config.updated_base_model_path, model=self.full_model)
 
@@ -2,40 +2,84 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 from src.CNNClassifier.entity import TrainingConfig
+from src.CNNClassifier.utils.dataset import SplitIndex, fingerprint_files
+from src.CNNClassifier.utils.image_cache import ImageCacheReader
+from src.CNNClassifier.utils.preprocessing import normalize_tensor
+from src.CNNClassifier.components.input_pipeline import ImageCacheSequence, ArraySequence, PreprocessedSequence, build_image_dataset, decode_and_resize, flow_from_file_list, instrument_input, sequence_to_dataset
+from src.CNNClassifier.components.callbacks import ThroughputLogger, InstrumentationCallback, ProfilerWindow, CheckpointCallback
+from src.CNNClassifier.components.checkpointing import TrainingCheckpointer
+from src.CNNClassifier.components.distributed import make_strategy, shard_indices, scale_learning_rate, check_resume_position, fit_distributed
+from src.CNNClassifier.components.feature_cache import FeatureCache, extracted_rows, frozen_prefix_length, split_model
+from src.CNNClassifier.components.fine_tuning import backbone_blocks, unfreeze_blocks, layerwise_multipliers, layerwise_optimizer
+from src.CNNClassifier.components.performance import configure_threads, prepare_for_training, compile_for_training
+from src.CNNClassifier.utils.instrumentation import RunRecorder
+from src.CNNClassifier import logger
+import contextlib
+import hashlib
+import json
+import numpy as np
 import tensorflow as tf
 from pathlib import Path
 
 
 class Training:
-    def __init__(self, config: TrainingConfig):
+    def __init__(self, config: TrainingConfig, model: tf.keras.Model = None):
         self.config = config
+        # a model handed over in memory by the pipeline runner skips the reload from disk
+        self.model = model
+        self.strategy, self.num_workers, self.worker_index = None, 1, 0
 
     def get_base_model(self):
-        self.model = tf.keras.models.load_model(self.config.updated_base_model_path)
+        configure_threads(self.config.performance)
+        # joins the multi-worker cluster when one is configured, before anything initialises TensorFlow
+        self.strategy, self.num_workers, self.worker_index = make_strategy(self.config.distributed)
+        if self.model is None:
+            with self.scope():
+                self.model = tf.keras.models.load_model(self.config.updated_base_model_path)
 
-    def train_valid_generator(self):
+    @property
+    def is_chief(self) -> bool:
+        return self.worker_index == 0
 
-        datagenerator_kwargs = dict(
-            rescale = 1./255,
-            validation_split=0.20
-        )
+    def scope(self):
+        """The distribution strategy scope, models and optimizers have to be built in it."""
+        return self.strategy.scope() if self.strategy is not None else contextlib.nullcontext()
+
+    def shard(self, indices: np.ndarray) -> np.ndarray:
+        """This worker's share of the split indices, all of them on one machine."""
+        return shard_indices(indices, self.num_workers, self.worker_index)
+
+    def train_valid_generator(self):
+        input_pipeline = self.config.params_input_pipeline
+        if input_pipeline == "directory":
+            self.directory_generator()
+        elif input_pipeline == "cache":
+            self.cache_generator()
+        elif input_pipeline == "tfdata":
+            self.tfdata_generator()
+        else:
+            raise ValueError(f"Unknown INPUT_PIPELINE {input_pipeline!r}, expected directory, cache or tfdata")
 
+    def directory_generator(self):
+        # normalization happens per batch in PreprocessedSequence, not per image in the generator
         dataflow_kwargs = dict(
             target_size=self.config.params_image_size[:-1],
             batch_size=self.config.params_batch_size,
             interpolation="bilinear"
         )
 
-        valid_datagenerator = tf.keras.preprocessing.image.ImageDataGenerator(
-            **datagenerator_kwargs
-        )
+        split = SplitIndex(self.config.split_index_path)
 
-        self.valid_generator = valid_datagenerator.flow_from_directory(
-            directory=self.config.training_data,
-            subset="validation",
-            shuffle=False,
-            **dataflow_kwargs
-        )
+        def flow(datagenerator, subset, shuffle):
+            indices = self.shard(split.indices(subset))
+            return PreprocessedSequence(flow_from_file_list(
+                datagenerator, self.config.training_data, [split.files[i] for i in indices], split.labels[indices],
+                split.class_names, shuffle=shuffle, **dataflow_kwargs
+            ), self.config.params_preprocessing)
+
+        valid_datagenerator = tf.keras.preprocessing.image.ImageDataGenerator()
+
+        self.valid_generator = flow(valid_datagenerator, subset="val", shuffle=False)
 
         if self.config.params_is_augmentation:
             train_datagenerator = tf.keras.preprocessing.image.ImageDataGenerator(
@@ -44,37 +88,464 @@ class Training:
                 width_shift_range=0.2,
                 height_shift_range=0.2,
                 shear_range=0.2,
-                zoom_range=0.2,
-                **datagenerator_kwargs
+                zoom_range=0.2
             )
         else:
             train_datagenerator = valid_datagenerator
 
-        self.train_generator = train_datagenerator.flow_from_directory(
-            directory=self.config.training_data,
-            subset="training",
+        self.train_generator = flow(train_datagenerator, subset="train", shuffle=True)
+        self.train_samples = self.train_generator.samples
+        self.valid_samples = self.valid_generator.samples
+
+    def cache_generator(self):
+        reader = ImageCacheReader(self.config.image_cache_dir)
+        if reader.image_size[:2] != tuple(self.config.params_image_size[:2]):
+            raise ValueError(f"image cache at {self.config.image_cache_dir} holds {reader.image_size[:2]} images, "
+                             f"IMAGE_SIZE is {self.config.params_image_size[:2]}; rerun stage_05_image_cache")
+        split = SplitIndex(self.config.split_index_path)
+
+        self.valid_generator = ImageCacheSequence(
+            reader=reader,
+            indices=self.shard(split.rows_in("val", reader.files)),
+            batch_size=self.config.params_batch_size,
+            shuffle=False,
+            preprocessing=self.config.params_preprocessing
+        )
+
+        augment_fn = None
+        if self.config.params_is_augmentation:
+            augmenter = tf.keras.preprocessing.image.ImageDataGenerator(
+                rotation_range=40,
+                horizontal_flip=True,
+                width_shift_range=0.2,
+                height_shift_range=0.2,
+                shear_range=0.2,
+                zoom_range=0.2
+            )
+            augment_fn = lambda batch: np.stack([augmenter.random_transform(image) for image in batch])
+
+        self.train_generator = ImageCacheSequence(
+            reader=reader,
+            indices=self.shard(split.rows_in("train", reader.files)),
+            batch_size=self.config.params_batch_size,
             shuffle=True,
-            **dataflow_kwargs
+            augment_fn=augment_fn,
+            preprocessing=self.config.params_preprocessing,
+            drop_remainder=True
         )
+        self.train_samples = self.train_generator.samples
+        self.valid_samples = self.valid_generator.samples
+
+    def tfdata_generator(self):
+        split = SplitIndex(self.config.split_index_path)
+        files, labels, class_names = split.files, split.labels, split.class_names
+        train_indices = self.shard(split.indices("train"))
+        valid_indices = self.shard(split.indices("val"))
+        filepaths = [os.path.join(self.config.training_data, f) for f in files]
+
+        def subset_dataset(indices, subset, training):
+            cache = self.config.params_tfdata_cache
+            if cache == "disk":
+                subset_files = [files[i] for i in indices]
+                fingerprint = fingerprint_files(self.config.training_data, subset_files,
+                                                extra={"image_size": list(self.config.params_image_size[:2])})
+                cache = str(Path(self.config.root_dir) / "tfdata_cache" / f"{subset}_{fingerprint[:16]}")
+            return build_image_dataset(
+                filepaths=[filepaths[i] for i in indices],
+                labels=labels[indices],
+                num_classes=len(class_names),
+                image_size=self.config.params_image_size[:2],
+                batch_size=self.config.params_batch_size,
+                training=training,
+                augment=training and self.config.params_is_augmentation,
+                cache=cache,
+                preprocessing=self.config.params_preprocessing
+            )
+
+        self.train_generator = subset_dataset(train_indices, "training", training=True)
+        self.valid_generator = subset_dataset(valid_indices, "validation", training=False)
+        self.train_samples = len(train_indices)
+        self.valid_samples = len(valid_indices)
 
     @staticmethod
     def save_model(path: Path, model: tf.keras.Model):
         model.save(path)
 
+    def instrument(self, data, label: str):
+        """
+        Hook the run log (and the profiler window, when PROFILE_STEPS is set)
+        into a `fit` call. With INSTRUMENTATION off only images/sec is logged;
+        the batches are the same either way.
+
+        Args:
+            data (tf.data.Dataset): Training input
+            label (str): Tag for the log lines
+
+        Returns:
+            tuple: (training input to fit on, callbacks)
+        """
+        instrumentation = self.config.instrumentation
+        run_label = "training"
+        if self.num_workers > 1:
+            label, run_label = f"{label} worker {self.worker_index}", f"training-worker{self.worker_index}"
+        if not instrumentation.params_enabled:
+            return data, [ThroughputLogger(self.config.params_batch_size, label=label)]
 
-    def train(self):
-        self.steps_per_epoch = self.train_generator.samples // self.train_generator.batch_size
-        self.validation_steps = self.valid_generator.samples // self.valid_generator.batch_size
+        self.recorder = RunRecorder(instrumentation.run_log_dir, run_label, metadata={
+            "input_pipeline": self.config.params_input_pipeline,
+            "training_mode": self.config.params_training_mode,
+            "batch_size": self.config.params_batch_size,
+            "num_workers": self.num_workers,
+            "epochs": self.config.params_epochs,
+            "image_size": list(self.config.params_image_size),
+            "preprocessing": self.config.params_preprocessing,
+            "augmentation": self.config.params_is_augmentation,
+            "jit_compile": self.config.performance.params_jit_compile,
+            "mixed_precision": self.config.performance.params_mixed_precision,
+        })
+        profiler = None
+        if instrumentation.params_profile_steps:
+            start_step, stop_step = instrumentation.params_profile_steps
+            profiler = ProfilerWindow(self.recorder.run_dir / "profile", start_step, stop_step)
+        callback = InstrumentationCallback(self.recorder, self.config.params_batch_size, profiler=profiler)
+        return instrument_input(data, self.recorder), [callback]
 
-        self.model.fit(
-            self.train_generator,
-            epochs=self.config.params_epochs,
-            steps_per_epoch=self.steps_per_epoch,
-            validation_steps=self.validation_steps,
-            validation_data=self.valid_generator
+
+    def feature_source(self):
+        """
+        Un-shuffled, un-augmented batches over the whole dataset and where the
+        train and val images are among them.
+
+        Returns:
+            tuple: (batch iterable, labels, dataset fingerprint, {"train": rows, "val": rows}); the
+                tf.data batches are (images, rows) pairs without the undecodable files
+        """
+        split = SplitIndex(self.config.split_index_path)
+        if self.config.params_input_pipeline == "cache":
+            reader = ImageCacheReader(self.config.image_cache_dir)
+            sequence = ImageCacheSequence(reader, np.arange(len(reader)), self.config.params_batch_size,
+                                          preprocessing=self.config.params_preprocessing)
+            batches = (sequence[i][0] for i in range(len(sequence)))
+            rows = {subset: split.rows_in(subset, reader.files) for subset in ("train", "val")}
+            # the features depend on the normalization, so it is part of the key
+            return (batches, np.asarray(reader.labels),
+                    f"{reader.index['fingerprint']}:{self.config.params_preprocessing}", rows)
+
+        files, labels = split.files, split.labels
+        image_size = tuple(int(dim) for dim in self.config.params_image_size[:2])
+        preprocessing = self.config.params_preprocessing
+        # every image carries its row: ignore_errors drops undecodable files, and the feature cache
+        # has to leave exactly those rows out rather than shift every later one onto the wrong label
+        dataset = tf.data.Dataset.from_tensor_slices(
+            ([os.path.join(self.config.training_data, f) for f in files], np.arange(len(files)))
+        ).map(
+            lambda path, row: (decode_and_resize(path, image_size), row), num_parallel_calls=tf.data.AUTOTUNE
+        ).ignore_errors(log_warning=True).batch(self.config.params_batch_size).map(
+            lambda images, rows: (normalize_tensor(images, preprocessing), rows), num_parallel_calls=tf.data.AUTOTUNE
+        ).prefetch(tf.data.AUTOTUNE)
+        batches = ((images.numpy(), rows.numpy()) for images, rows in dataset)
+        fingerprint = fingerprint_files(self.config.training_data, files,
+                                        extra={"preprocessing": self.config.params_preprocessing})
+        return batches, labels, fingerprint, {subset: split.indices(subset) for subset in ("train", "val")}
+
+    def train_on_cached_features(self, callbacks=()):
+        if self.config.params_is_augmentation:
+            raise ValueError("TRAINING_MODE: feature_cache needs AUGMENTATION: False, "
+                             "augmented images never produce the same backbone features twice")
+        if self.num_workers > 1:
+            raise ValueError("TRAINING_MODE: feature_cache trains on one machine, the head alone does not "
+                             "need a cluster; use TRAINING_MODE: full for multi-worker training")
+
+        prefix, head = split_model(self.model, frozen_prefix_length(self.model))
+        batches, labels, fingerprint, rows = self.feature_source()
+        features, labels = FeatureCache(
+            self.config.feature_cache_dir, dtype=self.config.params_feature_cache_dtype
+        ).get_or_build(prefix, batches, labels, self.config.params_image_size, fingerprint)
+        rows = {subset: extracted_rows(labels, subset_rows) for subset, subset_rows in rows.items()}
+
+        # the head shares its layers with self.model, so fitting it trains the full model
+        optimizer = self.model.optimizer
+        head.compile(
+            optimizer=type(optimizer).from_config(optimizer.get_config()),
+            loss=tf.keras.losses.CategoricalCrossentropy(),
+            metrics=["accuracy"]
+        )
+        num_classes = int(head.output.shape[-1])
+        train_sequence = ArraySequence(
+            features, labels, rows["train"],
+            num_classes=num_classes, batch_size=self.config.params_batch_size, shuffle=True, drop_remainder=True
         )
+        valid_sequence = ArraySequence(
+            features, labels, rows["val"],
+            num_classes=num_classes, batch_size=self.config.params_batch_size
+        )
+        logger.info(f"training {head.name} on {train_sequence.samples} cached feature rows")
+        self.fit(head, train_sequence, steps_per_epoch=len(train_sequence), label="feature_cache",
+                 callbacks=callbacks, validation_data=valid_sequence)
+
+    def train_progressively(self, callbacks=()):
+        """
+        TRAINING_MODE: progressive. The first phase usually trains the head
+        alone, every later one unfreezes more backbone blocks from the head
+        backwards and trains them at learning rates decaying by
+        FINE_TUNE_LR_DECAY per block. Between phases the model is only
+        recompiled, never reloaded from disk.
+
+        With FINE_TUNE_FEATURE_CACHE each phase fits just the layers behind
+        its frozen prefix, on that prefix's outputs; the outputs of every
+        phase's prefix are extracted together in one pass over the images
+        and cached, so a phase pays only for the layers it trains.
+        """
+        fine_tuning = self.config.fine_tuning
+        phases = fine_tuning.params_phases
+        if not phases:
+            raise ValueError("TRAINING_MODE: progressive needs at least one FINE_TUNE_PHASES entry")
+        with self.scope():
+            self.model = prepare_for_training(self.model, self.config.performance)
+        model = self.model
+        optimizer = model.optimizer
+        if isinstance(optimizer, tf.keras.mixed_precision.LossScaleOptimizer):
+            optimizer = optimizer.inner_optimizer
+        head_start = frozen_prefix_length(model)
+        blocks = backbone_blocks(model, head_start)
+        if phases[-1]["unfreeze_blocks"] > len(blocks):
+            raise ValueError(f"FINE_TUNE_PHASES unfreezes up to {phases[-1]['unfreeze_blocks']} blocks, "
+                             f"the backbone has {len(blocks)}")
+        boundaries = [blocks[-phase["unfreeze_blocks"]][0] if phase["unfreeze_blocks"] else head_start
+                      for phase in phases]
+
+        cached = None
+        if fine_tuning.params_feature_cache and (self.config.params_is_augmentation or self.num_workers > 1):
+            logger.warning("FINE_TUNE_FEATURE_CACHE needs AUGMENTATION: False on one machine, "
+                           "every phase runs the whole model with its prefix frozen instead")
+        elif fine_tuning.params_feature_cache:
+            batches, labels, fingerprint, rows = self.feature_source()
+            unique = sorted(set(boundaries))
+            features = FeatureCache(
+                self.config.feature_cache_dir, dtype=self.config.params_feature_cache_dtype
+            ).get_or_build_many([split_model(model, boundary)[0] for boundary in unique], batches, labels,
+                                self.config.params_image_size, fingerprint)
+            cached = dict(zip(unique, features))
+            # every prefix was extracted from the same images, so any one's labels tell which rows exist
+            rows = {subset: extracted_rows(features[0][1], subset_rows) for subset, subset_rows in rows.items()}
+
+        run_fingerprint = self.checkpoint_fingerprint(0, {"phases": phases, "lr_decay": fine_tuning.params_lr_decay,
+                                                          "feature_cache": cached is not None})
+        done = self.restore_phases(run_fingerprint)
+        num_classes = int(model.output.shape[-1])
+        self.phase_histories = []
+        for number, phase in enumerate(phases):
+            # blocks only ever get unfrozen, so replaying the flags of finished phases is enough
+            unfreeze_blocks(model, blocks, phase["unfreeze_blocks"])
+            if number < done:
+                continue
+            multipliers = layerwise_multipliers(model, blocks, phase["unfreeze_blocks"], fine_tuning.params_lr_decay)
+            label = f"phase {number + 1}/{len(phases)}"
+            with self.scope():
+                phase_optimizer = layerwise_optimizer(optimizer, phase["learning_rate"], multipliers)
+            if self.num_workers > 1:
+                scale_learning_rate(phase_optimizer, self.num_workers, self.config.distributed.params_lr_scaling)
+
+            if cached is not None:
+                features, labels = cached[boundaries[number]]
+                _, suffix = split_model(model, boundaries[number])
+                compile_for_training(suffix, phase_optimizer, model.loss, self.config.performance)
+                train_sequence = ArraySequence(
+                    features, labels, rows["train"], num_classes=num_classes,
+                    batch_size=self.config.params_batch_size, shuffle=True, drop_remainder=True
+                )
+                valid_sequence = ArraySequence(
+                    features, labels, rows["val"], num_classes=num_classes, batch_size=self.config.params_batch_size
+                )
+                logger.info(f"{label}: training the head and {phase['unfreeze_blocks']} unfrozen blocks on cached "
+                            f"{tuple(features.shape[1:])} features, learning rate {phase['learning_rate']:g}")
+                self.fit(suffix, train_sequence, steps_per_epoch=len(train_sequence), label=label, callbacks=callbacks,
+                         epochs=phase["epochs"], phase=phase, validation_data=valid_sequence)
+            else:
+                with self.scope():
+                    compile_for_training(model, phase_optimizer, model.loss, self.config.performance)
+                logger.info(f"{label}: training the head and {phase['unfreeze_blocks']} unfrozen blocks, "
+                            f"learning rate {phase['learning_rate']:g}")
+                self.fit(model, self.train_generator, steps_per_epoch=self.train_samples // self.config.params_batch_size,
+                         label=label, callbacks=callbacks, epochs=phase["epochs"], phase=phase,
+                         validation_steps=self.valid_samples // self.config.params_batch_size,
+                         validation_data=self.valid_generator)
+            self.phase_histories.append(self.history.history)
+            if self.checkpointer is not None:
+                self.checkpointer.mark_complete()
+            self.save_phase(number + 1, run_fingerprint)
+
+        # the layer-wise optimizer does not serialize, the saved model gets a plain one like every other mode
+        with self.scope():
+            compile_for_training(model, type(optimizer).from_config(optimizer.get_config()), model.loss,
+                                 self.config.performance)
+        self.checkpointer = None
+
+    def phase_state_path(self) -> Path:
+        return Path(self.config.checkpoint_dir) / "phases.json"
 
+    def restore_phases(self, fingerprint: str) -> int:
+        """
+        Load the weights saved after the last finished phase of an
+        interrupted progressive run with the same setup.
+
+        Returns:
+            int: Number of phases already trained
+        """
+        path = self.phase_state_path()
+        if not self.config.params_checkpoint or not path.exists():
+            return 0
+        with open(path) as f:
+            state = json.load(f)
+        if state.get("fingerprint") != fingerprint:
+            return 0
+        self.model.load_weights(Path(self.config.checkpoint_dir) / state["weights"])
+        logger.info(f"resuming progressive fine-tuning after phase {state['completed']}")
+        return state["completed"]
+
+    def save_phase(self, completed: int, fingerprint: str):
+        if not self.config.params_checkpoint or not self.is_chief:
+            return
+        directory = Path(self.config.checkpoint_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"phase_{completed}.weights.h5"
+        # Keras insists on the .weights.h5 suffix, so the temporary name keeps it
+        tmp = directory / f"phase_{completed}.tmp.weights.h5"
+        self.model.save_weights(tmp)
+        os.replace(tmp, directory / name)
+        state_tmp = directory / "phases.json.tmp"
+        with open(state_tmp, "w") as f:
+            json.dump({"fingerprint": fingerprint, "completed": completed, "weights": name}, f, indent=4)
+        os.replace(state_tmp, self.phase_state_path())
+        (directory / f"phase_{completed - 1}.weights.h5").unlink(missing_ok=True)
+
+    def clear_phases(self):
+        """Called once the trained model is saved, so the next run starts from the first phase."""
+        path = self.phase_state_path()
+        if not path.exists():
+            return
+        with open(path) as f:
+            state = json.load(f)
+        (Path(self.config.checkpoint_dir) / state["weights"]).unlink(missing_ok=True)
+        path.unlink()
+
+    def checkpoint_fingerprint(self, steps_per_epoch: int, phase: dict = None) -> str:
+        # EPOCHS is left out, so an interrupted run can also be resumed with more epochs
+        base_model = os.stat(self.config.updated_base_model_path)
+        # a new split reorders the steps, an old checkpoint's position would be meaningless
+        split_index = os.stat(self.config.split_index_path)
+        return hashlib.sha256(json.dumps({
+            "base_model": [base_model.st_size, base_model.st_mtime_ns],
+            "split_index": [split_index.st_size, split_index.st_mtime_ns],
+            "training_mode": self.config.params_training_mode,
+            "input_pipeline": self.config.params_input_pipeline,
+            "batch_size": self.config.params_batch_size,
+            "num_workers": self.num_workers,
+            "steps_per_epoch": steps_per_epoch,
+            "image_size": list(self.config.params_image_size),
+            "preprocessing": self.config.params_preprocessing,
+            "augmentation": self.config.params_is_augmentation,
+            "mixed_precision": self.config.performance.params_mixed_precision,
+            "phase": phase,
+        }, sort_keys=True).encode()).hexdigest()
+
+    def fit(self, model: tf.keras.Model, train_data, steps_per_epoch: int, label: str, callbacks=(),
+            epochs: int = None, phase: dict = None, **fit_kwargs):
+        """
+        `model.fit` on the endless `train_data` stream, resumed from the last
+        checkpoint of an interrupted run when CHECKPOINT is on. In a
+        multi-worker cluster `fit_distributed` trains on this worker's shard
+        and only the chief writes checkpoints.
+
+        Args:
+            model (tf.keras.Model): Compiled model to fit, the full model or the head
+            train_data: Training input, a Sequence or a repeated tf.data.Dataset
+            steps_per_epoch (int): Steps per epoch
+            label (str): Tag for the log lines
+            callbacks (sequence, optional): Extra Keras callbacks
+            epochs (int, optional): Epochs to train, EPOCHS if None
+            phase (dict, optional): The fine-tuning phase being trained, checkpoints only resume the same phase
+            **fit_kwargs: Passed on to `fit`, e.g. validation_data
+        """
+        epochs = self.config.params_epochs if epochs is None else epochs
+        self.checkpointer = None
+        initial_epoch, initial_step, start_step, checkpointing = 0, 0, 0, []
+        if self.config.params_checkpoint:
+            self.checkpointer = TrainingCheckpointer(
+                self.config.checkpoint_dir, model, self.checkpoint_fingerprint(steps_per_epoch, phase),
+                max_to_keep=self.config.params_checkpoint_max_to_keep,
+                read_only=not self.is_chief
+            )
+            with self.scope():
+                initial_epoch, initial_step = self.checkpointer.restore()
+            start_step = initial_epoch * steps_per_epoch + initial_step
+            if self.strategy is not None:
+                check_resume_position(self.strategy, start_step)
+            checkpointing = [CheckpointCallback(self.checkpointer, steps_per_epoch,
+                                                every_steps=self.config.params_checkpoint_every_steps,
+                                                initial_step=initial_step)]
+
+        # one conversion for every run, fresh or resumed, instrumented or not, so they all see the same batches
+        if not isinstance(train_data, tf.data.Dataset):
+            train_data = sequence_to_dataset(train_data, repeat=True, start_step=start_step, steps_per_pass=steps_per_epoch)
+        elif start_step:
+            # the pipeline still produces the skipped batches, read from its cache when it has one
+            train_data = train_data.skip(start_step)
+        train_data, monitoring = self.instrument(train_data, label=label)
+        if self.strategy is None:
+            self.history = model.fit(
+                train_data,
+                epochs=epochs,
+                initial_epoch=initial_epoch,
+                steps_per_epoch=steps_per_epoch,
+                callbacks=[*checkpointing, *monitoring, *callbacks],
+                **fit_kwargs
+            )
+            return
+
+        validation_data = fit_kwargs.get("validation_data")
+        if validation_data is not None and not isinstance(validation_data, tf.data.Dataset):
+            validation_data = sequence_to_dataset(validation_data)
+        self.history = fit_distributed(
+            self.strategy, model, train_data,
+            steps_per_epoch=steps_per_epoch,
+            epochs=epochs,
+            global_batch_size=self.config.params_batch_size * self.num_workers,
+            initial_epoch=initial_epoch,
+            callbacks=[*checkpointing, *monitoring, *callbacks],
+            validation_data=validation_data,
+            validation_steps=fit_kwargs.get("validation_steps")
+        )
+
+    def train(self, callbacks=()):
+        """
+        Args:
+            callbacks (sequence, optional): Extra Keras callbacks, e.g. early stopping in a sweep trial
+        """
+        if self.config.params_training_mode == "feature_cache":
+            self.train_on_cached_features(callbacks)
+        elif self.config.params_training_mode == "progressive":
+            self.train_progressively(callbacks)
+        else:
+            with self.scope():
+                self.model = prepare_for_training(self.model, self.config.performance)
+            if self.num_workers > 1:
+                # BATCH_SIZE is per worker, so each step averages over num_workers times as many images
+                scale_learning_rate(self.model.optimizer, self.num_workers, self.config.distributed.params_lr_scaling)
+            self.steps_per_epoch = self.train_samples // self.config.params_batch_size
+            self.validation_steps = self.valid_samples // self.config.params_batch_size
+            self.fit(self.model, self.train_generator, steps_per_epoch=self.steps_per_epoch,
+                     label=self.config.params_input_pipeline, callbacks=callbacks,
+                     validation_steps=self.validation_steps, validation_data=self.valid_generator)
+
+        if not self.is_chief:
+            # every worker holds the same weights, the chief saves them
+            return
         self.save_model(
             path=self.config.trained_model_path,
             model=self.model
-        )
\ No newline at end of file
+        )
+        if self.checkpointer is not None:
+            self.checkpointer.mark_complete()
+        if self.config.params_training_mode == "progressive":
+            self.clear_phases()
\ No newline at end of file
@@ -1,39 +1,54 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import time
+from concurrent.futures import ThreadPoolExecutor
 import tensorflow as tf
 from pathlib import Path
 from src.CNNClassifier.entity import EvaluationConfig
 from src.CNNClassifier.utils.utils import save_json
+from src.CNNClassifier.utils.dataset import SplitIndex
+from src.CNNClassifier.utils.image_cache import ImageCacheReader
+from src.CNNClassifier.utils.metrics import StreamingClassificationMetrics, LatencyRecorder
+from src.CNNClassifier.utils.instrumentation import RunRecorder
+from src.CNNClassifier.components.input_pipeline import ImageCacheSequence, PreprocessedSequence, flow_from_file_list
+from src.CNNClassifier.components.callbacks import ProfilerWindow
+from src.CNNClassifier import logger
 from urllib.parse import urlparse
 
 class Evaluation:
-    def __init__(self, config: EvaluationConfig):
+    def __init__(self, config: EvaluationConfig, model: tf.keras.Model = None):
         self.config = config
+        self.model = model
 
     def valid_generator(self):
+        # the held-out test subset, training never saw it, not even for early stopping
+        split = SplitIndex(self.config.split_index_path)
+        if self.config.params_input_pipeline == "cache":
+            reader = ImageCacheReader(self.config.image_cache_dir)
+            self.valid_generator = ImageCacheSequence(
+                reader=reader,
+                indices=split.rows_in("test", reader.files),
+                batch_size=self.config.params_batch_size,
+                shuffle=False,
+                preprocessing=self.config.params_preprocessing
+            )
+            return
 
-        datagenerator_kwargs = dict(
-            rescale = 1./255,
-            validation_split=0.30
-        )
-
+        # normalization happens per batch in PreprocessedSequence, not per image in the generator
         dataflow_kwargs = dict(
             target_size=self.config.params_image_size[:-1],
             batch_size=self.config.params_batch_size,
             interpolation="bilinear"
         )
 
-        valid_datagenerator = tf.keras.preprocessing.image.ImageDataGenerator(
-            **datagenerator_kwargs
-        )
+        valid_datagenerator = tf.keras.preprocessing.image.ImageDataGenerator()
 
-        self.valid_generator = valid_datagenerator.flow_from_directory(
-            directory=self.config.training_data,
-            subset="validation",
-            shuffle=False,
-            **dataflow_kwargs
-        )
+        indices = split.indices("test")
+        self.valid_generator = PreprocessedSequence(flow_from_file_list(
+            valid_datagenerator, self.config.training_data, [split.files[i] for i in indices], split.labels[indices],
+            split.class_names, shuffle=False, **dataflow_kwargs
+        ), self.config.params_preprocessing)
 
 
     @staticmethod
@@ -41,13 +56,101 @@ class Evaluation:
         return tf.keras.models.load_model(path)
     
     
+    @staticmethod
+    def class_names(generator):
+        if hasattr(generator, "class_indices"):
+            return sorted(generator.class_indices, key=generator.class_indices.get)
+        return list(generator.reader.class_names)
+
+    def start_recording(self):
+        """
+        Returns:
+            tuple: (RunRecorder, ProfilerWindow or None), or (None, None) with INSTRUMENTATION off
+        """
+        instrumentation = self.config.instrumentation
+        if not instrumentation.params_enabled:
+            return None, None
+        recorder = RunRecorder(instrumentation.run_log_dir, "evaluation", metadata={
+            "input_pipeline": self.config.params_input_pipeline,
+            "batch_size": self.config.params_batch_size,
+            "image_size": list(self.config.params_image_size),
+            "preprocessing": self.config.params_preprocessing,
+        })
+        recorder.start()
+        recorder.begin_epoch(0)
+        profiler = None
+        if instrumentation.params_profile_steps:
+            start_step, stop_step = instrumentation.params_profile_steps
+            profiler = ProfilerWindow(recorder.run_dir / "profile", start_step, stop_step)
+        return recorder, profiler
+
+    def predict_and_score(self, generator) -> dict:
+        """
+        One batched prediction pass that feeds every metric at once. The next
+        batch is loaded on a background thread while the current one is predicted;
+        the time spent waiting for it and the prediction time go to the run log.
+
+        Returns:
+            dict: Classification metrics plus per-batch latency and throughput
+        """
+        metrics = StreamingClassificationMetrics(
+            num_classes=int(self.model.output_shape[-1]), class_names=self.class_names(generator)
+        )
+        latency = LatencyRecorder()
+        recorder, profiler = self.start_recording()
+        num_batches = len(generator)
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=1) as loader:
+                pending = loader.submit(generator.__getitem__, 0) if num_batches else None
+                for i in range(num_batches):
+                    if profiler is not None:
+                        profiler.before_step(i)
+                    wait_started = time.perf_counter()
+                    images, labels = pending.result()
+                    if i + 1 < num_batches:
+                        pending = loader.submit(generator.__getitem__, i + 1)
+                    batch_started = time.perf_counter()
+                    probabilities = self.model.predict_on_batch(images)
+                    batch_s = time.perf_counter() - batch_started
+                    latency.record(batch_s, len(images))
+                    metrics.update(labels, probabilities)
+                    if recorder is not None:
+                        recorder.record_step(len(images), batch_started - wait_started, batch_s)
+                    if profiler is not None:
+                        profiler.after_step(i)
+        finally:
+            if profiler is not None:
+                profiler.close()
+        elapsed = time.perf_counter() - started
+        if recorder is not None:
+            recorder.end_epoch()
+            recorder.close()
+
+        report = metrics.result()
+        report["latency"] = latency.result()
+        report["latency"]["end_to_end_items_per_sec"] = metrics.samples / elapsed if elapsed > 0 else 0.0
+        logger.info(f"evaluated {metrics.samples} images in {elapsed:.1f}s: accuracy {report['accuracy']:.4f}, "
+                    f"macro F1 {report['macro_f1']:.4f}, p50 batch {report['latency']['p50_batch_ms']:.1f} ms, "
+                    f"{report['latency']['end_to_end_items_per_sec']:.1f} images/sec")
+        return report
+
     def evaluation(self):
-        self.model = self.load_model(self.config.path_of_model)
+        if self.model is None:
+            self.model = self.load_model(self.config.path_of_model)
         self.valid_generator()
-        self.score = self.model.evaluate(self.valid_generator)
+        self.report = self.predict_and_score(self.valid_generator)
+        self.score = [self.report["loss"], self.report["accuracy"]]
 
     def save_score(self):
-        scores = {"loss": self.score[0], "accuracy": self.score[1]}
+        scores = {
+            "loss": self.score[0],
+            "accuracy": self.score[1],
+            "macro_f1": self.report["macro_f1"],
+            "macro_roc_auc": self.report["macro_roc_auc"],
+            "expected_calibration_error": self.report["expected_calibration_error"]
+        }
         save_json(path=Path("scores.json"), data=scores)
+        save_json(path=Path(self.config.report_path), data=self.report)
 
    
\ No newline at end of file
@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from tqdm import tqdm
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import ImageCacheConfig
+from src.CNNClassifier.utils import image_cache
+from src.CNNClassifier.utils.dataset import SplitIndex, fingerprint_files
+from src.CNNClassifier.utils.preprocessing import load_image
+
+
+class ImageCache:
+    def __init__(self, config: ImageCacheConfig):
+        self.config = config
+
+    @property
+    def target_size(self):
+        height, width = self.config.params_image_size[:2]
+        return height, width
+
+    def load_image(self, relpath):
+        return load_image(os.path.join(self.config.source_dir, relpath), self.target_size)
+
+    def _decode(self, relpath):
+        try:
+            return self.load_image(relpath)
+        except Exception as e:
+            logger.warning(f"skipping undecodable image {relpath}: {e}")
+            return None
+
+    def build(self):
+        # every subset is cached, the stages pick their rows by path through the split index
+        split = SplitIndex(self.config.split_index_path)
+        files, labels, class_names = split.files, split.labels, split.class_names
+        fingerprint = fingerprint_files(
+            self.config.source_dir, files,
+            extra={"image_size": list(self.target_size), "version": image_cache.CACHE_FORMAT_VERSION}
+        )
+        if image_cache.is_up_to_date(self.config.root_dir, fingerprint):
+            logger.info(f"image cache at {self.config.root_dir} is up to date, skipping rebuild")
+            return
+
+        started = time.perf_counter()
+        os.makedirs(self.config.root_dir, exist_ok=True)
+        (self.config.root_dir / image_cache.INDEX_FILE).unlink(missing_ok=True)
+        for stale in self.config.root_dir.glob("shard_*.npy"):
+            stale.unlink()
+
+        kept_files, kept_labels, shards, skipped = [], [], [], []
+        pending = []
+        shard_size = self.config.shard_size
+        with ThreadPoolExecutor(max_workers=self.config.num_workers) as pool:
+            for chunk_start in range(0, len(files), shard_size):
+                chunk_files = files[chunk_start:chunk_start + shard_size]
+                decoded = pool.map(self._decode, chunk_files)
+                for i, img in enumerate(tqdm(decoded, total=len(chunk_files), desc=f"shard {len(shards)}")):
+                    if img is None:
+                        skipped.append(chunk_files[i])
+                        continue
+                    pending.append(img)
+                    kept_files.append(chunk_files[i])
+                    kept_labels.append(labels[chunk_start + i])
+                # every shard but the last holds exactly shard_size images, so index // shard_size finds it
+                while len(pending) >= shard_size:
+                    shards.append(self._write_shard(len(shards), pending[:shard_size]))
+                    pending = pending[shard_size:]
+        if pending:
+            shards.append(self._write_shard(len(shards), pending))
+
+        np.save(self.config.root_dir / image_cache.LABELS_FILE, np.asarray(kept_labels, dtype=np.int32))
+        image_cache.write_index(self.config.root_dir, {
+            "version": image_cache.CACHE_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "image_size": list(self.target_size) + [3],
+            "class_names": class_names,
+            "shard_size": shard_size,
+            "shards": shards,
+            "files": kept_files,
+            "skipped": skipped,
+        })
+        elapsed = time.perf_counter() - started
+        logger.info(f"cached {len(kept_files)} images in {len(shards)} shards ({len(skipped)} skipped) "
+                    f"in {elapsed:.1f}s, {len(kept_files) / max(elapsed, 1e-9):.1f} images/s")
+
+    def _write_shard(self, shard_id, images):
+        shard_name = image_cache.SHARD_TEMPLATE.format(shard_id)
+        shard = np.lib.format.open_memmap(
+            self.config.root_dir / shard_name, mode="w+", dtype=np.uint8,
+            shape=(len(images),) + self.target_size + (3,)
+        )
+        for row, img in enumerate(images):
+            shard[row] = img
+        shard.flush()
+        del shard
+        return {"file": shard_name, "count": len(images)}
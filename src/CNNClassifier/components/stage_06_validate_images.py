@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from tqdm import tqdm
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import ImageValidationConfig
+from src.CNNClassifier.utils.dataset import list_image_files
+
+INDEX_VERSION = 1
+
+# formats tf.io.decode_image can read, so every validated file works in all input pipelines
+SIGNATURES = {
+    b"\xff\xd8\xff": "JPEG",
+    b"\x89PNG\r\n\x1a\n": "PNG",
+    b"GIF87a": "GIF",
+    b"GIF89a": "GIF",
+    b"BM": "BMP",
+}
+
+
+def validate_image(path):
+    """
+    Returns:
+        tuple: (is_valid, reason) for one image file
+    """
+    try:
+        if os.path.getsize(path) == 0:
+            return False, "empty file"
+        with open(path, "rb") as f:
+            header = f.read(16)
+        detected = next((fmt for magic, fmt in SIGNATURES.items() if header.startswith(magic)), None)
+        if detected is None:
+            return False, f"unrecognised header {header[:4].hex()}"
+
+        with Image.open(path) as img:
+            img.verify()
+        # verify() does not decode pixel data, a full load catches truncated files
+        with Image.open(path) as img:
+            img.load()
+            if img.format != detected:
+                return False, f"header says {detected}, decoder says {img.format}"
+            img.convert("RGB")
+        return True, ""
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+class ImageValidation:
+    def __init__(self, config: ImageValidationConfig):
+        self.config = config
+
+    def load_index(self):
+        if not self.config.index_path.exists():
+            return {}
+        with open(self.config.index_path) as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION:
+            return {}
+        return index["files"]
+
+    def validate(self):
+        started = time.perf_counter()
+        previous = self.load_index()
+        files, _, _ = list_image_files(self.config.source_dir)
+
+        entries, to_check = {}, []
+        for relpath in files:
+            stat = os.stat(os.path.join(self.config.source_dir, relpath))
+            entry = previous.get(relpath)
+            if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                entries[relpath] = entry
+            else:
+                entries[relpath] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                to_check.append(relpath)
+
+        if to_check:
+            paths = [os.path.join(self.config.source_dir, relpath) for relpath in to_check]
+            chunksize = max(1, len(paths) // (self.config.num_workers * 16))
+            with ProcessPoolExecutor(max_workers=self.config.num_workers) as pool:
+                results = pool.map(validate_image, paths, chunksize=chunksize)
+                for relpath, (valid, reason) in tqdm(zip(to_check, results), total=len(to_check), desc="validate"):
+                    entries[relpath].update(valid=valid, reason=reason)
+
+        quarantined = {relpath: entry["reason"] for relpath, entry in entries.items() if not entry["valid"]}
+        self.config.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.config.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "files": entries, "quarantined": quarantined}, f)
+        os.replace(tmp_path, self.config.index_path)
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"validated {len(to_check)} new or changed of {len(entries)} images in {elapsed:.1f}s, "
+                    f"{len(quarantined)} quarantined, index at {self.config.index_path}")
+        for relpath, reason in list(quarantined.items())[:20]:
+            logger.info(f"quarantined {relpath}: {reason}")
@@ -0,0 +1,224 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import multiprocessing
+import shutil
+import time
+from pathlib import Path
+import numpy as np
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import ModelExportConfig
+from src.CNNClassifier.utils.dataset import SplitIndex
+from src.CNNClassifier.utils.instrumentation import current_rss_mb, peak_rss_mb, reset_peak_rss
+from src.CNNClassifier.utils.preprocessing import load_image, normalize_batch
+
+EXPORT_FORMATS = ("saved_model", "tflite", "tflite_float16", "tflite_int8")
+TFLITE_FILES = {
+    "tflite": "model_float32.tflite",
+    "tflite_float16": "model_float16.tflite",
+    "tflite_int8": "model_int8.tflite",
+}
+
+
+def _import_runtime(kind):
+    """
+    Import what serves `kind`, outside the timed load.
+
+    Returns:
+        tuple: (runtime name, TFLite Interpreter class or the tensorflow module)
+    """
+    if kind.startswith("tflite"):
+        # standalone runtimes avoid importing all of TensorFlow, which is how a TFLite model would be served
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+            return "ai_edge_litert", Interpreter
+        except ImportError:
+            pass
+        try:
+            from tflite_runtime.interpreter import Interpreter
+            return "tflite_runtime", Interpreter
+        except ImportError:
+            pass
+        import tensorflow as tf
+        return "tensorflow", tf.lite.Interpreter
+
+    import tensorflow as tf
+    return "tensorflow", tf
+
+
+def _load_predict_fn(kind, path, runtime):
+    if kind.startswith("tflite"):
+        return _load_tflite_predict_fn(path, runtime)
+
+    tf = runtime
+    if kind == "keras_h5":
+        model = tf.keras.models.load_model(path, compile=False)
+        return lambda batch: np.asarray(model(batch, training=False))
+
+    if kind == "saved_model":
+        loaded = tf.saved_model.load(path)
+        serve = loaded.signatures["serving_default"]
+        return lambda batch: np.asarray(next(iter(serve(tf.constant(batch)).values())))
+
+    raise ValueError(f"Unknown model kind {kind!r}")
+
+
+def _load_tflite_predict_fn(path, interpreter_class):
+    interpreter = interpreter_class(model_path=path, num_threads=os.cpu_count())
+    input_detail = interpreter.get_input_details()[0]
+    output_index = interpreter.get_output_details()[0]["index"]
+    state = {"batch_size": None}
+
+    def predict(batch):
+        if state["batch_size"] != len(batch):
+            interpreter.resize_tensor_input(input_detail["index"], [len(batch)] + list(batch.shape[1:]))
+            interpreter.allocate_tensors()
+            state["batch_size"] = len(batch)
+        interpreter.set_tensor(input_detail["index"], batch.astype(input_detail["dtype"]))
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)
+
+    return predict
+
+
+def benchmark_variant(kind, path, sample_path, batch_sizes, repeats):
+    """
+    Runs in a fresh process so load time and peak RSS belong to this variant
+    only. The runtime is imported before the clock starts and the peak RSS
+    is counted from after the import, `import_rss_mb` is what the import took.
+    """
+    images, labels = (np.load(sample_path)[key] for key in ("images", "labels"))
+    started = time.perf_counter()
+    runtime_name, runtime = _import_runtime(kind)
+    import_s = time.perf_counter() - started
+    import_rss = current_rss_mb()
+    peak_resettable = reset_peak_rss()
+
+    started = time.perf_counter()
+    predict = _load_predict_fn(kind, path, runtime)
+    load_s = time.perf_counter() - started
+
+    latency = {}
+    for batch_size in batch_sizes:
+        batch = images[np.arange(batch_size) % len(images)]
+        predict(batch)  # warm-up, also triggers any lazy allocation
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            predict(batch)
+            timings.append(time.perf_counter() - started)
+        median = float(np.median(timings))
+        latency[str(batch_size)] = {"batch_ms": median * 1000.0, "per_image_ms": median * 1000.0 / batch_size}
+
+    eval_batch = max(batch_sizes)
+    predictions = np.concatenate([
+        np.argmax(predict(images[i:i + eval_batch]), axis=1) for i in range(0, len(images), eval_batch)
+    ])
+    return {
+        "runtime": runtime_name,
+        "import_s": import_s,
+        "load_s": load_s,
+        "latency": latency,
+        "accuracy": float(np.mean(predictions == labels)),
+        # without a reset the high-water mark would include the sample loading and the import
+        "peak_rss_mb": peak_rss_mb() if peak_resettable else None,
+        "import_rss_mb": import_rss,
+    }
+
+
+class ModelExport:
+    def __init__(self, config: ModelExportConfig, model=None):
+        self.config = config
+        self.model = model
+
+    def load_sample(self, subset, size, seed):
+        split = SplitIndex(self.config.split_index_path)
+        files, labels = split.files, split.labels
+        indices = split.indices(subset)
+        rng = np.random.default_rng(seed)
+        indices = np.sort(rng.choice(indices, size=min(size, len(indices)), replace=False))
+        height, width = self.config.params_image_size[:2]
+        pixels = np.empty((len(indices), height, width, 3), dtype=np.uint8)
+        for row, i in enumerate(indices):
+            pixels[row] = load_image(os.path.join(self.config.training_data, files[i]), self.config.params_image_size)
+        return normalize_batch(pixels, self.config.params_preprocessing), labels[indices]
+
+    def export(self):
+        import tensorflow as tf
+
+        if self.model is None:
+            self.model = tf.keras.models.load_model(self.config.model_path, compile=False)
+        root_dir = Path(self.config.root_dir)
+        self.artifacts = {"keras_h5": str(self.config.model_path)}
+
+        unknown = set(self.config.params_export_formats) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown EXPORT_FORMATS {sorted(unknown)}, expected a subset of {EXPORT_FORMATS}")
+
+        if "saved_model" in self.config.params_export_formats:
+            path = root_dir / "saved_model"
+            if path.exists():
+                shutil.rmtree(path)
+            if hasattr(self.model, "export"):
+                self.model.export(str(path))
+            else:
+                tf.saved_model.save(self.model, str(path))
+            self.artifacts["saved_model"] = str(path)
+
+        for kind, filename in TFLITE_FILES.items():
+            if kind not in self.config.params_export_formats:
+                continue
+            converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+            if kind == "tflite_float16":
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                converter.target_spec.supported_types = [tf.float16]
+            elif kind == "tflite_int8":
+                calibration, _ = self.load_sample(
+                    "train", self.config.params_calibration_samples, seed=0
+                )
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                converter.representative_dataset = lambda: ([image[None]] for image in calibration)
+            started = time.perf_counter()
+            path = root_dir / filename
+            path.write_bytes(converter.convert())
+            self.artifacts[kind] = str(path)
+            logger.info(f"exported {kind} to {path} in {time.perf_counter() - started:.1f}s")
+
+    def benchmark(self):
+        root_dir = Path(self.config.root_dir)
+        images, labels = self.load_sample("test", self.config.params_benchmark_samples, seed=1)
+        sample_path = root_dir / "benchmark_sample.npz"
+        np.savez(sample_path, images=images, labels=labels)
+
+        report = {"samples": int(len(labels)), "batch_sizes": list(self.config.params_benchmark_batch_sizes),
+                  "variants": {}}
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            for kind, path in self.artifacts.items():
+                result = pool.apply(benchmark_variant, (kind, path, str(sample_path),
+                                                        list(self.config.params_benchmark_batch_sizes),
+                                                        self.config.params_benchmark_repeats))
+                result["size_mb"] = _path_size_mb(path)
+                report["variants"][kind] = result
+                peak = "n/a" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f} MB"
+                logger.info(f"{kind} ({result['runtime']}): load {result['load_s']:.2f}s, "
+                            f"accuracy {result['accuracy']:.4f}, peak RSS {peak}, latency "
+                            + ", ".join(f"b{b}={v['per_image_ms']:.2f}ms/img" for b, v in result["latency"].items()))
+
+        reference = report["variants"]["keras_h5"]["accuracy"]
+        for result in report["variants"].values():
+            result["accuracy_delta"] = result["accuracy"] - reference
+        sample_path.unlink()
+
+        with open(root_dir / "benchmark.json", "w") as f:
+            json.dump(report, f, indent=4)
+        logger.info(f"export benchmark report written to {root_dir / 'benchmark.json'}")
+        return report
+
+
+def _path_size_mb(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1e6
+    return path.stat().st_size / 1e6
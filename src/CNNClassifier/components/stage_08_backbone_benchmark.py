@@ -0,0 +1,166 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import multiprocessing
+import time
+import traceback
+from dataclasses import replace
+from pathlib import Path
+import numpy as np
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import BackboneBenchmarkConfig
+from src.CNNClassifier.utils.instrumentation import peak_rss_mb
+
+
+def benchmark_backbone(name: str, config: BackboneBenchmarkConfig) -> dict:
+    """
+    Build BASE_MODEL `name` with the configured head, train the head on
+    cached backbone features and time inference. Runs in a fresh process so
+    peak RSS and thread pools belong to this backbone only.
+    """
+    import tensorflow as tf
+    from src.CNNClassifier.components.stage_02_prepare_base_model import PrepareBaseModel, count_macs
+    from src.CNNClassifier.components.stage_03_train import Training
+
+    base_config = config.prepare_base_model
+    backbone_dir = Path(config.root_dir) / name
+    backbone_dir.mkdir(parents=True, exist_ok=True)
+    tf.keras.utils.set_random_seed(0)
+
+    base_model = PrepareBaseModel.build_base_model(
+        base_model=name,
+        image_size=base_config.params_image_size,
+        weights=base_config.params_weights,
+        include_top=base_config.params_include_top,
+        preprocessing=base_config.params_preprocessing
+    )
+    model = PrepareBaseModel.prepare_full_model(
+        model=base_model,
+        classes=base_config.params_classes,
+        freeze_all=True,
+        freeze_till=None,
+        learning_rate=base_config.params_learning_rate,
+        pooling=base_config.params_head_pooling
+    )
+    training_config = replace(
+        config.training,
+        root_dir=backbone_dir,
+        trained_model_path=backbone_dir / "model.h5",
+        feature_cache_dir=backbone_dir / "features",
+        params_epochs=config.params_epochs,
+        params_training_mode="feature_cache",
+        params_is_augmentation=False,
+        params_checkpoint=False,
+        instrumentation=replace(config.training.instrumentation, run_log_dir=backbone_dir / "run_log",
+                                params_profile_steps=[])
+    )
+    training = Training(config=training_config, model=model)
+    training.get_base_model()
+    started = time.perf_counter()
+    training.train()
+    train_s = time.perf_counter() - started
+    history = training.history.history
+
+    rng = np.random.default_rng(0)
+    latency = {}
+    for batch_size in config.params_batch_sizes:
+        batch = rng.standard_normal((batch_size,) + tuple(base_config.params_image_size)).astype(np.float32)
+        model.predict_on_batch(batch)  # warm-up, includes tracing
+        timings = []
+        for _ in range(config.params_repeats):
+            started = time.perf_counter()
+            model.predict_on_batch(batch)
+            timings.append(time.perf_counter() - started)
+        median = float(np.median(timings))
+        latency[str(batch_size)] = {"batch_ms": median * 1000.0, "per_image_ms": median * 1000.0 / batch_size,
+                                    "p90_batch_ms": float(np.percentile(timings, 90)) * 1000.0}
+
+    return {
+        "parameters": int(model.count_params()),
+        "backbone_parameters": int(base_model.count_params()),
+        "trainable_parameters": int(sum(int(np.prod(w.shape)) for w in model.trainable_weights)),
+        "gmacs": count_macs(model) / 1e9,
+        "gflops": 2 * count_macs(model) / 1e9,
+        "size_mb": Path(training_config.trained_model_path).stat().st_size / 1e6,
+        "latency": latency,
+        "val_accuracy": float(history["val_accuracy"][-1]),
+        "val_loss": float(history["val_loss"][-1]),
+        "train_s": train_s,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def pareto_front(results: dict, batch_size: str) -> list:
+    """
+    Backbones no other backbone beats on both per-image latency at
+    `batch_size` and validation accuracy, fastest first.
+    """
+    points = {name: (result["latency"][batch_size]["per_image_ms"], result["val_accuracy"])
+              for name, result in results.items() if "error" not in result}
+    front = [name for name, (ms, accuracy) in points.items()
+             if not any(other_ms <= ms and other_accuracy >= accuracy and (other_ms, other_accuracy) != (ms, accuracy)
+                        for other_ms, other_accuracy in points.values())]
+    return sorted(front, key=lambda name: points[name][0])
+
+
+class BackboneBenchmark:
+    def __init__(self, config: BackboneBenchmarkConfig):
+        self.config = config
+
+    def run(self) -> dict:
+        """
+        Benchmark every backbone in BACKBONE_BENCHMARK_MODELS one after the
+        other, each in its own process, and write report.json. A backbone
+        that fails, e.g. because its weights cannot be downloaded, is
+        reported with its error instead of stopping the benchmark.
+
+        Returns:
+            dict: Per-backbone results and the latency/accuracy Pareto front
+        """
+        config = self.config
+        batch_sizes = [str(size) for size in config.params_batch_sizes]
+        report = {
+            "image_size": list(config.prepare_base_model.params_image_size),
+            "head_pooling": config.prepare_base_model.params_head_pooling,
+            "preprocessing": config.prepare_base_model.params_preprocessing,
+            "weights": config.prepare_base_model.params_weights,
+            "epochs": config.params_epochs,
+            "backbones": {},
+        }
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            for name in config.params_backbones:
+                logger.info(f"benchmarking backbone {name}")
+                try:
+                    result = pool.apply(benchmark_backbone, (name, config))
+                except Exception as e:
+                    logger.error(f"backbone {name} failed: {e}\n{traceback.format_exc()}")
+                    report["backbones"][name] = {"error": f"{type(e).__name__}: {e}"}
+                    continue
+                report["backbones"][name] = result
+                logger.info(f"{name}: {result['parameters']:,} parameters, {result['size_mb']:.1f} MB, "
+                            f"{result['gflops']:.2f} GFLOPs, val accuracy {result['val_accuracy']:.4f}, latency "
+                            + ", ".join(f"b{b}={v['per_image_ms']:.2f}ms/img" for b, v in result["latency"].items()))
+
+        report["pareto_front"] = pareto_front(report["backbones"], batch_sizes[0]) if batch_sizes else []
+        self.log_table(report, batch_sizes)
+        with open(Path(config.root_dir) / "report.json", "w") as f:
+            json.dump(report, f, indent=4)
+        logger.info(f"backbone benchmark report written to {Path(config.root_dir) / 'report.json'}")
+        return report
+
+    @staticmethod
+    def log_table(report: dict, batch_sizes: list):
+        header = f"{'backbone':<20}{'params':>12}{'MB':>8}{'GFLOPs':>8}" + \
+            "".join(f"{'ms/img b' + size:>13}" for size in batch_sizes) + f"{'val acc':>9}"
+        lines = [header]
+        for name, result in report["backbones"].items():
+            if "error" in result:
+                lines.append(f"{name:<20}{result['error']}")
+                continue
+            marker = " *" if name in report["pareto_front"] else ""
+            lines.append(f"{name:<20}{result['parameters']:>12,}{result['size_mb']:>8.1f}{result['gflops']:>8.2f}"
+                         + "".join(f"{result['latency'][size]['per_image_ms']:>13.2f}" for size in batch_sizes)
+                         + f"{result['val_accuracy']:>9.4f}{marker}")
+        logger.info("backbone benchmark (* = on the latency/accuracy Pareto front):\n" + "\n".join(lines))
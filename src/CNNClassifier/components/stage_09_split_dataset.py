@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import time
+import numpy as np
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import DataSplitConfig
+from src.CNNClassifier.utils.dataset import (SPLITS, list_image_files, load_validated_files, stratified_split,
+                                             write_split_index)
+
+SPLIT_FORMAT_VERSION = 1
+
+
+class DatasetSplit:
+    def __init__(self, config: DataSplitConfig):
+        self.config = config
+
+    def split(self) -> dict:
+        """
+        List the images that passed validation once and write the seeded,
+        stratified train/val/test index. Training fits on train and monitors
+        val; evaluation and the export accuracy check only ever see test.
+
+        Returns:
+            dict: The index metadata, including per-class counts of every subset
+        """
+        config = self.config
+        started = time.perf_counter()
+        files, labels, class_names = list_image_files(config.source_dir,
+                                                      load_validated_files(config.validated_index_path))
+        if not files:
+            raise ValueError(f"no images under {config.source_dir}, nothing to split")
+        subsets = stratified_split(files, labels, config.params_validation_split, config.params_test_split,
+                                   config.params_seed)
+
+        counts = {name: np.bincount(labels[indices], minlength=len(class_names)).tolist()
+                  for name, indices in subsets.items()}
+        meta = {
+            "version": SPLIT_FORMAT_VERSION,
+            "seed": config.params_seed,
+            "validation_split": config.params_validation_split,
+            "test_split": config.params_test_split,
+            "counts": counts,
+        }
+        write_split_index(config.index_path, files, labels, class_names, subsets, meta)
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"split {len(files)} images into " + ", ".join(f"{name} {len(subsets[name])}" for name in SPLITS)
+                    + f" in {elapsed:.2f}s, index at {config.index_path}")
+        for label, class_name in enumerate(class_names):
+            logger.info(f"{class_name}: " + ", ".join(f"{name} {counts[name][label]}" for name in SPLITS))
+        return meta
@@ -0,0 +1,253 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import random
+import time
+import traceback
+from dataclasses import replace
+from pathlib import Path
+from typing import List
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import SweepConfig
+
+# searchable params and the TrainingConfig field each one overrides, LEARNING_RATE goes to the optimizer
+SEARCHABLE_PARAMS = {
+    "LEARNING_RATE": None,
+    "BATCH_SIZE": "params_batch_size",
+    "EPOCHS": "params_epochs",
+    "AUGMENTATION": "params_is_augmentation",
+}
+# params that only take whole numbers, their ranges are sampled as integers
+INTEGER_PARAMS = ("BATCH_SIZE", "EPOCHS")
+LEADERBOARD_FIELDS = ["rank", "trial", "status", "val_accuracy", "val_loss", "epochs_run", "wall_clock_s",
+                      *SEARCHABLE_PARAMS, "model_path", "error"]
+
+
+def _check_spec(key: str, spec):
+    def is_int(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    if isinstance(spec, list):
+        if key in INTEGER_PARAMS and not all(is_int(value) for value in spec):
+            raise ValueError(f"SWEEP_SPACE {key} choices must be integers, got {spec}")
+        return
+    if key == "AUGMENTATION" or not isinstance(spec, dict) or not {"low", "high"} <= set(spec):
+        raise ValueError(f"SWEEP_SPACE {key} must be a list of choices"
+                         + ("" if key == "AUGMENTATION" else " or {low, high, log}") + f", got {spec}")
+    if key in INTEGER_PARAMS and not (is_int(spec["low"]) and is_int(spec["high"])):
+        raise ValueError(f"SWEEP_SPACE {key} range must have integer low and high, got {spec}")
+    if spec["low"] > spec["high"] or (spec.get("log", False) and spec["low"] <= 0):
+        raise ValueError(f"SWEEP_SPACE {key} range needs low <= high, and low > 0 with log, got {spec}")
+
+
+def expand_search_space(space: dict, search: str, num_trials: int, seed: int) -> List[dict]:
+    """
+    Turn the SWEEP_SPACE params into one params dict per trial.
+
+    Args:
+        space (dict): Param name to a list of choices, or to {low, high, log}
+            for a continuous range (random search only); INTEGER_PARAMS take
+            integer choices and bounds and are sampled as integers
+        search (str): "grid" for every combination, "random" for `num_trials` samples
+        num_trials (int): Trials drawn by random search
+        seed (int): Seed of the random search
+
+    Returns:
+        list: Trial params, in the order they are scheduled
+    """
+    unknown = set(space) - set(SEARCHABLE_PARAMS)
+    if unknown:
+        raise ValueError(f"SWEEP_SPACE has unsupported params {sorted(unknown)}, expected some of "
+                         f"{list(SEARCHABLE_PARAMS)}")
+
+    for key, spec in space.items():
+        _check_spec(key, spec)
+
+    if search == "grid":
+        ranges = [key for key, spec in space.items() if not isinstance(spec, list)]
+        if ranges:
+            raise ValueError(f"grid search needs a list of choices for {ranges}")
+        return [dict(zip(space, values)) for values in itertools.product(*space.values())]
+
+    if search == "random":
+        rng = random.Random(seed)
+        trials = []
+        for _ in range(num_trials):
+            params = {}
+            for key, spec in space.items():
+                if isinstance(spec, list):
+                    params[key] = rng.choice(spec)
+                elif spec.get("log", False):
+                    params[key] = 10 ** rng.uniform(math.log10(spec["low"]), math.log10(spec["high"]))
+                    if key in INTEGER_PARAMS:
+                        params[key] = min(max(round(params[key]), spec["low"]), spec["high"])
+                elif key in INTEGER_PARAMS:
+                    params[key] = rng.randint(spec["low"], spec["high"])
+                else:
+                    params[key] = rng.uniform(spec["low"], spec["high"])
+            trials.append(params)
+        return trials
+
+    raise ValueError(f"Unknown SWEEP_SEARCH {search!r}, expected grid or random")
+
+
+_worker_state = {}
+
+
+def _init_worker(threads: int, shared_history):
+    # runs before TensorFlow is imported in the spawned process, so OpenMP/oneDNN pick it up
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    _worker_state.update(threads=threads, shared_history=shared_history)
+
+
+def run_trial(trial_id: str, params: dict, config: SweepConfig) -> dict:
+    """
+    Prepare, train and validate one model in a pool worker, stages 02-04 with
+    the trial's params.
+
+    Returns:
+        dict: Leaderboard row of the trial
+    """
+    started = time.perf_counter()
+    trial_dir = config.root_dir / trial_id
+    result = {"trial": trial_id, **params, "model_path": str(trial_dir / "model.h5"), "error": ""}
+    try:
+        import tensorflow as tf
+        from src.CNNClassifier.components.callbacks import MedianStoppingCallback
+        from src.CNNClassifier.components.stage_02_prepare_base_model import PrepareBaseModel
+        from src.CNNClassifier.components.stage_03_train import Training
+
+        threads = _worker_state["threads"]
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(min(2, threads))
+        tf.keras.utils.set_random_seed(config.params_seed)
+
+        overrides = {field: params[key] for key, field in SEARCHABLE_PARAMS.items() if field and key in params}
+        training_config = replace(
+            config.training,
+            root_dir=trial_dir,
+            trained_model_path=trial_dir / "model.h5",
+            params_input_pipeline="cache",
+            params_training_mode="full",
+            # a failed trial is rerun as a whole, and parallel trials must not share a checkpoint directory
+            params_checkpoint=False,
+            # the sweep sizes the thread pools per trial
+            performance=replace(config.training.performance, params_intra_op_threads=0, params_inter_op_threads=0),
+            # each trial logs its own run, parallel trials must not share a profiler session
+            instrumentation=replace(config.training.instrumentation, run_log_dir=trial_dir / "run_log",
+                                    params_profile_steps=[]),
+            **overrides
+        )
+        trial_dir.mkdir(parents=True, exist_ok=True)
+        with open(trial_dir / "params.json", "w") as f:
+            json.dump(params, f, indent=4)
+
+        model = PrepareBaseModel.prepare_full_model(
+            model=tf.keras.models.load_model(config.base_model_path),
+            classes=config.params_classes,
+            freeze_all=True,
+            freeze_till=None,
+            learning_rate=params.get("LEARNING_RATE", config.params_learning_rate),
+            pooling=config.params_head_pooling
+        )
+        training = Training(config=training_config, model=model)
+        training.train_valid_generator()
+
+        early_stopping = tf.keras.callbacks.EarlyStopping(
+            monitor="val_loss", patience=config.params_early_stopping_patience, restore_best_weights=True
+        )
+        pruner = MedianStoppingCallback(
+            _worker_state["shared_history"], trial_id,
+            warmup_epochs=config.params_prune_warmup_epochs, min_trials=config.params_prune_min_trials
+        )
+        training.train(callbacks=[early_stopping, pruner])
+
+        val_loss, val_accuracy = training.model.evaluate(training.valid_generator, verbose=0)[:2]
+        epochs_run = len(training.history.history.get("loss", []))
+        if pruner.pruned_epoch is not None:
+            status = "pruned"
+        elif epochs_run < training_config.params_epochs:
+            status = "early_stopped"
+        else:
+            status = "completed"
+        result.update(status=status, val_accuracy=float(val_accuracy), val_loss=float(val_loss),
+                      epochs_run=epochs_run)
+    except Exception as e:
+        logger.error(f"trial {trial_id} failed: {e}\n{traceback.format_exc()}")
+        result.update(status="failed", val_accuracy=None, val_loss=None, epochs_run=0, error=repr(e))
+    result["wall_clock_s"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def _run_trial_star(args):
+    return run_trial(*args)
+
+
+class HyperparameterSweep:
+    def __init__(self, config: SweepConfig):
+        self.config = config
+
+    @property
+    def threads_per_trial(self):
+        if self.config.threads_per_trial > 0:
+            return self.config.threads_per_trial
+        return max(1, (os.cpu_count() or 1) // self.config.num_workers)
+
+    def prepare_dataset(self):
+        # trials read the decoded, memory-mapped image cache, so the OS page cache
+        # holds one copy of the dataset shared by every worker process
+        from src.CNNClassifier.components.stage_05_image_cache import ImageCache
+        ImageCache(config=self.config.image_cache).build()
+
+    def write_leaderboard(self, results: List[dict]) -> List[dict]:
+        ranked = sorted(results, key=lambda r: (r["val_accuracy"] is None, -(r["val_accuracy"] or 0.0),
+                                                r["wall_clock_s"]))
+        for rank, row in enumerate(ranked, start=1):
+            row["rank"] = rank
+
+        with open(self.config.root_dir / "leaderboard.json", "w") as f:
+            json.dump(ranked, f, indent=4)
+        with open(self.config.root_dir / "leaderboard.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(ranked)
+        return ranked
+
+    def run(self) -> List[dict]:
+        if not Path(self.config.base_model_path).exists():
+            raise FileNotFoundError(f"{self.config.base_model_path} not found, run stage_02_base_model first")
+
+        trials = expand_search_space(self.config.params_space, self.config.params_search,
+                                     self.config.params_num_trials, self.config.params_seed)
+        if not trials:
+            raise ValueError(f"SWEEP_SPACE and SWEEP_NUM_TRIALS {self.config.params_num_trials} give no trials "
+                             f"for {self.config.params_search} search, nothing to run")
+        self.prepare_dataset()
+        logger.info(f"sweep of {len(trials)} trials on {self.config.num_workers} workers "
+                    f"with {self.threads_per_trial} threads each")
+
+        results = []
+        context = multiprocessing.get_context("spawn")
+        with context.Manager() as manager:
+            shared_history = manager.dict()
+            # a fresh process per trial releases the TF graph and model memory of the previous one
+            with context.Pool(processes=self.config.num_workers, initializer=_init_worker,
+                              initargs=(self.threads_per_trial, shared_history), maxtasksperchild=1) as pool:
+                tasks = [(f"trial_{i:03d}", params, self.config) for i, params in enumerate(trials)]
+                for result in pool.imap_unordered(_run_trial_star, tasks):
+                    results.append(result)
+                    logger.info(f"{result['trial']} {result['status']}: val_accuracy {result['val_accuracy']}, "
+                                f"{result['wall_clock_s']:.1f}s, params "
+                                f"{ {key: result[key] for key in self.config.params_space} }")
+                    # rewritten after every trial so a partial sweep still leaves a leaderboard
+                    ranked = self.write_leaderboard(results)
+
+        best = ranked[0]
+        logger.info(f"sweep finished, best {best['trial']} with val_accuracy {best['val_accuracy']}, "
+                    f"leaderboard at {self.config.root_dir / 'leaderboard.csv'}")
+        return ranked
@@ -1,4 +1,5 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
-from src.CNNClassifier.config.configuration import ConfigurationManager
\ No newline at end of file
+from src.CNNClassifier.config.configuration import ConfigurationManager
+from src.CNNClassifier.config.loader import ConfigError, ConfigNode, parse_overrides
\ No newline at end of file
@@ -4,12 +4,25 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 from src.CNNClassifier.entity.config_entity import PrepareBaseModelConfig
 from src.CNNClassifier.entity.config_entity import TrainingConfig
 from src.CNNClassifier.entity.config_entity import EvaluationConfig
-from src.CNNClassifier.utils.utils import read_yaml, create_directory
 from src.CNNClassifier.entity.config_entity import DataIngestionConfig
+from src.CNNClassifier.entity.config_entity import ServingConfig
+from src.CNNClassifier.entity.config_entity import ImageCacheConfig
+from src.CNNClassifier.entity.config_entity import ImageValidationConfig
+from src.CNNClassifier.entity.config_entity import DataSplitConfig
+from src.CNNClassifier.entity.config_entity import ModelExportConfig
+from src.CNNClassifier.entity.config_entity import PipelineConfig
+from src.CNNClassifier.entity.config_entity import SweepConfig
+from src.CNNClassifier.entity.config_entity import PerformanceConfig
+from src.CNNClassifier.entity.config_entity import InstrumentationConfig
+from src.CNNClassifier.entity.config_entity import DistributedConfig
+from src.CNNClassifier.entity.config_entity import FineTuningConfig
+from src.CNNClassifier.entity.config_entity import BatchPredictionConfig
+from src.CNNClassifier.entity.config_entity import BackboneBenchmarkConfig
 from src.CNNClassifier import logger
+from src.CNNClassifier.config.loader import load_config
 from src.CNNClassifier.constants import CONFIG_FILE_PATH, PARAMS_FILE_PATH
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 def create_directory(paths):
     for path in paths:
@@ -21,20 +34,25 @@ class ConfigurationManager:
     def __init__(
         self, 
         config_filepath: Path = CONFIG_FILE_PATH,
-        params_filepath: Path = PARAMS_FILE_PATH):
+        params_filepath: Path = PARAMS_FILE_PATH,
+        overrides: Optional[Dict[str, Any]] = None):
         """
-        Initialize configuration manager
-        
+        Initialize configuration manager. Both files are validated against
+        config/schema.py up front, so an unknown, missing or mistyped key
+        fails here instead of in the middle of a stage, and every key the
+        getters read exists.
+
         Args:
             config_filepath (Path): Path to the configuration YAML file
             params_filepath (Path): Path to the parameters YAML file
+            overrides (dict, optional): `root.key` -> value, e.g. {"params.EPOCHS": 3},
+                applied on top of CNNCLASSIFIER_* environment overrides
         """
         try:
-            self.config = read_yaml(config_filepath)
-            self.params = read_yaml(params_filepath)
+            self.config, self.params = load_config(config_filepath, params_filepath, overrides)
             
             # Ensure artifacts root directory is created
-            create_directory([self.config.get('artifacts_root', 'artifacts')])
+            create_directory([self.config.artifacts_root])
         except Exception as e:
             logger.error(f"Error initializing ConfigurationManager: {e}")
             raise
@@ -47,19 +65,20 @@ class ConfigurationManager:
             DataIngestionConfig: Configuration for data ingestion
         """
         try:
-            # Safely access configuration with fallback
-            config = self.config.get('data_ingestion', {})
+            config = self.config.data_ingestion
             
             # Ensure root directory is created
-            root_dir = config.get('root_dir', 'artifacts/data_ingestion')
-            create_directory([root_dir])
+            create_directory([config.root_dir])
             
             # Create and return DataIngestionConfig
             data_ingestion_config = DataIngestionConfig(
-                root_dir=root_dir,
-                source_url=config.get('source_url', ''),
-                local_data_file=config.get('local_data_file', ''),
-                unzip_dir=config.get('unzip_dir', '')
+                root_dir=config.root_dir,
+                source_url=config.source_url,
+                local_data_file=config.local_data_file,
+                unzip_dir=config.unzip_dir,
+                source_sha256=config.source_sha256 or '',
+                num_workers=self._workers(config.num_workers),
+                max_retries=config.max_retries
             )
             
             return data_ingestion_config
@@ -68,96 +87,397 @@ class ConfigurationManager:
             logger.error(f"Error in get_data_ingestion_config: {e}")
             raise
     
-    def safe_get(self, config: Any, key: str, default: Any = None) -> Any:
-        """
-        Safely get a configuration value
-        
-        Args:
-            config (Any): Configuration object or dictionary
-            key (str): Key to retrieve
-            default (Any, optional): Default value if key is not found
-        
-        Returns:
-            Value of the key or default
-        """
-        try:
-            return getattr(config, key, default)
-        except AttributeError:
-            return config.get(key, default) if isinstance(config, dict) else default
-        
+    def _workers(self, configured: Optional[int]) -> int:
+        return int(os.cpu_count() or 1) if configured is None else configured
+
+    def _training_data(self) -> Path:
+        return Path(os.path.join(self.config.data_ingestion.unzip_dir, "PetImages"))
+
     def get_prepare_base_model_config(self) -> PrepareBaseModelConfig:
-            # Print out the entire configuration to check its structure
-            print("Config Loaded:", self.config)
-            
-            # Check if 'prepare_base_model' is in the configuration
-            prepare_base_model_config = self.config.get('prepare_base_model')
-            
-            if prepare_base_model_config is None:
-                # If not in config, try accessing through data_ingestion
-                prepare_base_model_config = self.config.get('data_ingestion', {}).get('prepare_base_model')
+            # config.yaml may nest it under data_ingestion, the loader moves it to the top level
+            prepare_base_model_config = self.config.prepare_base_model
             
-            if prepare_base_model_config is None:
-                raise ValueError("Missing 'prepare_base_model' configuration in both 'prepare_base_model' and 'data_ingestion' keys.")
-            
-            create_directory([Path(prepare_base_model_config.get('root_dir'))])
+            create_directory([Path(prepare_base_model_config.root_dir)])
             
             return PrepareBaseModelConfig(
-                root_dir=Path(prepare_base_model_config.get('root_dir')),
-                base_model_path=Path(prepare_base_model_config.get('base_model_path')),
-                updated_base_model_path=Path(prepare_base_model_config.get('updated_base_model_path')),
+                root_dir=Path(prepare_base_model_config.root_dir),
+                base_model_path=Path(prepare_base_model_config.base_model_path),
+                updated_base_model_path=Path(prepare_base_model_config.updated_base_model_path),
                 params_image_size=self.params.IMAGE_SIZE,
                 params_learning_rate=self.params.LEARNING_RATE,
                 params_include_top=self.params.INCLUDE_TOP,
                 params_weights=self.params.WEIGHTS,
-                params_classes=self.params.CLASSES
+                params_classes=self.params.CLASSES,
+                params_base_model=self.params.BASE_MODEL,
+                params_head_pooling=self.params.HEAD_POOLING,
+                params_preprocessing=self.params.PREPROCESSING
             )
 
 
 
     
     def get_training_config(self) -> TrainingConfig:
-        # Debug print to check the configuration
-        print("Full Config:", self.config)
-        
-        # Safely retrieve configuration sections
-        training = self.config.get('training', {})
-        data_ingestion = self.config.get('data_ingestion', {})
-        
-        # Explicitly try to get prepare_base_model configuration
-        prepare_base_model = (
-            data_ingestion.get('prepare_base_model') or 
-            self.config.get('prepare_base_model') or 
-            {}
-        )
-        
+        training = self.config.training
         params = self.params
         
-        # Construct training data path
-        training_data = os.path.join(data_ingestion.get('unzip_dir', ''), "PetImages")
-        
         # Ensure root directory exists
-        create_directory([Path(training.get('root_dir', 'artifacts/training'))])
+        create_directory([Path(training.root_dir)])
 
-        # Safely access paths with fallbacks
         training_config = TrainingConfig(
-            root_dir=Path(training.get('root_dir', 'artifacts/training')),
-            trained_model_path=Path(training.get('trained_model_path', 'artifacts/training/model.h5')),
-            updated_base_model_path=Path(prepare_base_model.get('updated_base_model_path', 'artifacts/prepare_base_model/base_model_updated.h5')),
-            training_data=Path(training_data),
-            params_epochs=params.get('EPOCHS', 1),
-            params_batch_size=params.get('BATCH_SIZE', 32),
-            params_is_augmentation=params.get('AUGMENTATION', False),
-            params_image_size=params.get('IMAGE_SIZE', (224, 224))
+            root_dir=Path(training.root_dir),
+            trained_model_path=Path(training.trained_model_path),
+            updated_base_model_path=Path(self.config.prepare_base_model.updated_base_model_path),
+            training_data=self._training_data(),
+            params_epochs=params.EPOCHS,
+            params_batch_size=params.BATCH_SIZE,
+            params_is_augmentation=params.AUGMENTATION,
+            params_image_size=params.IMAGE_SIZE,
+            params_preprocessing=params.PREPROCESSING,
+            params_input_pipeline=params.INPUT_PIPELINE,
+            params_tfdata_cache=params.TFDATA_CACHE,
+            params_training_mode=params.TRAINING_MODE,
+            params_feature_cache_dtype=params.FEATURE_CACHE_DTYPE,
+            params_checkpoint=params.CHECKPOINT,
+            params_checkpoint_every_steps=params.CHECKPOINT_EVERY_STEPS,
+            params_checkpoint_max_to_keep=params.CHECKPOINT_MAX_TO_KEEP,
+            image_cache_dir=Path(self.config.image_cache.root_dir),
+            feature_cache_dir=Path(training.feature_cache_dir),
+            checkpoint_dir=Path(training.checkpoint_dir),
+            split_index_path=self._split_index_path(),
+            performance=self.get_performance_config(),
+            instrumentation=self.get_instrumentation_config(training.run_log_dir),
+            distributed=self.get_distributed_config(),
+            fine_tuning=self.get_fine_tuning_config()
         )
         return training_config
 
 
     def get_validation_config(self) -> EvaluationConfig:
+        evaluation = self.config.evaluation
         eval_config = EvaluationConfig(
-            path_of_model="artifacts/training/model.h5",
-            training_data="artifacts/data_ingestion/PetImages",
-            #all_params=self.params,
+            path_of_model=Path(self.config.training.trained_model_path),
+            training_data=self._training_data(),
+            params_image_size=self.params.IMAGE_SIZE,
+            params_preprocessing=self.params.PREPROCESSING,
+            params_batch_size=self.params.BATCH_SIZE,
+            params_input_pipeline=self.params.INPUT_PIPELINE,
+            image_cache_dir=Path(self.config.image_cache.root_dir),
+            split_index_path=self._split_index_path(),
+            report_path=Path(evaluation.report_path),
+            instrumentation=self.get_instrumentation_config(evaluation.run_log_dir)
+        )
+        return eval_config
+
+    def _validated_index_path(self) -> Path:
+        return Path(self.config.data_validation.index_path)
+
+    def _split_index_path(self) -> Path:
+        return Path(self.config.data_split.index_path)
+
+    def get_image_validation_config(self) -> ImageValidationConfig:
+        """
+        Get configuration for the image validation / quarantine stage
+
+        Returns:
+            ImageValidationConfig: Configuration for validating the extracted images
+        """
+        data_validation = self.config.data_validation
+        root_dir = Path(data_validation.root_dir)
+        create_directory([root_dir])
+
+        return ImageValidationConfig(
+            root_dir=root_dir,
+            source_dir=self._training_data(),
+            index_path=self._validated_index_path(),
+            num_workers=self._workers(data_validation.num_workers)
+        )
+
+    def get_data_split_config(self) -> DataSplitConfig:
+        """
+        Get configuration for the train/val/test split every stage reads its images from
+
+        Returns:
+            DataSplitConfig: Source listing, index location and the split shares and seed
+        """
+        root_dir = Path(self.config.data_split.root_dir)
+        create_directory([root_dir])
+
+        return DataSplitConfig(
+            root_dir=root_dir,
+            source_dir=self._training_data(),
+            validated_index_path=self._validated_index_path(),
+            index_path=self._split_index_path(),
+            params_validation_split=float(self.params.SPLIT_VALIDATION),
+            params_test_split=float(self.params.SPLIT_TEST),
+            params_seed=self.params.SPLIT_SEED
+        )
+
+    def get_image_cache_config(self) -> ImageCacheConfig:
+        """
+        Get configuration for the decoded image cache stage
+
+        Returns:
+            ImageCacheConfig: Configuration for building the memory-mapped image shards
+        """
+        image_cache = self.config.image_cache
+        root_dir = Path(image_cache.root_dir)
+        create_directory([root_dir])
+
+        return ImageCacheConfig(
+            root_dir=root_dir,
+            source_dir=self._training_data(),
+            split_index_path=self._split_index_path(),
+            shard_size=image_cache.shard_size,
+            num_workers=self._workers(image_cache.num_workers),
+            params_image_size=self.params.IMAGE_SIZE
+        )
+
+    def get_model_export_config(self) -> ModelExportConfig:
+        """
+        Get configuration for exporting and benchmarking the trained model
+
+        Returns:
+            ModelExportConfig: Configuration for the export stage
+        """
+        root_dir = Path(self.config.export.root_dir)
+        create_directory([root_dir])
+
+        return ModelExportConfig(
+            root_dir=root_dir,
+            model_path=Path(self.config.training.trained_model_path),
+            training_data=self._training_data(),
+            split_index_path=self._split_index_path(),
+            params_image_size=self.params.IMAGE_SIZE,
+            params_preprocessing=self.params.PREPROCESSING,
+            params_export_formats=list(self.params.EXPORT_FORMATS),
+            params_calibration_samples=self.params.EXPORT_CALIBRATION_SAMPLES,
+            params_benchmark_samples=self.params.EXPORT_BENCHMARK_SAMPLES,
+            params_benchmark_batch_sizes=list(self.params.EXPORT_BENCHMARK_BATCH_SIZES),
+            params_benchmark_repeats=self.params.EXPORT_BENCHMARK_REPEATS
+        )
+
+    def _class_names(self, configured=None) -> list:
+        # the model does not store class names, the training folders define them
+        training_data = self._training_data()
+        class_names = configured
+        if not class_names:
+            class_names = sorted(entry.name for entry in os.scandir(training_data) if entry.is_dir()) \
+                if training_data.is_dir() else []
+        if len(class_names) != self.params.CLASSES:
+            class_names = [f"class_{i}" for i in range(self.params.CLASSES)]
+        return list(class_names)
+
+    def get_serving_config(self) -> ServingConfig:
+        """
+        Get model, warm-up, micro-batching, prediction cache and TTA/ensemble configuration for online inference
+
+        Returns:
+            ServingConfig: Configuration for the model registry, inference engine, batching predictor and prediction cache
+        """
+        serving = self.config.serving
+        max_batch_size = serving.max_batch_size
+        model_path = Path(self.config.training.trained_model_path)
+        return ServingConfig(
+            model_path=model_path,
+            warmup_batch_sizes=list(serving.warmup_batch_sizes or [1, max_batch_size]),
+            warmup_runs=serving.warmup_runs,
+            params_image_size=self.params.IMAGE_SIZE,
+            params_preprocessing=self.params.PREPROCESSING,
+            max_batch_size=max_batch_size,
+            max_wait_ms=float(serving.max_wait_ms),
+            max_queue_size=serving.max_queue_size,
+            request_timeout_s=float(serving.request_timeout_s),
+            prediction_cache_path=Path(serving.prediction_cache_path),
+            prediction_cache_memory_mb=float(serving.prediction_cache_memory_mb),
+            prediction_cache_max_rows=serving.prediction_cache_max_rows,
+            class_names=self._class_names(serving.class_names),
+            host=serving.host,
+            port=serving.port,
+            decode_workers=serving.decode_workers or min(os.cpu_count() or 1, 8),
+            max_in_flight=serving.max_in_flight,
+            max_request_images=serving.max_request_images or max_batch_size,
+            max_request_mb=float(serving.max_request_mb),
+            tta_variants=list(serving.tta_variants),
+            tta_crop_fraction=float(serving.tta_crop_fraction),
+            tta_max_variants=serving.tta_max_variants,
+            ensemble_members=[Path(path) for path in serving.ensemble_members or [model_path]],
+            ensemble_max_members=serving.ensemble_max_members,
+            ensemble_reduce=serving.ensemble_reduce,
+            ensemble_max_rows=serving.ensemble_max_rows
+        )
+
+    def get_pipeline_config(self) -> PipelineConfig:
+        """
+        Get configuration for the in-process DAG runner
+
+        Returns:
+            PipelineConfig: Where the runner records the fingerprint of each stage run
+        """
+        return PipelineConfig(
+            state_path=Path(self.config.pipeline.state_path)
+        )
+
+    def get_sweep_config(self) -> SweepConfig:
+        """
+        Get configuration for a hyperparameter sweep over stages 02-04
+
+        Returns:
+            SweepConfig: Search space, scheduling and early stopping settings
+        """
+        sweep = self.config.sweep
+        root_dir = Path(sweep.root_dir)
+        create_directory([root_dir])
+        space = self.params.SWEEP_SPACE
+        if space is None:
+            raise ValueError("Missing 'SWEEP_SPACE' in params.yaml")
+
+        return SweepConfig(
+            root_dir=root_dir,
+            base_model_path=self.get_prepare_base_model_config().base_model_path,
+            training=self.get_training_config(),
+            image_cache=self.get_image_cache_config(),
+            num_workers=sweep.num_workers,
+            threads_per_trial=sweep.threads_per_trial,
+            params_classes=self.params.CLASSES,
+            params_learning_rate=self.params.LEARNING_RATE,
+            params_head_pooling=self.params.HEAD_POOLING,
+            params_search=self.params.SWEEP_SEARCH,
+            params_num_trials=self.params.SWEEP_NUM_TRIALS,
+            params_seed=self.params.SWEEP_SEED,
+            params_space=space.to_dict(),
+            params_early_stopping_patience=self.params.SWEEP_EARLY_STOPPING_PATIENCE,
+            params_prune_warmup_epochs=self.params.SWEEP_PRUNE_WARMUP_EPOCHS,
+            params_prune_min_trials=self.params.SWEEP_PRUNE_MIN_TRIALS
+        )
+
+    def get_performance_config(self) -> PerformanceConfig:
+        """
+        Get XLA, mixed precision and thread pool settings for training
+
+        Returns:
+            PerformanceConfig: Performance mode from params.yaml
+        """
+        return PerformanceConfig(
+            params_jit_compile=self.params.JIT_COMPILE,
+            params_mixed_precision=self.params.MIXED_PRECISION,
+            params_intra_op_threads=self.params.INTRA_OP_THREADS,
+            params_inter_op_threads=self.params.INTER_OP_THREADS
+        )
+
+    def get_instrumentation_config(self, run_log_dir: Path) -> InstrumentationConfig:
+        """
+        Get run log and profiler settings shared by training and evaluation
+
+        Args:
+            run_log_dir (Path): Where the stage writes its run logs
+
+        Returns:
+            InstrumentationConfig: Run log switch and profiler step window from params.yaml
+        """
+        profile_steps = list(self.params.PROFILE_STEPS or [])
+        if profile_steps and (len(profile_steps) != 2 or not 0 <= profile_steps[0] < profile_steps[1]):
+            raise ValueError(f"PROFILE_STEPS must be [start, stop] with 0 <= start < stop, got {profile_steps}")
+        return InstrumentationConfig(
+            run_log_dir=Path(run_log_dir),
+            params_enabled=self.params.INSTRUMENTATION,
+            params_profile_steps=[int(step) for step in profile_steps]
+        )
+
+    def get_distributed_config(self) -> DistributedConfig:
+        """
+        Get the multi-worker cluster for data-parallel training. The
+        TASK_INDEX environment variable overrides `task_index`, so every
+        machine can share one config.yaml.
+
+        Returns:
+            DistributedConfig: Worker addresses, this machine's index and the
+                learning rate scaling rule
+        """
+        distributed = self.config.distributed
+        lr_scaling = self.params.LR_SCALING
+        if lr_scaling not in ('linear', 'sqrt', 'none'):
+            raise ValueError(f"Unknown LR_SCALING {lr_scaling!r}, expected linear, sqrt or none")
+        return DistributedConfig(
+            workers=[str(worker) for worker in distributed.workers],
+            task_index=int(os.environ.get('TASK_INDEX', distributed.task_index)),
+            communication=distributed.communication,
+            params_lr_scaling=lr_scaling
+        )
+
+    def get_fine_tuning_config(self) -> FineTuningConfig:
+        """
+        Get the phases of TRAINING_MODE: progressive. Each phase trains the
+        head plus the last `unfreeze_blocks` backbone blocks for `epochs`
+        epochs at `learning_rate` (LEARNING_RATE when left out).
+
+        Returns:
+            FineTuningConfig: Phases with every key filled in, the layer-wise
+                learning rate decay and whether phases train on cached features
+        """
+        phases = []
+        for number, phase in enumerate(self.params.FINE_TUNE_PHASES, start=1):
+            if not isinstance(phase, dict) or set(phase) - {'unfreeze_blocks', 'epochs', 'learning_rate'}:
+                raise ValueError(f"FINE_TUNE_PHASES entry {number} must be a mapping of unfreeze_blocks, epochs "
+                                 f"and optionally learning_rate, got {phase!r}")
+            unfreeze = int(phase.get('unfreeze_blocks', 0))
+            if phases and unfreeze < phases[-1]['unfreeze_blocks']:
+                raise ValueError(f"FINE_TUNE_PHASES entry {number} unfreezes {unfreeze} blocks, fewer than the "
+                                 f"phase before it; blocks are only ever unfrozen, never frozen again")
+            phases.append({
+                'unfreeze_blocks': unfreeze,
+                'epochs': int(phase.get('epochs', 1)),
+                'learning_rate': float(phase.get('learning_rate', self.params.LEARNING_RATE)),
+            })
+        return FineTuningConfig(
+            params_phases=phases,
+            params_lr_decay=float(self.params.FINE_TUNE_LR_DECAY),
+            params_feature_cache=self.params.FINE_TUNE_FEATURE_CACHE
+        )
+
+    def get_batch_prediction_config(self) -> BatchPredictionConfig:
+        """
+        Get configuration for offline scoring of a directory tree or zip archive
+
+        Returns:
+            BatchPredictionConfig: Source, output, worker pool and checkpoint settings
+        """
+        batch_prediction = self.config.batch_prediction
+        root_dir = Path(batch_prediction.root_dir)
+        create_directory([root_dir])
+
+        return BatchPredictionConfig(
+            root_dir=root_dir,
+            model_path=Path(self.config.training.trained_model_path),
+            source=Path(batch_prediction.source or self._training_data()),
+            output_path=Path(batch_prediction.output_path or root_dir / 'predictions.csv'),
+            checkpoint_path=Path(batch_prediction.checkpoint_path or root_dir / 'checkpoint.json'),
+            class_names=self._class_names(batch_prediction.class_names),
+            num_workers=batch_prediction.num_workers or os.cpu_count() or 1,
+            chunk_size=batch_prediction.chunk_size,
+            batch_size=batch_prediction.batch_size,
+            max_pending_chunks=batch_prediction.max_pending_chunks,
+            checkpoint_every_batches=batch_prediction.checkpoint_every_batches,
             params_image_size=self.params.IMAGE_SIZE,
-            params_batch_size=self.params.BATCH_SIZE
+            params_preprocessing=self.params.PREPROCESSING,
+            performance=self.get_performance_config()
         )
-        return eval_config
\ No newline at end of file
+
+    def get_backbone_benchmark_config(self) -> BackboneBenchmarkConfig:
+        """
+        Get configuration for comparing backbones on size, cost, latency and accuracy
+
+        Returns:
+            BackboneBenchmarkConfig: Backbones to compare and how to train and time each one
+        """
+        root_dir = Path(self.config.backbone_benchmark.root_dir)
+        create_directory([root_dir])
+
+        return BackboneBenchmarkConfig(
+            root_dir=root_dir,
+            prepare_base_model=self.get_prepare_base_model_config(),
+            training=self.get_training_config(),
+            params_backbones=list(self.params.BACKBONE_BENCHMARK_MODELS),
+            params_epochs=self.params.BACKBONE_BENCHMARK_EPOCHS,
+            params_batch_sizes=list(self.params.BACKBONE_BENCHMARK_BATCH_SIZES),
+            params_repeats=self.params.BACKBONE_BENCHMARK_REPEATS
+        )
\ No newline at end of file
@@ -0,0 +1,269 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import difflib
+import hashlib
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+import yaml
+from src.CNNClassifier import logger
+from src.CNNClassifier.config.schema import CONFIG_SCHEMA, PARAMS_SCHEMA, REQUIRED
+
+
+# libyaml is several times faster than the pure Python parser, PyYAML wheels ship it
+class YAML_LOADER(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    pass
+
+
+# PyYAML follows YAML 1.1, where a float needs a dot and `1e-3` stays a string; take the YAML 1.2 form too
+YAML_LOADER.add_implicit_resolver(
+    "tag:yaml.org,2002:float",
+    re.compile(r"^[-+]?[0-9][0-9_]*(?:\.[0-9_]*)?[eE][-+]?[0-9]+$"),
+    list("-+0123456789")
+)
+
+ENV_PREFIX = "CNNCLASSIFIER_"
+ROOTS = ("config", "params")
+
+_lock = threading.Lock()
+# absolute path -> (mtime_ns, size, sha256, parsed YAML)
+_files: Dict[str, tuple] = {}
+# (config sha256, params sha256, overrides) -> (config, params)
+_compiled: Dict[tuple, tuple] = {}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+class ConfigNode:
+    """
+    Read-only view of one validated config section. Keys are attributes,
+    nested sections are nodes themselves; a key that does not exist raises
+    instead of quietly reading as None.
+    """
+    __slots__ = ("_name", "_values")
+
+    def __init__(self, values: Mapping, name: str = ""):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_values", {
+            key: ConfigNode(value, f"{name}.{key}" if name else str(key)) if isinstance(value, Mapping) else value
+            for key, value in values.items()
+        })
+
+    def __getattr__(self, key):
+        # unset slots of a half-built node land here too
+        if key.startswith("_"):
+            raise AttributeError(key)
+        try:
+            return self._values[key]
+        except KeyError:
+            raise AttributeError(f"{self._name or 'config'} has no key {key!r}") from None
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self._name or 'config'} is read-only, use overrides to change {key!r}")
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __reduce__(self):
+        return ConfigNode, (self.to_dict(), self._name)
+
+    def __repr__(self) -> str:
+        return f"ConfigNode({self._name or 'config'}: {', '.join(self._values)})"
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def keys(self):
+        return self._values.keys()
+
+    def items(self):
+        return self._values.items()
+
+    def to_dict(self) -> dict:
+        return {key: value.to_dict() if isinstance(value, ConfigNode) else value for key, value in self._values.items()}
+
+
+def read_yaml_file(path: Path) -> Tuple[str, dict]:
+    """
+    Parse a YAML file once per content. The parse is reused while the mtime
+    and size are unchanged; a file that was only touched is hashed, not
+    parsed again. The result is shared, never modify it.
+
+    Returns:
+        tuple: (sha256 of the file, parsed content)
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with _lock:
+        cached = _files.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2], cached[3]
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if cached is not None and cached[2] == digest:
+        parsed = cached[3]
+    else:
+        parsed = yaml.load(data, Loader=YAML_LOADER) or {}
+        if not isinstance(parsed, dict):
+            raise ConfigError(f"{path} must hold a mapping, got {type(parsed).__name__}")
+    with _lock:
+        _files[path] = (stat.st_mtime_ns, stat.st_size, digest, parsed)
+    return digest, parsed
+
+
+def parse_overrides(items: Iterable[str]) -> Dict[str, object]:
+    """
+    Parse `root.key=value` overrides, e.g. `params.EPOCHS=3` or
+    `config.training.root_dir=artifacts/run2`. Values are YAML, so
+    `[1, 2]`, `true`, `null` and `1e-3` keep their types.
+    """
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep or not key.strip():
+            raise ConfigError(f"override {item!r} is not of the form root.key=value")
+        overrides[key.strip()] = yaml.load(value, Loader=YAML_LOADER)
+    return overrides
+
+
+def env_overrides(environ: Mapping[str, str] = os.environ) -> Dict[str, object]:
+    """
+    Overrides from the environment: CNNCLASSIFIER_PARAMS__EPOCHS=3 sets
+    params.EPOCHS, CNNCLASSIFIER_CONFIG__training__root_dir=... sets
+    config.training.root_dir. `__` separates the levels.
+    """
+    items = []
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        root, _, key = name[len(ENV_PREFIX):].partition("__")
+        if root.lower() in ROOTS and key:
+            items.append(f"{root.lower()}.{key.replace('__', '.')}={value}")
+    return parse_overrides(items)
+
+
+def apply_overrides(tree: dict, overrides: Mapping[str, object], root: str) -> dict:
+    """
+    Returns:
+        dict: `tree` with the overrides under `root` applied, copied along the changed paths only
+    """
+    tree = dict(tree)
+    for dotted, value in overrides.items():
+        override_root, _, path = dotted.partition(".")
+        if override_root not in ROOTS or not path:
+            raise ConfigError(f"override {dotted!r} has to start with one of {ROOTS}")
+        if override_root != root:
+            continue
+        keys = path.split(".")
+        node = tree
+        for key in keys[:-1]:
+            child = node.get(key)
+            node[key] = dict(child) if isinstance(child, dict) else {}
+            node = node[key]
+        node[keys[-1]] = value
+    return tree
+
+
+def _type_name(types) -> str:
+    types = types if isinstance(types, tuple) else (types,)
+    return " or ".join("null" if t is type(None) else t.__name__ for t in types)
+
+
+def validate(tree: Mapping, schema: dict, name: str, errors: list) -> dict:
+    """
+    Check `tree` against `schema` and fill in the defaults. Problems are
+    appended to `errors` so one run reports all of them.
+
+    Returns:
+        dict: Every schema key with its value or default
+    """
+    result = {}
+    for key in tree:
+        if key not in schema:
+            close = difflib.get_close_matches(str(key), list(schema), n=1)
+            errors.append(f"{name}.{key} is not a known key" + (f", did you mean {close[0]}?" if close else ""))
+    for key, spec in schema.items():
+        path = f"{name}.{key}"
+        if isinstance(spec, dict):
+            section = tree.get(key)
+            if section is None:
+                section = {}
+            if not isinstance(section, Mapping):
+                errors.append(f"{path} must be a section, got {section!r}")
+                section = {}
+            result[key] = validate(section, spec, path, errors)
+            continue
+        types, default = spec
+        if key not in tree:
+            if default is REQUIRED:
+                errors.append(f"{path} is required")
+            # defaults are shared with the schema
+            result[key] = list(default) if isinstance(default, list) else default
+            continue
+        value = tree[key]
+        expected = types if isinstance(types, tuple) else (types,)
+        # YAML true/false are ints to isinstance, but never a valid count
+        if not isinstance(value, expected) or (isinstance(value, bool) and bool not in expected):
+            errors.append(f"{path} must be {_type_name(types)}, got {value!r}")
+        result[key] = value
+    return result
+
+
+def load_config(config_filepath: Path, params_filepath: Path,
+                overrides: Optional[Mapping[str, object]] = None) -> Tuple[ConfigNode, ConfigNode]:
+    """
+    Parse, override and validate config.yaml and params.yaml. Overrides from
+    the environment apply first, `overrides` on top of them. The result is
+    cached per file content and overrides, so every ConfigurationManager of
+    a process after the first costs a stat of each file.
+
+    Raises:
+        ConfigError: Listing every unknown, missing or mistyped key
+
+    Returns:
+        tuple: (config, params) as read-only ConfigNodes
+    """
+    config_digest, config_tree = read_yaml_file(config_filepath)
+    params_digest, params_tree = read_yaml_file(params_filepath)
+    merged = {**env_overrides(), **(overrides or {})}
+    key = (config_digest, params_digest, tuple(sorted((k, repr(v)) for k, v in merged.items())))
+    with _lock:
+        compiled = _compiled.get(key)
+    if compiled is not None:
+        return compiled
+
+    config_tree = dict(config_tree)
+    legacy = config_tree.get("data_ingestion")
+    if isinstance(legacy, dict) and "prepare_base_model" in legacy and "prepare_base_model" not in config_tree:
+        config_tree["data_ingestion"] = {k: v for k, v in legacy.items() if k != "prepare_base_model"}
+        config_tree["prepare_base_model"] = legacy["prepare_base_model"]
+    config_tree = apply_overrides(config_tree, merged, "config")
+    params_tree = apply_overrides(params_tree, merged, "params")
+
+    errors = []
+    config = validate(config_tree, CONFIG_SCHEMA, "config", errors)
+    params = validate(params_tree, PARAMS_SCHEMA, "params", errors)
+    if errors:
+        raise ConfigError(f"invalid configuration in {config_filepath} / {params_filepath}:\n  "
+                          + "\n  ".join(errors))
+    for dotted, value in merged.items():
+        logger.info(f"config override {dotted}={value!r}")
+
+    compiled = ConfigNode(config, "config"), ConfigNode(params, "params")
+    with _lock:
+        _compiled[key] = compiled
+    return compiled
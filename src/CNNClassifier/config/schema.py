@@ -0,0 +1,164 @@
+"""
+Every key configs/config.yaml and params.yaml may hold, its type and its
+default. REQUIRED keys have no default; a default of None is filled in by
+the ConfigurationManager getter, usually from another value. A dict is a
+section with schema entries of its own.
+"""
+
+REQUIRED = object()
+
+PATH = str
+NUMBER = (int, float)
+OPTIONAL_LIST = (list, type(None))
+OPTIONAL_INT = (int, type(None))
+OPTIONAL_STR = (str, type(None))
+
+CONFIG_SCHEMA = {
+    "artifacts_root": (PATH, "artifacts"),
+    "data_ingestion": {
+        "root_dir": (PATH, "artifacts/data_ingestion"),
+        "source_url": (str, ""),
+        "local_data_file": (PATH, ""),
+        "unzip_dir": (PATH, ""),
+        "source_sha256": (OPTIONAL_STR, ""),
+        "num_workers": (OPTIONAL_INT, None),  # cpu count
+        "max_retries": (int, 5),
+    },
+    # also accepted under data_ingestion, where older config.yaml files have it
+    "prepare_base_model": {
+        "root_dir": (PATH, REQUIRED),
+        "base_model_path": (PATH, REQUIRED),
+        "updated_base_model_path": (PATH, REQUIRED),
+    },
+    "data_validation": {
+        "root_dir": (PATH, "artifacts/data_validation"),
+        "index_path": (PATH, "artifacts/data_validation/image_index.json"),
+        "num_workers": (OPTIONAL_INT, None),  # cpu count
+    },
+    "data_split": {
+        "root_dir": (PATH, "artifacts/data_split"),
+        "index_path": (PATH, "artifacts/data_split/split.npz"),
+    },
+    "image_cache": {
+        "root_dir": (PATH, "artifacts/image_cache"),
+        "shard_size": (int, 1024),
+        "num_workers": (OPTIONAL_INT, None),  # cpu count
+    },
+    "training": {
+        "root_dir": (PATH, "artifacts/training"),
+        "trained_model_path": (PATH, "artifacts/training/model.h5"),
+        "feature_cache_dir": (PATH, "artifacts/training/features"),
+        "checkpoint_dir": (PATH, "artifacts/training/checkpoints"),
+        "run_log_dir": (PATH, "artifacts/training/run_log"),
+    },
+    "distributed": {
+        "workers": (list, []),
+        "task_index": (int, 0),
+        "communication": (str, "auto"),
+    },
+    "evaluation": {
+        "report_path": (PATH, "artifacts/evaluation/report.json"),
+        "run_log_dir": (PATH, "artifacts/evaluation/run_log"),
+    },
+    "export": {
+        "root_dir": (PATH, "artifacts/export"),
+    },
+    "pipeline": {
+        "state_path": (PATH, "artifacts/pipeline_state.json"),
+    },
+    "sweep": {
+        "root_dir": (PATH, "artifacts/sweep"),
+        "num_workers": (int, 2),
+        "threads_per_trial": (int, 0),
+    },
+    "serving": {
+        "warmup_batch_sizes": (OPTIONAL_LIST, None),  # [1, max_batch_size]
+        "warmup_runs": (int, 2),
+        "max_batch_size": (int, 32),
+        "max_wait_ms": (NUMBER, 5),
+        "max_queue_size": (int, 1024),
+        "request_timeout_s": (NUMBER, 30),
+        "prediction_cache_path": (PATH, "artifacts/serving/prediction_cache.sqlite"),
+        "prediction_cache_memory_mb": (NUMBER, 64),
+        "prediction_cache_max_rows": (int, 100000),
+        "class_names": (OPTIONAL_LIST, None),  # the training folders
+        "host": (str, "0.0.0.0"),
+        "port": (int, 8080),
+        "decode_workers": (int, 0),
+        "max_in_flight": (int, 256),
+        "max_request_images": (OPTIONAL_INT, None),  # max_batch_size
+        "max_request_mb": (NUMBER, 32),
+        "tta_variants": (list, ["identity"]),
+        "tta_crop_fraction": (NUMBER, 0.875),
+        "tta_max_variants": (int, 0),  # all tta_variants
+        "ensemble_members": (OPTIONAL_LIST, None),  # training.trained_model_path
+        "ensemble_max_members": (int, 0),  # all ensemble_members
+        "ensemble_reduce": (str, "mean"),
+        "ensemble_max_rows": (int, 256),
+    },
+    "batch_prediction": {
+        "root_dir": (PATH, "artifacts/batch_prediction"),
+        "source": (OPTIONAL_STR, None),  # the training data
+        "output_path": (OPTIONAL_STR, None),  # root_dir/predictions.csv
+        "checkpoint_path": (OPTIONAL_STR, None),  # root_dir/checkpoint.json
+        "class_names": (OPTIONAL_LIST, None),  # the training folders
+        "num_workers": (int, 0),
+        "chunk_size": (int, 32),
+        "batch_size": (int, 256),
+        "max_pending_chunks": (int, 32),
+        "checkpoint_every_batches": (int, 10),
+    },
+    "backbone_benchmark": {
+        "root_dir": (PATH, "artifacts/backbone_benchmark"),
+    },
+}
+
+PARAMS_SCHEMA = {
+    "AUGMENTATION": (bool, False),
+    "IMAGE_SIZE": (list, REQUIRED),
+    "PREPROCESSING": (str, "rescale"),
+    "BASE_MODEL": (str, "vgg16"),
+    "HEAD_POOLING": (str, "flatten"),
+    "BATCH_SIZE": (int, REQUIRED),
+    "INCLUDE_TOP": (bool, REQUIRED),
+    "EPOCHS": (int, 1),
+    "CLASSES": (int, REQUIRED),
+    "WEIGHTS": (OPTIONAL_STR, REQUIRED),
+    "LEARNING_RATE": (NUMBER, REQUIRED),
+    "SPLIT_VALIDATION": (NUMBER, 0.15),
+    "SPLIT_TEST": (NUMBER, 0.15),
+    "SPLIT_SEED": (int, 42),
+    "INPUT_PIPELINE": (str, "directory"),
+    "TFDATA_CACHE": (str, "disk"),
+    "TRAINING_MODE": (str, "full"),
+    "FEATURE_CACHE_DTYPE": (str, "float32"),
+    "FINE_TUNE_PHASES": (list, [{"unfreeze_blocks": 0, "epochs": 1}]),
+    "FINE_TUNE_LR_DECAY": (NUMBER, 0.3),
+    "FINE_TUNE_FEATURE_CACHE": (bool, True),
+    "CHECKPOINT": (bool, True),
+    "CHECKPOINT_EVERY_STEPS": (int, 0),
+    "CHECKPOINT_MAX_TO_KEEP": (int, 3),
+    "JIT_COMPILE": (bool, False),
+    "MIXED_PRECISION": (str, "float32"),
+    "INTRA_OP_THREADS": (int, 0),
+    "INTER_OP_THREADS": (int, 0),
+    "LR_SCALING": (str, "linear"),
+    "INSTRUMENTATION": (bool, True),
+    "PROFILE_STEPS": (list, []),
+    "EXPORT_FORMATS": (list, ["saved_model", "tflite"]),
+    "EXPORT_CALIBRATION_SAMPLES": (int, 200),
+    "EXPORT_BENCHMARK_SAMPLES": (int, 500),
+    "EXPORT_BENCHMARK_BATCH_SIZES": (list, [1, 8, 32]),
+    "EXPORT_BENCHMARK_REPEATS": (int, 20),
+    "BACKBONE_BENCHMARK_MODELS": (list, ["vgg16"]),
+    "BACKBONE_BENCHMARK_EPOCHS": (int, 3),
+    "BACKBONE_BENCHMARK_BATCH_SIZES": (list, [1, 32]),
+    "BACKBONE_BENCHMARK_REPEATS": (int, 20),
+    "SWEEP_SEARCH": (str, "grid"),
+    "SWEEP_NUM_TRIALS": (int, 8),
+    "SWEEP_SEED": (int, 42),
+    "SWEEP_EARLY_STOPPING_PATIENCE": (int, 2),
+    "SWEEP_PRUNE_WARMUP_EPOCHS": (int, 1),
+    "SWEEP_PRUNE_MIN_TRIALS": (int, 2),
+    "SWEEP_SPACE": ((dict, type(None)), None),  # required by the sweep only
+}
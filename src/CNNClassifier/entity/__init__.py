@@ -4,4 +4,17 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 from src.CNNClassifier.entity.config_entity import(DataIngestionConfig,
                                                    PrepareBaseModelConfig,
                                                    TrainingConfig,
-                                                   EvaluationConfig)
\ No newline at end of file
+                                                   EvaluationConfig,
+                                                   ImageCacheConfig,
+                                                   ImageValidationConfig,
+                                                   DataSplitConfig,
+                                                   ModelExportConfig,
+                                                   ServingConfig,
+                                                   PipelineConfig,
+                                                   SweepConfig,
+                                                   PerformanceConfig,
+                                                   InstrumentationConfig,
+                                                   DistributedConfig,
+                                                   FineTuningConfig,
+                                                   BatchPredictionConfig,
+                                                   BackboneBenchmarkConfig)
\ No newline at end of file
@@ -7,6 +7,9 @@ class DataIngestionConfig:
     source_url:str
     local_data_file:Path
     unzip_dir:Path
+    source_sha256:str
+    num_workers:int
+    max_retries:int
 
 @dataclass(frozen=True)
 class PrepareBaseModelConfig:
@@ -18,8 +21,41 @@ class PrepareBaseModelConfig:
     params_include_top: bool
     params_weights: str
     params_classes: int
+    params_base_model: str
+    params_head_pooling: str
+    params_preprocessing: str
     
     
+@dataclass(frozen=True)
+class PerformanceConfig:
+    params_jit_compile: bool
+    params_mixed_precision: str
+    params_intra_op_threads: int
+    params_inter_op_threads: int
+
+
+@dataclass(frozen=True)
+class InstrumentationConfig:
+    run_log_dir: Path
+    params_enabled: bool
+    params_profile_steps: list
+
+
+@dataclass(frozen=True)
+class DistributedConfig:
+    workers: list
+    task_index: int
+    communication: str
+    params_lr_scaling: str
+
+
+@dataclass(frozen=True)
+class FineTuningConfig:
+    params_phases: list
+    params_lr_decay: float
+    params_feature_cache: bool
+
+
 @dataclass(frozen=True)
 class TrainingConfig:
     root_dir: Path
@@ -30,10 +66,151 @@ class TrainingConfig:
     params_batch_size: int
     params_is_augmentation: bool
     params_image_size: list
+    params_preprocessing: str
+    params_input_pipeline: str
+    params_tfdata_cache: str
+    params_training_mode: str
+    params_feature_cache_dtype: str
+    params_checkpoint: bool
+    params_checkpoint_every_steps: int
+    params_checkpoint_max_to_keep: int
+    image_cache_dir: Path
+    feature_cache_dir: Path
+    checkpoint_dir: Path
+    split_index_path: Path
+    performance: PerformanceConfig
+    instrumentation: InstrumentationConfig
+    distributed: DistributedConfig
+    fine_tuning: FineTuningConfig
 
 @dataclass(frozen=True)
 class EvaluationConfig:
     path_of_model: Path
     training_data: Path
     params_image_size: list
-    params_batch_size: int
\ No newline at end of file
+    params_preprocessing: str
+    params_batch_size: int
+    params_input_pipeline: str
+    image_cache_dir: Path
+    split_index_path: Path
+    report_path: Path
+    instrumentation: InstrumentationConfig
+
+@dataclass(frozen=True)
+class ImageValidationConfig:
+    root_dir: Path
+    source_dir: Path
+    index_path: Path
+    num_workers: int
+
+@dataclass(frozen=True)
+class DataSplitConfig:
+    root_dir: Path
+    source_dir: Path
+    validated_index_path: Path
+    index_path: Path
+    params_validation_split: float
+    params_test_split: float
+    params_seed: int
+
+@dataclass(frozen=True)
+class ImageCacheConfig:
+    root_dir: Path
+    source_dir: Path
+    split_index_path: Path
+    shard_size: int
+    num_workers: int
+    params_image_size: list
+
+@dataclass(frozen=True)
+class ModelExportConfig:
+    root_dir: Path
+    model_path: Path
+    training_data: Path
+    split_index_path: Path
+    params_image_size: list
+    params_preprocessing: str
+    params_export_formats: list
+    params_calibration_samples: int
+    params_benchmark_samples: int
+    params_benchmark_batch_sizes: list
+    params_benchmark_repeats: int
+
+@dataclass(frozen=True)
+class ServingConfig:
+    model_path: Path
+    warmup_batch_sizes: list
+    warmup_runs: int
+    params_image_size: list
+    params_preprocessing: str
+    max_batch_size: int
+    max_wait_ms: float
+    max_queue_size: int
+    request_timeout_s: float
+    prediction_cache_path: Path
+    prediction_cache_memory_mb: float
+    prediction_cache_max_rows: int
+    class_names: list
+    host: str
+    port: int
+    decode_workers: int
+    max_in_flight: int
+    max_request_images: int
+    max_request_mb: float
+    tta_variants: list
+    tta_crop_fraction: float
+    tta_max_variants: int
+    ensemble_members: list
+    ensemble_max_members: int
+    ensemble_reduce: str
+    ensemble_max_rows: int
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    state_path: Path
+
+@dataclass(frozen=True)
+class SweepConfig:
+    root_dir: Path
+    base_model_path: Path
+    training: TrainingConfig
+    image_cache: ImageCacheConfig
+    num_workers: int
+    threads_per_trial: int
+    params_classes: int
+    params_learning_rate: float
+    params_head_pooling: str
+    params_search: str
+    params_num_trials: int
+    params_seed: int
+    params_space: dict
+    params_early_stopping_patience: int
+    params_prune_warmup_epochs: int
+    params_prune_min_trials: int
+
+@dataclass(frozen=True)
+class BatchPredictionConfig:
+    root_dir: Path
+    model_path: Path
+    source: Path
+    output_path: Path
+    checkpoint_path: Path
+    class_names: list
+    num_workers: int
+    chunk_size: int
+    batch_size: int
+    max_pending_chunks: int
+    checkpoint_every_batches: int
+    params_image_size: list
+    params_preprocessing: str
+    performance: PerformanceConfig
+
+@dataclass(frozen=True)
+class BackboneBenchmarkConfig:
+    root_dir: Path
+    prepare_base_model: PrepareBaseModelConfig
+    training: TrainingConfig
+    params_backbones: list
+    params_epochs: int
+    params_batch_sizes: list
+    params_repeats: int
\ No newline at end of file
@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import argparse
+from dataclasses import replace
+from pathlib import Path
+from src.CNNClassifier.config import ConfigurationManager, parse_overrides
+from src.CNNClassifier.components.batch_prediction import BatchPrediction
+from src.CNNClassifier import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a directory tree or zip archive of images with the trained model")
+    parser.add_argument("--source", type=Path, help="directory or .zip archive, overrides batch_prediction.source")
+    parser.add_argument("--output", type=Path, help=".csv file or .parquet directory, overrides batch_prediction.output_path")
+    parser.add_argument("--checkpoint", type=Path, help="overrides batch_prediction.checkpoint_path")
+    parser.add_argument("--workers", type=int, help="decode processes, overrides batch_prediction.num_workers")
+    parser.add_argument("--batch-size", type=int, help="images per predict call")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--set", dest="config_overrides", action="append", default=[], metavar="ROOT.KEY=VALUE",
+                        help="override any config.yaml or params.yaml value, e.g. params.PREPROCESSING=vgg16")
+    args = parser.parse_args()
+
+    config = ConfigurationManager(overrides=parse_overrides(args.config_overrides)).get_batch_prediction_config()
+    overrides = {"source": args.source, "output_path": args.output, "checkpoint_path": args.checkpoint,
+                 "num_workers": args.workers, "batch_size": args.batch_size}
+    config = replace(config, **{key: value for key, value in overrides.items() if value is not None})
+    if args.restart:
+        Path(config.checkpoint_path).unlink(missing_ok=True)
+    BatchPrediction(config=config).run()
+
+
+# decode workers are spawned processes that re-import this module
+if __name__ == "__main__":
+    try:
+        logger.info("batch prediction started")
+        main()
+        logger.info("batch prediction completed")
+    except Exception as e:
+        raise e
\ No newline at end of file
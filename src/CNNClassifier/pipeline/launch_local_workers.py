@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import argparse
+import json
+import signal
+import socket
+import subprocess
+import time
+from src.CNNClassifier import logger
+
+STAGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stage_03_train.py")
+
+
+def free_ports(count: int) -> list:
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("localhost", 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def launch(num_workers: int, threads_per_worker: int = 0, script: str = STAGE_SCRIPT) -> int:
+    """
+    Run `script` as a cluster of `num_workers` local processes, each with
+    the TF_CONFIG of one worker, to try out or test multi-worker training on
+    one machine. The first worker to fail stops the others.
+
+    Args:
+        num_workers (int): Processes to start
+        threads_per_worker (int): TensorFlow threads per process, 0 = cpu count / num_workers
+        script (str): Training entry point
+
+    Returns:
+        int: 0 when every worker succeeded, else the exit code of the first failure
+    """
+    workers = [f"localhost:{port}" for port in free_ports(num_workers)]
+    threads = threads_per_worker or max((os.cpu_count() or 1) // num_workers, 1)
+    processes = []
+    for index in range(num_workers):
+        env = dict(os.environ,
+                   TF_CONFIG=json.dumps({"cluster": {"worker": workers}, "task": {"type": "worker", "index": index}}),
+                   # without this every worker sizes its thread pools for the whole machine
+                   TF_NUM_INTRAOP_THREADS=str(threads), TF_NUM_INTEROP_THREADS=str(min(threads, 2)))
+        processes.append(subprocess.Popen([sys.executable, script], env=env))
+    logger.info(f"started {num_workers} workers on {', '.join(workers)}, {threads} threads each")
+    # a terminated launcher takes its workers down with it
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    try:
+        while True:
+            codes = [process.poll() for process in processes]
+            failed = [(index, code) for index, code in enumerate(codes) if code not in (None, 0)]
+            if failed:
+                index, code = failed[0]
+                logger.error(f"worker {index} exited with code {code}, stopping the others")
+                return code
+            if all(code == 0 for code in codes):
+                logger.info(f"all {num_workers} workers finished")
+                return 0
+            time.sleep(0.5)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                # a worker blocked in a collective does not always act on SIGTERM
+                process.kill()
+                process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run stage_03_train as a multi-worker cluster of local processes")
+    parser.add_argument("--num-workers", type=int, default=2)
+    parser.add_argument("--threads-per-worker", type=int, default=0, help="0 = cpu count / num workers")
+    args = parser.parse_args()
+    if args.num_workers < 2:
+        parser.error("--num-workers must be at least 2")
+    sys.exit(launch(args.num_workers, args.threads_per_worker))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        raise e
@@ -0,0 +1,296 @@
+"""
+Run the pipeline stages as a DAG in a single process.
+
+Configuration is read once and models are handed between stages in memory
+instead of being reloaded from disk. A stage is skipped when the fingerprint
+of its config (section and params), the content hashes of its inputs and the
+fingerprints of its upstream stages match the last recorded run and its
+outputs still exist. Forcing a stage drops the recorded runs of that stage
+and everything downstream of it; upstream stages are left alone.
+
+    python src/CNNClassifier/pipeline/runner.py
+    python src/CNNClassifier/pipeline/runner.py --targets model_export
+    python src/CNNClassifier/pipeline/runner.py --force training
+    python src/CNNClassifier/pipeline/runner.py --dry-run
+    python src/CNNClassifier/pipeline/runner.py --set params.EPOCHS=3 --set params.BATCH_SIZE=32
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import argparse
+import dataclasses
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from src.CNNClassifier import logger
+from src.CNNClassifier.config import ConfigurationManager, parse_overrides
+from src.CNNClassifier.utils.hashing import ContentHasher
+from src.CNNClassifier.utils.image_cache import INDEX_FILE
+
+STATE_VERSION = 1
+DEFAULT_TARGETS = ("evaluation",)
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    deps: Tuple[str, ...]
+    get_config: Callable[[ConfigurationManager], Any]
+    run: Callable[[Any, dict], None]
+    inputs: Callable[[Any], List[Path]]
+    outputs: Callable[[Any], List[Path]]
+    enabled: Callable[[ConfigurationManager], bool] = lambda manager: True
+
+
+# Each run function receives the stage config and the shared in-memory context.
+# Components are imported inside them so only the stages that run load TensorFlow.
+
+def run_data_ingestion(config, context):
+    from src.CNNClassifier.components import DataIngestion
+    data_ingestion = DataIngestion(config=config)
+    data_ingestion.download_file()
+    data_ingestion.unzip_and_clean()
+
+
+def run_image_validation(config, context):
+    from src.CNNClassifier.components import ImageValidation
+    ImageValidation(config=config).validate()
+
+
+def run_data_split(config, context):
+    from src.CNNClassifier.components import DatasetSplit
+    DatasetSplit(config=config).split()
+
+
+def run_image_cache(config, context):
+    from src.CNNClassifier.components import ImageCache
+    ImageCache(config=config).build()
+
+
+def run_prepare_base_model(config, context):
+    from src.CNNClassifier.components import PrepareBaseModel
+    prepare_base_model = PrepareBaseModel(config=config)
+    prepare_base_model.get_base_model()
+    prepare_base_model.update_base_model()
+    context["updated_base_model"] = prepare_base_model.full_model
+
+
+def run_training(config, context):
+    from src.CNNClassifier.components import Training
+    training = Training(config=config, model=context.pop("updated_base_model", None))
+    training.get_base_model()
+    training.train_valid_generator()
+    training.train()
+    context["trained_model"] = training.model
+
+
+def run_evaluation(config, context):
+    from src.CNNClassifier.components import Evaluation
+    evaluation = Evaluation(config, model=context.get("trained_model"))
+    evaluation.evaluation()
+    evaluation.save_score()
+
+
+def run_model_export(config, context):
+    from src.CNNClassifier.components import ModelExport
+    model_export = ModelExport(config=config, model=context.get("trained_model"))
+    model_export.export()
+    model_export.benchmark()
+
+
+def run_backbone_benchmark(config, context):
+    from src.CNNClassifier.components import BackboneBenchmark
+    BackboneBenchmark(config=config).run()
+
+
+# in topological order, every stage comes after its dependencies
+STAGES = (
+    Stage("data_ingestion", (),
+          ConfigurationManager.get_data_ingestion_config, run_data_ingestion,
+          inputs=lambda c: [],
+          outputs=lambda c: [Path(c.local_data_file), Path(c.unzip_dir) / "extract_manifest.json"]),
+    Stage("image_validation", ("data_ingestion",),
+          ConfigurationManager.get_image_validation_config, run_image_validation,
+          inputs=lambda c: [c.source_dir],
+          outputs=lambda c: [c.index_path]),
+    # stages downstream of the split read their file lists from its index instead of listing the dataset
+    Stage("data_split", ("image_validation",),
+          ConfigurationManager.get_data_split_config, run_data_split,
+          inputs=lambda c: [c.source_dir, c.validated_index_path],
+          outputs=lambda c: [c.index_path]),
+    Stage("image_cache", ("data_split",),
+          ConfigurationManager.get_image_cache_config, run_image_cache,
+          inputs=lambda c: [c.split_index_path],
+          outputs=lambda c: [c.root_dir / INDEX_FILE],
+          enabled=lambda manager: manager.params.INPUT_PIPELINE == "cache"),
+    Stage("prepare_base_model", (),
+          ConfigurationManager.get_prepare_base_model_config, run_prepare_base_model,
+          inputs=lambda c: [],
+          outputs=lambda c: [c.base_model_path, c.updated_base_model_path]),
+    Stage("training", ("prepare_base_model", "data_split", "image_cache"),
+          ConfigurationManager.get_training_config, run_training,
+          inputs=lambda c: [c.updated_base_model_path, c.split_index_path],
+          outputs=lambda c: [c.trained_model_path]),
+    Stage("evaluation", ("training",),
+          ConfigurationManager.get_validation_config, run_evaluation,
+          inputs=lambda c: [Path(c.path_of_model), c.split_index_path],
+          outputs=lambda c: [Path("scores.json"), c.report_path]),
+    Stage("model_export", ("training",),
+          ConfigurationManager.get_model_export_config, run_model_export,
+          inputs=lambda c: [c.model_path, c.split_index_path],
+          outputs=lambda c: [c.root_dir / "benchmark.json"]),
+    Stage("backbone_benchmark", ("data_split", "image_cache"),
+          ConfigurationManager.get_backbone_benchmark_config, run_backbone_benchmark,
+          inputs=lambda c: [c.training.split_index_path],
+          outputs=lambda c: [c.root_dir / "report.json"]),
+)
+
+
+def config_fingerprint(config) -> dict:
+    return json.loads(json.dumps(dataclasses.asdict(config), sort_keys=True, default=str))
+
+
+class PipelineRunner:
+    def __init__(self, manager: ConfigurationManager, stages: Sequence[Stage] = STAGES):
+        self.manager = manager
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = manager.get_pipeline_config().state_path
+        self.state = self.load_state()
+        self.hasher = ContentHasher(self.state.get("file_hashes"))
+        # models and other objects handed from one stage to the next
+        self.context: Dict[str, Any] = {}
+
+    def load_state(self) -> dict:
+        if self.state_path.exists():
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get("version") == STATE_VERSION:
+                return state
+        return {"version": STATE_VERSION, "stages": {}, "file_hashes": {}}
+
+    def save_state(self):
+        self.hasher.prune()
+        self.state["file_hashes"] = self.hasher.memo
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+    def downstream(self, names: Sequence[str]) -> List[str]:
+        """
+        Returns:
+            list: The given stages and every stage that depends on them, in DAG order
+        """
+        selected = set(names)
+        for stage in self.stages.values():
+            if selected.intersection(stage.deps):
+                selected.add(stage.name)
+        return [name for name in self.stages if name in selected]
+
+    def plan(self, targets: Sequence[str]) -> List[str]:
+        """
+        Returns:
+            list: Enabled stages needed to produce `targets`, in DAG order
+        """
+        unknown = set(targets) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {list(self.stages)}")
+        needed, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name in needed or not self.stages[name].enabled(self.manager):
+                continue
+            needed.add(name)
+            pending.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in needed]
+
+    def invalidate(self, names: Sequence[str], persist: bool = True):
+        unknown = set(names) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {list(self.stages)}")
+        for name in self.downstream(names):
+            if self.state["stages"].pop(name, None) is not None:
+                logger.info(f"invalidated recorded run of stage {name}")
+        if persist:
+            self.save_state()
+
+    def fingerprint(self, stage: Stage, config) -> str:
+        upstream = {dep: self.state["stages"].get(dep, {}).get("fingerprint")
+                    for dep in stage.deps if self.stages[dep].enabled(self.manager)}
+        payload = {
+            "config": config_fingerprint(config),
+            "inputs": {str(path): self.hasher.hash_path(path) for path in stage.inputs(config)},
+            "upstream": upstream,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def is_up_to_date(self, stage: Stage, config, fingerprint: str) -> bool:
+        recorded = self.state["stages"].get(stage.name)
+        if recorded is None or recorded["fingerprint"] != fingerprint:
+            return False
+        return all(Path(path).exists() for path in stage.outputs(config))
+
+    def run(self, targets: Sequence[str] = DEFAULT_TARGETS, force: Sequence[str] = (), dry_run: bool = False):
+        if force:
+            self.invalidate(force, persist=not dry_run)
+
+        for name in self.plan(targets):
+            stage = self.stages[name]
+            config = stage.get_config(self.manager)
+            fingerprint = self.fingerprint(stage, config)
+            if self.is_up_to_date(stage, config, fingerprint):
+                logger.info(f"stage {name} is up to date, skipping")
+                continue
+            if dry_run:
+                logger.info(f"stage {name} would run")
+                # downstream fingerprints cannot be known before this stage has produced its outputs
+                self.invalidate([name], persist=False)
+                continue
+
+            logger.info(f"stage {name} started")
+            started = time.perf_counter()
+            stage.run(config, self.context)
+            elapsed = time.perf_counter() - started
+            self.state["stages"][name] = {
+                "fingerprint": fingerprint,
+                "completed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "duration_s": round(elapsed, 3),
+                "outputs": {str(path): self.hasher.hash_path(path) for path in stage.outputs(config)},
+            }
+            self.save_state()
+            logger.info(f"stage {name} completed in {elapsed:.1f}s")
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=list(DEFAULT_TARGETS),
+                        help=f"stages to bring up to date together with their dependencies, "
+                             f"any of {[stage.name for stage in STAGES]}")
+    parser.add_argument("--force", nargs="+", default=[],
+                        help="stages to re-run, everything downstream of them is re-run too")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages would run")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="ROOT.KEY=VALUE",
+                        help="override a config.yaml or params.yaml value for this run, e.g. params.EPOCHS=3")
+    args = parser.parse_args(argv)
+
+    manager = ConfigurationManager(overrides=parse_overrides(args.overrides))
+    performance = manager.get_performance_config()
+    if performance.params_intra_op_threads > 0 or performance.params_inter_op_threads > 0:
+        # thread pools must be sized before the first stage initialises TensorFlow
+        from src.CNNClassifier.components.performance import configure_threads
+        configure_threads(performance)
+    runner = PipelineRunner(manager)
+    runner.run(targets=args.targets, force=args.force, dry_run=args.dry_run)
+
+
+# the export benchmark spawns worker processes that re-import this module
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        raise e
@@ -0,0 +1,16 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.components.stage_05_image_cache import ImageCache
+from src.CNNClassifier import logger
+
+try:
+    logger.info("image cache stage started")
+    config = ConfigurationManager()
+    image_cache_config = config.get_image_cache_config()
+    image_cache = ImageCache(config=image_cache_config)
+    image_cache.build()
+    logger.info("image cache stage completed")
+except Exception as e:
+    raise e
\ No newline at end of file
@@ -0,0 +1,16 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.components.stage_06_validate_images import ImageValidation
+from src.CNNClassifier import logger
+
+try:
+    logger.info("image validation stage started")
+    config = ConfigurationManager()
+    image_validation_config = config.get_image_validation_config()
+    image_validation = ImageValidation(config=image_validation_config)
+    image_validation.validate()
+    logger.info("image validation stage completed")
+except Exception as e:
+    raise e
\ No newline at end of file
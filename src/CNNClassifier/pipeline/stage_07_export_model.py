@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.components.stage_07_export_model import ModelExport
+from src.CNNClassifier import logger
+
+# the benchmark spawns worker processes that re-import this module
+if __name__ == "__main__":
+    try:
+        logger.info("model export stage started")
+        config = ConfigurationManager()
+        model_export_config = config.get_model_export_config()
+        model_export = ModelExport(config=model_export_config)
+        model_export.export()
+        model_export.benchmark()
+        logger.info("model export stage completed")
+    except Exception as e:
+        raise e
\ No newline at end of file
@@ -0,0 +1,18 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.components import BackboneBenchmark
+from src.CNNClassifier import logger
+
+# every backbone is benchmarked in a spawned worker process that re-imports this module
+if __name__ == "__main__":
+    try:
+        logger.info("backbone benchmark stage started")
+        config = ConfigurationManager()
+        backbone_benchmark_config = config.get_backbone_benchmark_config()
+        backbone_benchmark = BackboneBenchmark(config=backbone_benchmark_config)
+        backbone_benchmark.run()
+        logger.info("backbone benchmark stage completed")
+    except Exception as e:
+        raise e
\ No newline at end of file
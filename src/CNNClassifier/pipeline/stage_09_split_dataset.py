@@ -0,0 +1,16 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.components.stage_09_split_dataset import DatasetSplit
+from src.CNNClassifier import logger
+
+try:
+    logger.info("dataset split stage started")
+    config = ConfigurationManager()
+    data_split_config = config.get_data_split_config()
+    data_split = DatasetSplit(config=data_split_config)
+    data_split.split()
+    logger.info("dataset split stage completed")
+except Exception as e:
+    raise e
\ No newline at end of file
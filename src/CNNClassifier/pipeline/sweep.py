@@ -0,0 +1,18 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.components.sweep import HyperparameterSweep
+from src.CNNClassifier import logger
+
+# trials run in spawned worker processes that re-import this module
+if __name__ == "__main__":
+    try:
+        logger.info("hyperparameter sweep started")
+        config = ConfigurationManager()
+        sweep_config = config.get_sweep_config()
+        sweep = HyperparameterSweep(config=sweep_config)
+        sweep.run()
+        logger.info("hyperparameter sweep completed")
+    except Exception as e:
+        raise e
\ No newline at end of file
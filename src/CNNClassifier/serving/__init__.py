@@ -0,0 +1,7 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from src.CNNClassifier.serving.batcher import BatchingPredictor, ServingStats
+from src.CNNClassifier.serving.ensemble import InferenceEngine, TTA_VARIANTS
+from src.CNNClassifier.serving.prediction_cache import PredictionCache, PredictionCacheStats
+from src.CNNClassifier.serving.model_registry import ModelRegistry, ServedModel, registry
\ No newline at end of file
@@ -0,0 +1,268 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Optional, Sequence
+import numpy as np
+from src.CNNClassifier import logger
+from src.CNNClassifier.utils.preprocessing import preprocess_batch
+
+
+class ServingStats:
+    def __init__(self, latency_window: int = 10000):
+        """
+        Thread-safe throughput and latency counters for the micro-batcher.
+
+        Args:
+            latency_window (int): Number of most recent request latencies kept
+                for the percentile estimates
+        """
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self._started_at = time.perf_counter()
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.errors = 0
+        self.forward_seconds = 0.0
+
+    def record_batch(self, batch_size: int, forward_seconds: float, latencies: list):
+        with self._lock:
+            self.batches += 1
+            self.requests += batch_size
+            self.forward_seconds += forward_seconds
+            self._batch_sizes.append(batch_size)
+            self._latencies.extend(latencies)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def record_error(self, batch_size: int):
+        with self._lock:
+            self.errors += batch_size
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._batch_sizes.clear()
+            self._started_at = time.perf_counter()
+            self.requests = self.batches = self.rejected = self.errors = 0
+            self.forward_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: Request/batch counters, throughput and p50/p95/p99 latency in ms
+        """
+        with self._lock:
+            latencies = np.asarray(self._latencies, dtype=np.float64)
+            batch_sizes = np.asarray(self._batch_sizes, dtype=np.float64)
+            elapsed = time.perf_counter() - self._started_at
+            snapshot = {
+                "requests": self.requests,
+                "batches": self.batches,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "uptime_s": elapsed,
+                "throughput_rps": self.requests / elapsed if elapsed > 0 else 0.0,
+                "mean_batch_size": float(batch_sizes.mean()) if batch_sizes.size else 0.0,
+                "mean_forward_ms": 1000.0 * self.forward_seconds / self.batches if self.batches else 0.0,
+            }
+        if latencies.size:
+            p50, p95, p99 = (float(p) for p in np.percentile(latencies, [50, 95, 99]) * 1000.0)
+            snapshot.update(latency_p50_ms=p50, latency_p95_ms=p95, latency_p99_ms=p99,
+                            latency_max_ms=float(latencies.max()) * 1000.0)
+        else:
+            snapshot.update(latency_p50_ms=0.0, latency_p95_ms=0.0, latency_p99_ms=0.0, latency_max_ms=0.0)
+        return snapshot
+
+
+class _Request:
+    __slots__ = ("inputs", "future", "enqueued_at")
+
+    def __init__(self, inputs: np.ndarray):
+        self.inputs = inputs
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchingPredictor:
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+        input_shape: Optional[Sequence[int]] = None):
+        """
+        Groups concurrent single-image requests into one forward pass.
+
+        A background worker takes the first queued request, then keeps collecting
+        until either `max_batch_size` requests are gathered or `max_wait_ms` has
+        passed since that first request. The stacked batch goes through
+        `predict_fn` once and each caller gets its own row back.
+
+        Args:
+            predict_fn (Callable): Maps a (batch, ...) array to a (batch, ...) array
+            max_batch_size (int): Upper bound on requests per forward pass
+            max_wait_ms (float): Longest time the first request of a batch waits for company
+            max_queue_size (int): Requests beyond this many pending are rejected
+            input_shape (Sequence[int], optional): Shape of one un-batched input; when None
+                the first submitted input fixes it. Inputs of another shape are rejected
+                in `submit`, so they never reach a micro-batch shared with other requests
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.input_shape = tuple(input_shape) if input_shape is not None else None
+        self.stats = ServingStats()
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._worker = None
+
+    @classmethod
+    def from_keras_model(cls, model, preprocessing: Optional[str] = None, **kwargs) -> "BatchingPredictor":
+        """
+        Args:
+            model (tf.keras.Model): Model to serve
+            preprocessing (str, optional): `preprocess_batch` mode; when set, requests
+                carry raw pixels and each stacked micro-batch is normalized in one pass
+        """
+        # predict_on_batch skips the per-call data adapter setup that model.predict does
+        kwargs.setdefault("input_shape", tuple(model.input_shape[1:]))
+        if preprocessing is None:
+            return cls(predict_fn=model.predict_on_batch, **kwargs)
+        image_size = tuple(model.input_shape[1:3])
+        return cls(
+            predict_fn=lambda batch: model.predict_on_batch(preprocess_batch(batch, image_size, preprocessing)),
+            **kwargs
+        )
+
+    def start(self) -> "BatchingPredictor":
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="batching-predictor", daemon=True)
+            self._worker.start()
+            logger.info(f"batching predictor started: max_batch_size={self.max_batch_size}, "
+                        f"max_wait_ms={self.max_wait * 1000.0}")
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+        self._fail_pending(RuntimeError("batching predictor stopped"))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, inputs: np.ndarray) -> Future:
+        """
+        Queue one un-batched input (e.g. a (224, 224, 3) image).
+
+        Returns:
+            Future: Resolves to the model output row for this input
+
+        Raises:
+            ValueError: The input is not numeric or not of `input_shape`; only this
+                request is refused, the micro-batch it would have joined is unaffected
+        """
+        if self._worker is None:
+            raise RuntimeError("batching predictor is not running, call start() first")
+        inputs = np.asarray(inputs)
+        try:
+            self._check_input(inputs)
+        except ValueError:
+            self.stats.record_rejected()
+            raise
+        request = _Request(inputs)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            self.stats.record_rejected()
+            raise
+        return request.future
+
+    def _check_input(self, inputs: np.ndarray):
+        # np.stack in _run would fail the whole micro-batch on one odd input, refuse it here instead
+        if inputs.dtype.kind not in "biuf":
+            raise ValueError(f"inputs must be numeric, got dtype {inputs.dtype}")
+        if self.input_shape is None:
+            self.input_shape = inputs.shape
+        elif inputs.shape != self.input_shape:
+            raise ValueError(f"inputs must have shape {self.input_shape}, got {inputs.shape}")
+
+    def predict(self, inputs: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        return self.submit(inputs).result(timeout=timeout)
+
+    def _collect(self) -> list:
+        batch, deadline = [], None
+        while len(batch) < self.max_batch_size:
+            try:
+                if deadline is None:
+                    request = self._queue.get(timeout=0.1)
+                elif deadline - time.perf_counter() <= 0:
+                    request = self._queue.get_nowait()
+                else:
+                    request = self._queue.get(timeout=deadline - time.perf_counter())
+            except queue.Empty:
+                break
+            # callers that gave up (a timeout cancels the future) get no forward pass; the rest can no longer be cancelled
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            if deadline is None:
+                deadline = request.enqueued_at + self.max_wait
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                self._predict_batch(batch)
+            except Exception as e:
+                # one bad batch must not end the worker, every later request would hang
+                logger.error(f"batched forward pass failed for {len(batch)} requests: {e}")
+                self.stats.record_error(len(batch))
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _predict_batch(self, batch: list):
+        inputs = np.stack([request.inputs for request in batch])
+        started = time.perf_counter()
+        outputs = np.asarray(self.predict_fn(inputs))
+        finished = time.perf_counter()
+        if outputs.ndim == 0 or len(outputs) != len(batch):
+            raise ValueError(f"predict_fn returned shape {outputs.shape} for a batch of {len(batch)}, one row per request expected")
+
+        for request, output in zip(batch, outputs):
+            request.future.set_result(output)
+        self.stats.record_batch(
+            batch_size=len(batch),
+            forward_seconds=finished - started,
+            latencies=[finished - request.enqueued_at for request in batch]
+        )
+
+    def _fail_pending(self, error: Exception):
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(error)
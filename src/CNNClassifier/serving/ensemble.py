@@ -0,0 +1,218 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import threading
+from typing import Optional, Sequence
+import numpy as np
+from src.CNNClassifier import logger
+from src.CNNClassifier.utils.preprocessing import preprocess_batch
+
+TTA_VARIANTS = ("identity", "hflip", "center_crop", "crop_top_left", "crop_top_right", "crop_bottom_left",
+                "crop_bottom_right", "vflip")
+ENSEMBLE_REDUCTIONS = ("mean", "geometric_mean")
+
+
+def tta_boxes(variants: Sequence[str], crop_fraction: float = 0.875) -> np.ndarray:
+    """
+    Every variant as a normalized `crop_and_resize` box [y1, x1, y2, x2].
+    A box with x1 > x2 samples the image left-right mirrored, y1 > y2 upside
+    down, so flips and crops are the same op and a whole batch of variants
+    is one resampling pass.
+
+    Returns:
+        np.ndarray: (len(variants), 4) float32 boxes
+    """
+    if not 0 < crop_fraction <= 1:
+        raise ValueError(f"crop_fraction must be in (0, 1], got {crop_fraction}")
+    margin = 1.0 - crop_fraction
+    boxes = {
+        "identity": (0.0, 0.0, 1.0, 1.0),
+        "hflip": (0.0, 1.0, 1.0, 0.0),
+        "vflip": (1.0, 0.0, 0.0, 1.0),
+        "center_crop": (margin / 2, margin / 2, 1.0 - margin / 2, 1.0 - margin / 2),
+        "crop_top_left": (0.0, 0.0, crop_fraction, crop_fraction),
+        "crop_top_right": (0.0, margin, crop_fraction, 1.0),
+        "crop_bottom_left": (margin, 0.0, 1.0, crop_fraction),
+        "crop_bottom_right": (margin, margin, 1.0, 1.0),
+    }
+    unknown = [variant for variant in variants if variant not in boxes]
+    if unknown:
+        raise ValueError(f"unknown TTA variants {unknown}, expected any of {TTA_VARIANTS}")
+    return np.asarray([boxes[variant] for variant in variants], dtype=np.float32)
+
+
+class InferenceEngine:
+    def __init__(
+        self,
+        models: Sequence,
+        variants: Sequence[str] = ("identity",),
+        crop_fraction: float = 0.875,
+        reduction: str = "mean",
+        preprocessing: Optional[str] = None,
+        max_variants: Optional[int] = None,
+        max_members: Optional[int] = None,
+        max_rows: int = 256,
+        member_fingerprints: Sequence[str] = ()):
+        """
+        Test-time augmentation and model ensembling as one batched forward
+        pass. A batch of n images is expanded into its V variants inside
+        the graph, one (V * n) tensor that every one of the M members runs
+        on, and the (M, V, n, classes) outputs are averaged in a single
+        reduction. Compared to V * M separate `predict` calls this pays the
+        Python and dispatch overhead once and keeps the batches large.
+
+        Args:
+            models (Sequence[tf.keras.Model]): Ensemble members, same input shape and classes
+            variants (Sequence[str]): TTA_VARIANTS to average over, "identity" is the plain image
+            crop_fraction (float): Side of the crop variants relative to the image
+            reduction (str): "mean" of the probabilities, or "geometric_mean" (mean log-probability)
+            preprocessing (str, optional): `preprocess_batch` mode; when set, `predict` takes raw pixels
+            max_variants (int, optional): Default budget, the first this many variants; None for all
+            max_members (int, optional): Default budget, the first this many members; None for all
+            max_rows (int): Expanded rows per forward pass, larger inputs are run in chunks
+            member_fingerprints (Sequence[str]): `ServedModel.fingerprint` of each member, for `signature`
+        """
+        if not models:
+            raise ValueError("an ensemble needs at least one model")
+        if reduction not in ENSEMBLE_REDUCTIONS:
+            raise ValueError(f"Unknown reduction {reduction!r}, expected one of {ENSEMBLE_REDUCTIONS}")
+        input_shapes = {tuple(model.input_shape[1:]) for model in models}
+        output_shapes = {tuple(model.output_shape[1:]) for model in models}
+        if len(input_shapes) > 1 or len(output_shapes) > 1:
+            raise ValueError(f"ensemble members disagree on input {input_shapes} or output {output_shapes} shapes")
+        self.models = list(models)
+        self.variants = list(variants)
+        self.crop_fraction = crop_fraction
+        self.boxes = tta_boxes(self.variants, crop_fraction)
+        self.reduction = reduction
+        self.preprocessing = preprocessing
+        self.input_shape = input_shapes.pop()
+        self.max_variants = self._budget(max_variants, len(self.variants), "max_variants")
+        self.max_members = self._budget(max_members, len(self.models), "max_members")
+        self.max_rows = max(int(max_rows), 1)
+        self.member_fingerprints = list(member_fingerprints)
+        self._lock = threading.Lock()
+        # (variants, members) -> traced forward pass
+        self._functions = {}
+
+    @classmethod
+    def from_config(cls, config) -> "InferenceEngine":
+        """
+        Load the members of a ServingConfig through the shared model registry.
+        The registry's own warm-up is skipped, `warm_up` traces the engine's
+        graph instead.
+        """
+        from src.CNNClassifier.serving.model_registry import registry
+
+        members = [registry.get(path, warmup_batch_sizes=()) for path in config.ensemble_members]
+        return cls(
+            [served.model for served in members],
+            variants=config.tta_variants,
+            crop_fraction=config.tta_crop_fraction,
+            reduction=config.ensemble_reduce,
+            preprocessing=config.params_preprocessing,
+            max_variants=config.tta_max_variants,
+            max_members=config.ensemble_max_members,
+            max_rows=config.ensemble_max_rows,
+            member_fingerprints=[served.fingerprint for served in members]
+        )
+
+    @staticmethod
+    def _budget(value: Optional[int], available: int, name: str) -> int:
+        if value is None or value == 0:
+            return available
+        if not 1 <= value <= available:
+            raise ValueError(f"{name} must be between 1 and {available}, got {value}")
+        return int(value)
+
+    @property
+    def is_plain(self) -> bool:
+        """One member on the unmodified image, nothing to expand or reduce."""
+        return self.max_members == 1 and self.variants[:self.max_variants] == ["identity"]
+
+    def signature(self) -> str:
+        """What the predictions depend on besides the images, e.g. for prediction cache keys."""
+        # the members as loaded, a file rewritten on disk since does not change what they predict
+        members = [fingerprint[:16] for fingerprint in self.member_fingerprints[:self.max_members]]
+        return (f"tta={','.join(self.variants[:self.max_variants])}@{self.crop_fraction}"
+                f";members={','.join(members) or self.max_members};reduce={self.reduction}")
+
+    def _forward(self, num_variants: int, num_members: int):
+        with self._lock:
+            function = self._functions.get((num_variants, num_members))
+            if function is not None:
+                return function
+
+            import tensorflow as tf
+
+            height, width, channels = self.input_shape
+            boxes = tf.constant(self.boxes[:num_variants])
+            models = self.models[:num_members]
+            plain_input = self.variants[:num_variants] == ["identity"]
+            geometric = self.reduction == "geometric_mean"
+
+            @tf.function(input_signature=[tf.TensorSpec((None, height, width, channels), tf.float32)])
+            def forward(images):
+                n = tf.shape(images)[0]
+                if plain_input:
+                    expanded = images
+                else:
+                    # variant-major rows: all n images of variant 0, then of variant 1, ...
+                    expanded = tf.image.crop_and_resize(
+                        images, tf.repeat(boxes, n, axis=0), tf.tile(tf.range(n), [num_variants]),
+                        crop_size=(height, width), method="bilinear"
+                    )
+                outputs = tf.stack([tf.cast(model(expanded, training=False), tf.float32) for model in models])
+                outputs = tf.reshape(outputs, (num_members, num_variants, n, -1))
+                if geometric:
+                    log_probabilities = tf.math.log(tf.maximum(outputs, 1e-7))
+                    return tf.nn.softmax(tf.reduce_mean(log_probabilities, axis=(0, 1)))
+                return tf.reduce_mean(outputs, axis=(0, 1))
+
+            self._functions[(num_variants, num_members)] = forward
+            return forward
+
+    def predict(self, batch: np.ndarray, max_variants: Optional[int] = None,
+                max_members: Optional[int] = None) -> np.ndarray:
+        """
+        Args:
+            batch (np.ndarray): (n, h, w, 3) raw pixels, or model inputs when no preprocessing is set
+            max_variants (int, optional): Variant budget of this call, the engine's default if None
+            max_members (int, optional): Member budget of this call, the engine's default if None
+
+        Returns:
+            np.ndarray: (n, classes) float32 probabilities averaged over variants and members
+        """
+        num_variants = self._budget(max_variants, len(self.variants), "max_variants") \
+            if max_variants is not None else self.max_variants
+        num_members = self._budget(max_members, len(self.models), "max_members") \
+            if max_members is not None else self.max_members
+        if self.preprocessing is not None:
+            batch = preprocess_batch(batch, self.input_shape[:2], self.preprocessing)
+        batch = np.asarray(batch, dtype=np.float32)
+        if num_members == 1 and self.variants[:num_variants] == ["identity"]:
+            # predict_on_batch skips the per-call data adapter setup that model.predict does
+            return np.asarray(self.models[0].predict_on_batch(batch), dtype=np.float32)
+
+        forward = self._forward(num_variants, num_members)
+        chunk = max(self.max_rows // num_variants, 1)
+        if len(batch) <= chunk:
+            return forward(batch).numpy()
+        return np.concatenate([forward(batch[start:start + chunk]).numpy() for start in range(0, len(batch), chunk)])
+
+    def warm_up(self, batch_sizes: Sequence[int] = (1,)):
+        """Trace the forward pass at the default budgets before the first request needs it."""
+        for batch_size in batch_sizes:
+            self.predict(np.zeros((batch_size,) + self.input_shape, dtype=np.uint8)
+                         if self.preprocessing is not None else np.zeros((batch_size,) + self.input_shape))
+        logger.info(f"inference engine: {self.max_members} member(s) x {self.max_variants} TTA variant(s) "
+                    f"({', '.join(self.variants[:self.max_variants])}), {self.reduction} reduction")
+        return self
+
+    def metrics(self) -> dict:
+        return {
+            "members": self.max_members,
+            "tta_variants": self.max_variants,
+            "rows_per_image": self.max_members * self.max_variants,
+            "max_rows": self.max_rows,
+        }
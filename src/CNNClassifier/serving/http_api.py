@@ -0,0 +1,301 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import asyncio
+import queue
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import numpy as np
+from aiohttp import web
+from src.CNNClassifier import logger
+from src.CNNClassifier.entity import ServingConfig
+from src.CNNClassifier.serving.batcher import BatchingPredictor
+from src.CNNClassifier.serving.ensemble import InferenceEngine
+from src.CNNClassifier.serving.model_registry import registry
+from src.CNNClassifier.serving.prediction_cache import PredictionCache
+from src.CNNClassifier.utils.preprocessing import load_image
+
+METRIC_PREFIX = "cnnclassifier"
+
+
+class HTTPStats:
+    def __init__(self, latency_window: int = 10000):
+        """
+        Request counters of the HTTP API: responses per route and status,
+        images predicted, requests shed by backpressure and the latency of
+        /predict requests, end to end inside the server.
+
+        Args:
+            latency_window (int): Number of most recent /predict latencies kept
+                for the percentile estimates
+        """
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._started_at = time.perf_counter()
+        self.responses = Counter()
+        self.images = 0
+        self.shed = 0
+
+    def record(self, route: str, status: int, latency_s: Optional[float] = None, images: int = 0):
+        with self._lock:
+            self.responses[(route, status)] += 1
+            self.images += images
+            if status == 503:
+                self.shed += 1
+            if latency_s is not None:
+                self._latencies.append(latency_s)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = np.asarray(self._latencies, dtype=np.float64)
+            elapsed = time.perf_counter() - self._started_at
+            snapshot = {
+                "requests": sum(self.responses.values()),
+                "images": self.images,
+                "shed": self.shed,
+                "uptime_s": elapsed,
+                "responses": {f"{route} {status}": count for (route, status), count in sorted(self.responses.items())},
+            }
+        if latencies.size:
+            p50, p95, p99 = (float(p) for p in np.percentile(latencies, [50, 95, 99]) * 1000.0)
+            snapshot.update(latency_p50_ms=p50, latency_p95_ms=p95, latency_p99_ms=p99)
+        else:
+            snapshot.update(latency_p50_ms=0.0, latency_p95_ms=0.0, latency_p99_ms=0.0)
+        return snapshot
+
+
+def prometheus_lines(prefix: str, snapshot: dict) -> list:
+    """The numeric entries of a stats snapshot as Prometheus gauges, nested dicts become labels."""
+    lines = []
+    for key, value in snapshot.items():
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}")
+        if isinstance(value, dict):
+            numeric = {label: v for label, v in value.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+            if numeric:
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f'{name}{{key="{label}"}} {float(v):g}' for label, v in numeric.items())
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {float(value):g}")
+    return lines
+
+
+class InferenceAPI:
+    def __init__(self, config: ServingConfig):
+        """
+        asyncio HTTP front end of the served model, for running several
+        replicas behind a load balancer:
+
+        - POST /predict: one image as the raw request body, or up to
+          `max_request_images` images as multipart/form-data. Uploads are
+          decoded in a thread pool, never on the event loop, and batched
+          with concurrent requests by the BatchingPredictor. Send
+          `Cache-Control: no-cache` to skip the prediction cache.
+        - GET /healthz: 200 once the model is loaded and the batcher runs, 503 otherwise
+        - GET /metrics: Prometheus text, or JSON with ?format=json
+
+        Images accepted but not answered yet are capped at `max_in_flight`;
+        a request that would exceed it is answered 503 with Retry-After
+        right away, so overload shows up at the load balancer instead of as
+        an ever longer queue.
+
+        Args:
+            config (ServingConfig): Model, batching, cache and HTTP settings
+        """
+        self.config = config
+        self.stats = HTTPStats()
+        self.served = None
+        self.engine = None
+        self.predictor = None
+        self.cache = None
+        self.in_flight = 0
+        self._decode_pool = None
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=int(self.config.max_request_mb * 2**20))
+        app.router.add_post("/predict", self.predict)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/metrics", self.metrics)
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.stop)
+        return app
+
+    async def start(self, app: web.Application = None):
+        config = self.config
+        self._decode_pool = ThreadPoolExecutor(max_workers=config.decode_workers, thread_name_prefix="decode")
+        loop = asyncio.get_running_loop()
+        # loading and warm-up block for seconds, keep them off the event loop
+        self.served = await loop.run_in_executor(None, lambda: registry.get(
+            config.model_path,
+            warmup_batch_sizes=config.warmup_batch_sizes,
+            warmup_runs=config.warmup_runs
+        ))
+        self.engine = await loop.run_in_executor(None, lambda: self._build_engine(config))
+        self.predictor = BatchingPredictor(
+            predict_fn=self.engine.predict,
+            max_batch_size=config.max_batch_size,
+            max_wait_ms=config.max_wait_ms,
+            max_queue_size=config.max_queue_size,
+            input_shape=self.served.input_shape
+        ).start()
+        self.cache = PredictionCache(
+            config.prediction_cache_path,
+            self.served.fingerprint,
+            max_memory_bytes=int(config.prediction_cache_memory_mb * 2**20),
+            max_disk_rows=config.prediction_cache_max_rows,
+            key_salt=f"{config.params_preprocessing}:{self.served.input_shape}:{self.engine.signature()}"
+        )
+        logger.info(f"HTTP API ready: {config.decode_workers} decode threads, "
+                    f"at most {config.max_in_flight} images in flight")
+
+    @staticmethod
+    def _build_engine(config: ServingConfig) -> InferenceEngine:
+        engine = InferenceEngine.from_config(config)
+        # the registry warmed the plain model up already, TTA and ensembles trace a graph of their own
+        return engine if engine.is_plain else engine.warm_up(config.warmup_batch_sizes)
+
+    async def stop(self, app: web.Application = None):
+        if self.predictor is not None:
+            self.predictor.stop(timeout=5)
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown(wait=True)
+        if self.cache is not None:
+            self.cache.close()
+
+    @property
+    def ready(self) -> bool:
+        return self.predictor is not None and self.predictor._worker is not None and self.predictor._worker.is_alive()
+
+    async def read_images(self, request: web.Request) -> list:
+        """
+        Returns:
+            list: (filename, bytes) of every uploaded image
+        """
+        if request.content_type.startswith("multipart/"):
+            images = []
+            reader = await request.multipart()
+            while True:
+                part = await reader.next()
+                if part is None:
+                    return images
+                if len(images) == self.config.max_request_images:
+                    raise web.HTTPRequestEntityTooLarge(
+                        max_size=self.config.max_request_images, actual_size=len(images) + 1,
+                        text=f"at most {self.config.max_request_images} images per request")
+                images.append((part.filename or part.name or f"image_{len(images)}", await part.read()))
+        body = await request.read()
+        return [(request.query.get("filename", "image"), body)] if body else []
+
+    def _lookup_or_decode(self, image_bytes: bytes, use_cache: bool):
+        # runs in the decode pool: hashing, the SQLite lookup and decoding all block
+        started = time.perf_counter()
+        key = PredictionCache.image_key(image_bytes)
+        if use_cache:
+            hit = self.cache.lookup(key)
+            if hit is not None:
+                value, compute_ms, tier = hit
+                self.cache.stats.record_hit(tier, compute_ms, (time.perf_counter() - started) * 1000.0)
+                return key, value, tier, 0.0
+        lookup_ms = (time.perf_counter() - started) * 1000.0
+        # RGB uint8 at the model input size, the batcher normalizes whole micro-batches
+        return key, load_image(image_bytes, self.served.input_shape), "miss" if use_cache else "bypass", lookup_ms
+
+    async def predict_one(self, image_bytes: bytes, use_cache: bool):
+        loop = asyncio.get_running_loop()
+        key, value, tier, lookup_ms = await loop.run_in_executor(
+            self._decode_pool, self._lookup_or_decode, image_bytes, use_cache)
+        if tier in ("miss", "bypass"):
+            started = time.perf_counter()
+            # a timeout cancels the batcher's future: still queued, the image is skipped; already batched, it finishes
+            value = await asyncio.wait_for(asyncio.wrap_future(self.predictor.submit(value)),
+                                           timeout=self.config.request_timeout_s)
+            compute_ms = (time.perf_counter() - started) * 1000.0
+            if tier == "miss":
+                self.cache.stats.record_miss(compute_ms, lookup_ms)
+                await loop.run_in_executor(self._decode_pool, self.cache.store, key, value, compute_ms)
+        return np.asarray(value, dtype=np.float32), tier
+
+    def _prediction(self, filename: str, probabilities: np.ndarray, tier: str) -> dict:
+        index = int(np.argmax(probabilities))
+        names = self.config.class_names
+        return {
+            "filename": filename,
+            "label": names[index] if index < len(names) else str(index),
+            "index": index,
+            "probabilities": {names[i] if i < len(names) else str(i): float(p) for i, p in enumerate(probabilities)},
+            "cache": tier,
+        }
+
+    async def predict(self, request: web.Request) -> web.Response:
+        started = time.perf_counter()
+        if not self.ready:
+            self.stats.record("/predict", 503)
+            return web.json_response({"error": "model is not loaded yet"}, status=503, headers={"Retry-After": "1"})
+        try:
+            images = await self.read_images(request)
+        except web.HTTPException as e:
+            self.stats.record("/predict", e.status)
+            raise
+        if not images:
+            self.stats.record("/predict", 400)
+            return web.json_response({"error": "no image in the request body"}, status=400)
+        if self.in_flight + len(images) > self.config.max_in_flight:
+            self.stats.record("/predict", 503)
+            return web.json_response({"error": "server is at capacity, retry later"}, status=503,
+                                     headers={"Retry-After": "1"})
+
+        use_cache = "no-cache" not in request.headers.get("Cache-Control", "")
+        self.in_flight += len(images)
+        try:
+            results = await asyncio.gather(*(self.predict_one(data, use_cache) for _, data in images),
+                                           return_exceptions=True)
+        finally:
+            self.in_flight -= len(images)
+
+        predictions, status = [], 200
+        for (filename, _), result in zip(images, results):
+            if not isinstance(result, Exception):
+                predictions.append(self._prediction(filename, *result))
+                continue
+            # a full batcher queue is overload like max_in_flight, a timeout is not
+            if isinstance(result, queue.Full):
+                status = 503
+            elif isinstance(result, asyncio.TimeoutError) and status == 200:
+                status = 504
+            predictions.append({"filename": filename, "error": f"{type(result).__name__}: {result}"})
+        if status == 200 and all("error" in prediction for prediction in predictions):
+            # nothing could be decoded
+            status = 400
+        self.stats.record("/predict", status, time.perf_counter() - started,
+                          images=sum("error" not in prediction for prediction in predictions))
+        headers = {"Retry-After": "1"} if status == 503 else None
+        return web.json_response({"predictions": predictions, "model": str(self.config.model_path)},
+                                 status=status, headers=headers)
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        status = 200 if self.ready else 503
+        self.stats.record("/healthz", status)
+        body = {"status": "ok" if status == 200 else "unavailable", "in_flight": self.in_flight}
+        if self.served is not None:
+            body["model"] = self.served.metrics()
+        return web.json_response(body, status=status)
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        self.stats.record("/metrics", 200)
+        snapshots = {
+            "http": {**self.stats.snapshot(), "in_flight": self.in_flight},
+            "batcher": self.predictor.stats.snapshot() if self.predictor is not None else {},
+            "cache": self.cache.stats.snapshot() if self.cache is not None else {},
+            "model": self.served.metrics() if self.served is not None else {},
+            "engine": self.engine.metrics() if self.engine is not None else {},
+        }
+        if request.query.get("format") == "json":
+            return web.json_response(snapshots)
+        lines = []
+        for section, snapshot in snapshots.items():
+            lines.extend(prometheus_lines(f"{METRIC_PREFIX}_{section}", snapshot))
+        return web.Response(text="\n".join(lines) + "\n", content_type="text/plain")
@@ -0,0 +1,131 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import threading
+import time
+from pathlib import Path
+from typing import Sequence
+import numpy as np
+from src.CNNClassifier import logger
+from src.CNNClassifier.utils.hashing import sha256_file
+
+
+class ServedModel:
+    def __init__(self, path: Path, model, load_s: float, fingerprint: str):
+        """
+        A loaded model plus the timings of getting it ready to serve.
+
+        Args:
+            path (Path): File the model was loaded from
+            model (tf.keras.Model): The loaded model
+            load_s (float): Seconds spent in `load_model`
+            fingerprint (str): sha256 of the file content that was loaded; the
+                file may change on disk later, this still names what is served
+        """
+        self.path = Path(path)
+        self.model = model
+        self.load_s = load_s
+        self.fingerprint = fingerprint
+        self.warmup_s = 0.0
+        # batch size -> ms of each warm-up pass, the first includes tracing
+        self.warmup_passes_ms = {}
+        self.loaded_at = time.time()
+
+    @property
+    def input_shape(self):
+        return tuple(self.model.input_shape[1:])
+
+    def warm_up(self, batch_sizes: Sequence[int] = (1,), runs: int = 2):
+        """
+        Run forward passes on zero batches so graph tracing and kernel
+        selection happen at startup instead of on the first real request.
+        The batching predictor sends batches of any size up to its maximum,
+        so warming the smallest and largest size covers the shapes it sees.
+        """
+        started = time.perf_counter()
+        for batch_size in batch_sizes:
+            batch = np.zeros((batch_size,) + self.input_shape, dtype=np.float32)
+            passes = self.warmup_passes_ms.setdefault(int(batch_size), [])
+            for _ in range(max(runs, 1)):
+                run_started = time.perf_counter()
+                self.model.predict_on_batch(batch)
+                passes.append((time.perf_counter() - run_started) * 1000.0)
+        self.warmup_s += time.perf_counter() - started
+        logger.info(f"warmed up {self.path} in {self.warmup_s:.2f}s, pass ms per batch size: " + ", ".join(
+            f"{size}: {' -> '.join(f'{ms:.0f}' for ms in passes)}" for size, passes in self.warmup_passes_ms.items()
+        ))
+        return self
+
+    def metrics(self) -> dict:
+        return {
+            "model_path": str(self.path),
+            "fingerprint": self.fingerprint,
+            "load_s": self.load_s,
+            "warmup_s": self.warmup_s,
+            "warmup_passes_ms": {str(size): passes for size, passes in self.warmup_passes_ms.items()},
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    def __init__(self):
+        """
+        Process-wide cache of loaded models keyed by resolved path. Concurrent
+        sessions asking for the same model wait for one load and share it.
+        """
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        self._models = {}
+
+    def get(self, model_path: Path, warmup_batch_sizes: Sequence[int] = (1,), warmup_runs: int = 2) -> ServedModel:
+        """
+        Args:
+            model_path (Path): Keras model file, e.g. training.trained_model_path
+            warmup_batch_sizes (Sequence[int]): Batch sizes run once the model is loaded
+            warmup_runs (int): Forward passes per warm-up batch size
+
+        Returns:
+            ServedModel: The shared, warmed-up model
+        """
+        key = str(Path(model_path).resolve())
+        with self._lock:
+            served = self._models.get(key)
+            if served is not None:
+                return served
+            path_lock = self._path_locks.setdefault(key, threading.Lock())
+
+        with path_lock:
+            served = self._models.get(key)
+            if served is not None:
+                return served
+            if not Path(model_path).exists():
+                raise FileNotFoundError(f"no trained model at {model_path}, run the training stage first")
+
+            import tensorflow as tf
+
+            while True:
+                before = os.stat(model_path)
+                fingerprint = sha256_file(model_path)
+                started = time.perf_counter()
+                model = tf.keras.models.load_model(model_path, compile=False)
+                load_s = time.perf_counter() - started
+                after = os.stat(model_path)
+                # the fingerprint has to name the bytes that were loaded, not a file replaced in between
+                if (before.st_ino, before.st_size, before.st_mtime_ns) == (after.st_ino, after.st_size,
+                                                                         after.st_mtime_ns):
+                    break
+                logger.warning(f"{model_path} changed while it was loaded, loading it again")
+            served = ServedModel(model_path, model, load_s, fingerprint)
+            logger.info(f"loaded {model_path} in {served.load_s:.2f}s")
+            served.warm_up(warmup_batch_sizes, warmup_runs)
+            with self._lock:
+                self._models[key] = served
+            return served
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {path: served.metrics() for path, served in self._models.items()}
+
+
+# shared by every caller in the process
+registry = ModelRegistry()
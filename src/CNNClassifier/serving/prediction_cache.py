@@ -0,0 +1,228 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Tuple
+import numpy as np
+from src.CNNClassifier import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    model TEXT NOT NULL,
+    image TEXT NOT NULL,
+    value BLOB NOT NULL,
+    compute_ms REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (model, image)
+)
+"""
+PRUNE_EVERY = 256
+
+
+class PredictionCacheStats:
+    def __init__(self):
+        """
+        Thread-safe hit/miss counters and the latency the cache saved.
+        """
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.memory_hits = self.disk_hits = self.misses = 0
+            self.evictions = self.invalidations = 0
+            self.saved_ms = 0.0
+            self.lookup_ms = 0.0
+            self.compute_ms = 0.0
+
+    def record_hit(self, tier: str, compute_ms: float, lookup_ms: float):
+        with self._lock:
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            # what the miss path took when the entry was stored, minus what the hit cost
+            self.saved_ms += max(compute_ms - lookup_ms, 0.0)
+            self.lookup_ms += lookup_ms
+
+    def record_miss(self, compute_ms: float, lookup_ms: float):
+        with self._lock:
+            self.misses += 1
+            self.compute_ms += compute_ms
+            self.lookup_ms += lookup_ms
+
+    def record_eviction(self):
+        with self._lock:
+            self.evictions += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: Hit rates per tier, misses, and total / per-hit latency saved in ms
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "lookups": lookups,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "latency_saved_ms": self.saved_ms,
+                "mean_saved_ms_per_hit": self.saved_ms / hits if hits else 0.0,
+                "mean_miss_ms": self.compute_ms / self.misses if self.misses else 0.0,
+                "mean_lookup_ms": self.lookup_ms / lookups if lookups else 0.0,
+            }
+
+
+class PredictionCache:
+    def __init__(self, db_path: Path, model_fingerprint: str, max_memory_bytes: int = 64 << 20,
+                 max_disk_rows: int = 100_000, key_salt: str = ""):
+        """
+        Two-tier cache of model outputs keyed by the sha256 of the uploaded
+        bytes and the fingerprint of the served model: a byte-bounded
+        in-memory LRU in front of a SQLite table that survives restarts.
+        Rows of any other model are dropped when the cache is opened.
+
+        The fingerprint is the one the model registry took of the file it
+        loaded, not of whatever is on disk now: a model.h5 rewritten by a
+        training run while the server holds the old model in memory must
+        not get the old model's predictions filed under its name.
+
+        Args:
+            db_path (Path): SQLite file of the on-disk tier
+            model_fingerprint (str): `ServedModel.fingerprint` of the model the predictions come from
+            max_memory_bytes (int): Budget of the in-memory tier, least recently used entries go first
+            max_disk_rows (int): Rows kept on disk, least recently accessed rows are pruned
+            key_salt (str): Folded into the model fingerprint, e.g. the preprocessing
+                settings, so changing them also invalidates the cache
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_rows = max_disk_rows
+        self.key_salt = key_salt
+        self.stats = PredictionCacheStats()
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._inserts = 0
+        self.model_fingerprint = model_fingerprint
+        if key_salt:
+            self.model_fingerprint = hashlib.sha256(f"{model_fingerprint}:{key_salt}".encode()).hexdigest()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # one connection shared by the server threads, serialised by self._lock
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        dropped = self._db.execute("DELETE FROM predictions WHERE model != ?", (self.model_fingerprint,)).rowcount
+        if dropped > 0:
+            self.stats.record_invalidation()
+            logger.info(f"dropped {dropped} cached predictions of another model or preprocessing")
+
+    @staticmethod
+    def image_key(image_bytes: bytes) -> str:
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def _remember(self, key: str, value: np.ndarray, compute_ms: float):
+        size = value.nbytes + len(key) + 64
+        if size > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[2]
+        self._memory[key] = (value, compute_ms, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.stats.record_eviction()
+
+    def _prune_disk(self):
+        (rows,) = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        if rows > self.max_disk_rows:
+            self._db.execute(
+                "DELETE FROM predictions WHERE rowid IN "
+                "(SELECT rowid FROM predictions ORDER BY accessed_at LIMIT ?)", (rows - self.max_disk_rows,)
+            )
+
+    def lookup(self, key: str):
+        """
+        Returns:
+            tuple: (prediction, stored compute ms, tier) or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry[0], entry[1], "memory"
+            row = self._db.execute(
+                "SELECT value, compute_ms FROM predictions WHERE model = ? AND image = ?",
+                (self.model_fingerprint, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE predictions SET accessed_at = ? WHERE model = ? AND image = ?",
+                             (time.time(), self.model_fingerprint, key))
+            value = np.frombuffer(row[0], dtype=np.float32)
+            self._remember(key, value, row[1])
+            return value, row[1], "disk"
+
+    def store(self, key: str, value: np.ndarray, compute_ms: float):
+        value = np.ascontiguousarray(value, dtype=np.float32).ravel()
+        with self._lock:
+            self._remember(key, value, compute_ms)
+            self._db.execute(
+                "INSERT OR REPLACE INTO predictions (model, image, value, compute_ms, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.model_fingerprint, key, value.tobytes(), compute_ms, time.time())
+            )
+            self._inserts += 1
+            if self._inserts % PRUNE_EVERY == 0:
+                self._prune_disk()
+
+    def get_or_compute(self, image_bytes: bytes, compute: Callable[[], np.ndarray]) -> Tuple[np.ndarray, str]:
+        """
+        Args:
+            image_bytes (bytes): The uploaded file, exactly as received
+            compute (callable): Decodes the upload and runs the model, called on a miss
+
+        Returns:
+            tuple: (prediction, "memory" | "disk" | "miss")
+        """
+        started = time.perf_counter()
+        key = self.image_key(image_bytes)
+        hit = self.lookup(key)
+        lookup_ms = (time.perf_counter() - started) * 1000.0
+        if hit is not None:
+            value, compute_ms, tier = hit
+            self.stats.record_hit(tier, compute_ms, lookup_ms)
+            return value, tier
+
+        compute_started = time.perf_counter()
+        value = np.asarray(compute())
+        compute_ms = (time.perf_counter() - compute_started) * 1000.0
+        self.store(key, value, compute_ms)
+        self.stats.record_miss(compute_ms, lookup_ms)
+        return value, "miss"
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._db.execute("DELETE FROM predictions")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
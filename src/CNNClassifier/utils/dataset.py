@@ -0,0 +1,175 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from src.CNNClassifier import logger
+
+# same extensions flow_from_directory accepts
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "bmp", "ppm", "tif", "tiff")
+SPLITS = ("train", "val", "test")
+
+
+def load_validated_files(index_path: Path) -> Optional[Set[str]]:
+    """
+    Read the file list that passed stage_06_validate_images.
+
+    Args:
+        index_path (Path): Quarantine index written by the validation stage
+
+    Returns:
+        set or None: Valid paths relative to the dataset root, None if the
+        stage has not run
+    """
+    if index_path is None or not Path(index_path).exists():
+        logger.warning(f"no image validation index at {index_path}, using every image file")
+        return None
+    with open(index_path) as f:
+        index = json.load(f)
+    return {relpath for relpath, entry in index["files"].items() if entry["valid"]}
+
+
+def list_image_files(directory: Path, allowed: Optional[Set[str]] = None) -> Tuple[List[str], np.ndarray, List[str]]:
+    """
+    List images the way `flow_from_directory` does: one class per sorted
+    sub-directory, files walked recursively and sorted within each class.
+
+    Args:
+        directory (Path): Dataset root containing one folder per class
+        allowed (set, optional): Relative paths to keep, e.g. from `load_validated_files`
+
+    Returns:
+        tuple: (paths relative to `directory`, int32 labels, class names)
+    """
+    directory = Path(directory)
+    class_names = sorted(entry.name for entry in os.scandir(directory) if entry.is_dir())
+    files, labels = [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = directory / class_name
+        for root, _, filenames in sorted(os.walk(class_dir), key=lambda walk: walk[0]):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    relpath = os.path.relpath(os.path.join(root, filename), directory)
+                    if allowed is None or relpath in allowed:
+                        files.append(relpath)
+                        labels.append(label)
+    return files, np.asarray(labels, dtype=np.int32), class_names
+
+
+def stratified_split(files: List[str], labels: np.ndarray, validation_split: float, test_split: float,
+                     seed: int) -> Dict[str, np.ndarray]:
+    """
+    Split every class into test, validation and train by a seeded hash of
+    each file's path: the files of a class are ordered by hash, the first
+    `test_split` share is test, the next `validation_split` share
+    validation, the rest train. The proportions hold per class, the same
+    seed gives the same split, and adding or quarantining a few files
+    moves few others between subsets.
+
+    Args:
+        files (list): Relative paths in listing order
+        labels (np.ndarray): Per-file labels
+        validation_split (float): Share of every class for validation
+        test_split (float): Share of every class held out for evaluation
+        seed (int): Selects the split
+
+    Returns:
+        dict: "train", "val" and "test" -> sorted int64 indices into `files`
+    """
+    if validation_split < 0 or test_split < 0 or validation_split + test_split >= 1:
+        raise ValueError(f"validation_split {validation_split} and test_split {test_split} have to be >= 0 "
+                         "and leave something to train on")
+    keys = np.fromiter((int.from_bytes(hashlib.blake2b(f"{seed}:{relpath}".encode(), digest_size=8).digest(), "little")
+                        for relpath in files), dtype=np.uint64, count=len(files))
+    parts = {name: [] for name in SPLITS}
+    for label in np.unique(labels):
+        class_indices = np.flatnonzero(labels == label)
+        ordered = class_indices[np.argsort(keys[class_indices], kind="stable")]
+        test_end = int(round(test_split * len(ordered)))
+        val_end = test_end + int(round(validation_split * len(ordered)))
+        parts["test"].append(ordered[:test_end])
+        parts["val"].append(ordered[test_end:val_end])
+        parts["train"].append(ordered[val_end:])
+    return {name: np.sort(np.concatenate(chunks)).astype(np.int64) if chunks else np.empty(0, dtype=np.int64)
+            for name, chunks in parts.items()}
+
+
+def write_split_index(path: Path, files: List[str], labels: np.ndarray, class_names: List[str],
+                      subsets: Dict[str, np.ndarray], meta: dict):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # written to a temporary file and renamed, readers never see half an index
+    tmp_path = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp_path, files=np.asarray(files, dtype=str), labels=np.asarray(labels, dtype=np.int32),
+             class_names=np.asarray(class_names, dtype=str), meta=np.asarray(json.dumps(meta)),
+             **{name: subsets[name] for name in SPLITS})
+    os.replace(tmp_path, path)
+
+
+class SplitIndex:
+    def __init__(self, path: Path):
+        """
+        The train/val/test split written by stage_09_split_dataset: relative
+        path, label and class of every usable image and one index array per
+        subset. Every stage reads its images from here instead of walking
+        the dataset directory.
+
+        Args:
+            path (Path): The `.npz` index
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"no split index at {path}, run stage_09_split_dataset first")
+        with np.load(path, allow_pickle=False) as data:
+            self.files: List[str] = data["files"].tolist()
+            self.labels = data["labels"]
+            self.class_names: List[str] = data["class_names"].tolist()
+            self.meta = json.loads(str(data["meta"]))
+            self.subsets = {name: data[name] for name in SPLITS}
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def indices(self, subset: str) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Sorted indices into `files` of "train", "val" or "test"
+        """
+        if subset not in self.subsets:
+            raise ValueError(f"subset must be one of {SPLITS}, got {subset!r}")
+        return self.subsets[subset]
+
+    def rows_in(self, subset: str, files: List[str]) -> np.ndarray:
+        """
+        Positions of the images of `subset` in another listing of the same
+        images, e.g. the image cache; images missing from it are left out.
+
+        Returns:
+            np.ndarray: Sorted int64 positions in `files`
+        """
+        position = {relpath: row for row, relpath in enumerate(files)}
+        rows = (position.get(self.files[i]) for i in self.indices(subset))
+        return np.asarray(sorted(row for row in rows if row is not None), dtype=np.int64)
+
+
+def fingerprint_files(directory: Path, files: List[str], extra: dict = None) -> str:
+    """
+    Cheap content fingerprint of a file listing from path, size and mtime.
+
+    Args:
+        directory (Path): Root the relative `files` are under
+        files (list): Relative file paths
+        extra (dict, optional): Additional settings folded into the fingerprint
+
+    Returns:
+        str: Hex sha256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(extra or {}, sort_keys=True).encode())
+    for relpath in files:
+        stat = os.stat(os.path.join(directory, relpath))
+        digest.update(f"{relpath}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CHUNK_SIZE = 1 << 20
+
+
+def sha256_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentHasher:
+    """
+    Content hashes of files and directory trees. File digests are memoised by
+    (size, mtime_ns), so a file is only read again after it changed on disk.
+
+    Args:
+        memo (dict, optional): Previously persisted memo, see `memo`
+    """
+    def __init__(self, memo: Optional[Dict[str, List]] = None):
+        self.memo = dict(memo or {})
+
+    def hash_file(self, path: Path) -> str:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.memo.get(key)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = sha256_file(path)
+        self.memo[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def hash_path(self, path: Path) -> Optional[str]:
+        """
+        Returns:
+            str or None: Hex digest of a file, or of every file under a
+            directory together with its relative path; None if missing
+        """
+        path = Path(path)
+        if path.is_file():
+            return self.hash_file(path)
+        if not path.is_dir():
+            return None
+        digest = hashlib.sha256()
+        for root, dirs, filenames in os.walk(path):
+            dirs.sort()
+            for filename in sorted(filenames):
+                file_path = os.path.join(root, filename)
+                digest.update(f"{os.path.relpath(file_path, path)}\0{self.hash_file(file_path)}\n".encode())
+        return digest.hexdigest()
+
+    def prune(self):
+        # drop memo entries of files that no longer exist so the memo does not grow forever
+        self.memo = {key: entry for key, entry in self.memo.items() if os.path.exists(key)}
\ No newline at end of file
@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+CACHE_FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+LABELS_FILE = "labels.npy"
+SHARD_TEMPLATE = "shard_{:05d}.npy"
+
+
+def read_index(cache_dir: Path) -> Optional[dict]:
+    index_path = Path(cache_dir) / INDEX_FILE
+    if not index_path.exists():
+        return None
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def write_index(cache_dir: Path, index: dict):
+    # the index is written last and atomically, so a half-built cache never looks valid
+    index_path = Path(cache_dir) / INDEX_FILE
+    tmp_path = index_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def is_up_to_date(cache_dir: Path, fingerprint: str) -> bool:
+    index = read_index(cache_dir)
+    if index is None or index.get("version") != CACHE_FORMAT_VERSION or index.get("fingerprint") != fingerprint:
+        return False
+    return all((Path(cache_dir) / shard["file"]).exists() for shard in index["shards"])
+
+
+class ImageCacheReader:
+    def __init__(self, cache_dir: Path):
+        """
+        Memory-mapped view over a cache written by the image cache stage.
+
+        Every shard is an uint8 (count, height, width, 3) `.npy` file opened
+        with `mmap_mode="r"`, so pages are only read when a batch touches them
+        and are shared between processes through the OS page cache.
+
+        Args:
+            cache_dir (Path): Directory holding `index.json`, `labels.npy` and the shards
+        """
+        self.cache_dir = Path(cache_dir)
+        self.index = read_index(self.cache_dir)
+        if self.index is None:
+            raise FileNotFoundError(f"no image cache at {self.cache_dir}, run stage_05_image_cache first")
+        self.class_names: List[str] = self.index["class_names"]
+        self.files: List[str] = self.index["files"]
+        self.image_size = tuple(self.index["image_size"])
+        self.labels = np.load(self.cache_dir / LABELS_FILE, mmap_mode="r")
+        self.shards = [np.load(self.cache_dir / shard["file"], mmap_mode="r") for shard in self.index["shards"]]
+        self.shard_size = self.index["shard_size"]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def num_classes(self) -> int:
+        return len(self.class_names)
+
+    def read(self, indices: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Fetch images by global index.
+
+        A run of consecutive indices inside one shard comes back as a view of
+        the memory map without copying. Anything else is gathered shard by
+        shard into `out` (allocated when not given).
+
+        Args:
+            indices (np.ndarray): Global image indices
+            out (np.ndarray, optional): uint8 buffer of shape (len(indices), H, W, 3)
+
+        Returns:
+            np.ndarray: uint8 images in the order of `indices`
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if indices.size == 0:
+            return np.empty((0,) + self.image_size, dtype=np.uint8)
+        shard_ids = indices // self.shard_size
+        offsets = indices % self.shard_size
+        first = int(indices[0])
+        if (out is None and shard_ids[0] == shard_ids[-1]
+                and np.array_equal(indices, np.arange(first, first + indices.size))):
+            return self.shards[shard_ids[0]][offsets[0]:offsets[0] + indices.size]
+
+        if out is None:
+            out = np.empty((indices.size,) + self.image_size, dtype=np.uint8)
+        for shard_id in np.unique(shard_ids):
+            positions = np.flatnonzero(shard_ids == shard_id)
+            out[positions] = self.shards[shard_id][offsets[positions]]
+        return out
@@ -0,0 +1,193 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import csv
+import json
+import resource
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+from src.CNNClassifier import logger
+
+STEP_COLUMNS = ["epoch", "step", "images", "data_wait_ms", "compute_ms", "images_per_sec"]
+# a run spending more than this share of its step time waiting for input is reported as input-bound
+INPUT_BOUND_FRACTION = 0.2
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # VmHWM starts over at exec and at reset_peak_rss, ru_maxrss keeps the parent's peak across a spawn's fork + exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except (OSError, ValueError):
+        pass
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def reset_peak_rss() -> bool:
+    """
+    Restart `peak_rss_mb` from the current RSS, so a peak read afterwards
+    belongs to what ran since. Linux only.
+
+    Returns:
+        bool: False when the peak could not be reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class RunRecorder:
+    def __init__(self, run_log_dir: Path, label: str, metadata: Optional[dict] = None):
+        """
+        Structured log of one training or evaluation run: a row per step in
+        steps.csv, a row per epoch in epochs.csv and a summary.json, written
+        under `run_log_dir/<label>-<timestamp>`. Framework independent, the
+        Keras callback and the evaluation loop both feed it.
+
+        Args:
+            run_log_dir (Path): Parent directory of the run logs
+            label (str): Run kind, e.g. "training" or "evaluation"
+            metadata (dict, optional): Settings stored in the summary, e.g. the input pipeline
+        """
+        self.label = label
+        self.metadata = metadata or {}
+        self.run_dir = Path(run_log_dir) / f"{label}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.epochs = []
+        self.global_step = 0
+        self._ready = deque()
+        self._ready_lock = threading.Lock()
+        self._steps_file = None
+        self._steps_writer = None
+        self._started = None
+
+    def mark_ready(self, images=0):
+        """
+        Called by the input pipeline when the consumer receives a batch, see
+        `instrument_input`. Returns the timestamp so it can run as a graph op.
+        """
+        now = time.perf_counter()
+        with self._ready_lock:
+            self._ready.append((now, int(images)))
+        return now
+
+    def pop_ready(self) -> Optional[tuple]:
+        """(timestamp, images) of the oldest batch handed out and not yet recorded, or None."""
+        with self._ready_lock:
+            return self._ready.popleft() if self._ready else None
+
+    def start(self):
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._steps_file = open(self.run_dir / "steps.csv", "w", newline="")
+        self._steps_writer = csv.writer(self._steps_file)
+        self._steps_writer.writerow(STEP_COLUMNS)
+        self._started = time.perf_counter()
+        self._started_cpu = cpu_seconds()
+        logger.info(f"[{self.label}] run log at {self.run_dir}")
+
+    def begin_epoch(self, epoch: int):
+        self._epoch = {"epoch": epoch, "started": time.perf_counter(), "cpu_started": cpu_seconds(),
+                       "steps": 0, "images": 0, "data_wait_s": 0.0, "compute_s": 0.0}
+
+    def record_step(self, images: int, data_wait_s: float, compute_s: float):
+        epoch = self._epoch
+        epoch["steps"] += 1
+        epoch["images"] += images
+        epoch["data_wait_s"] += data_wait_s
+        epoch["compute_s"] += compute_s
+        step_s = data_wait_s + compute_s
+        self._steps_writer.writerow([
+            epoch["epoch"], self.global_step, images, round(data_wait_s * 1000.0, 3), round(compute_s * 1000.0, 3),
+            round(images / step_s, 2) if step_s > 0 else 0.0
+        ])
+        self.global_step += 1
+
+    def end_epoch(self, logs: Optional[dict] = None) -> dict:
+        epoch = self._epoch
+        wall_s = time.perf_counter() - epoch["started"]
+        cpu_s = cpu_seconds() - epoch["cpu_started"]
+        step_s = epoch["data_wait_s"] + epoch["compute_s"]
+        row = {
+            "epoch": epoch["epoch"],
+            "steps": epoch["steps"],
+            "images": epoch["images"],
+            "wall_s": wall_s,
+            "step_s": step_s,
+            "images_per_sec": epoch["images"] / step_s if step_s > 0 else 0.0,
+            "data_wait_s": epoch["data_wait_s"],
+            "compute_s": epoch["compute_s"],
+            "data_wait_fraction": epoch["data_wait_s"] / step_s if step_s > 0 else 0.0,
+            "rss_mb": current_rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+            # cores kept busy by this process, and the same as a share of the machine
+            "cpu_cores_busy": cpu_s / wall_s if wall_s > 0 else 0.0,
+            "cpu_utilization": cpu_s / wall_s / (os.cpu_count() or 1) if wall_s > 0 else 0.0,
+        }
+        row.update({key: float(value) for key, value in (logs or {}).items() if isinstance(value, (int, float))})
+        self.epochs.append(row)
+        self._steps_file.flush()
+        logger.info(f"[{self.label}] epoch {row['epoch'] + 1}: {row['images']} images in {wall_s:.1f}s, "
+                    f"{row['images_per_sec']:.1f} images/sec, data wait {row['data_wait_fraction']:.0%} of step time, "
+                    f"RSS {row['rss_mb']:.0f} MB (peak {row['peak_rss_mb']:.0f} MB), "
+                    f"{row['cpu_cores_busy']:.1f} cores busy")
+        return row
+
+    def summary(self) -> dict:
+        data_wait_s = sum(epoch["data_wait_s"] for epoch in self.epochs)
+        step_s = sum(epoch["step_s"] for epoch in self.epochs)
+        images = sum(epoch["images"] for epoch in self.epochs)
+        wait_fraction = data_wait_s / step_s if step_s > 0 else 0.0
+        return {
+            "label": self.label,
+            "metadata": self.metadata,
+            "epochs": len(self.epochs),
+            "steps": self.global_step,
+            "images": images,
+            "wall_s": time.perf_counter() - self._started if self._started is not None else 0.0,
+            "images_per_sec": images / step_s if step_s > 0 else 0.0,
+            "data_wait_fraction": wait_fraction,
+            "bound": "input" if wait_fraction > INPUT_BOUND_FRACTION else "compute",
+            "peak_rss_mb": peak_rss_mb(),
+            "mean_cpu_utilization": (sum(epoch["cpu_utilization"] for epoch in self.epochs) / len(self.epochs)
+                                     if self.epochs else 0.0),
+        }
+
+    def close(self) -> dict:
+        if self._steps_file is None:
+            return {}
+        self._steps_file.close()
+        self._steps_file = None
+        if self.epochs:
+            columns = list(dict.fromkeys(key for epoch in self.epochs for key in epoch))
+            with open(self.run_dir / "epochs.csv", "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(self.epochs)
+        summary = self.summary()
+        with open(self.run_dir / "summary.json", "w") as f:
+            json.dump({**summary, "per_epoch": self.epochs}, f, indent=4)
+        logger.info(f"[{self.label}] {summary['images_per_sec']:.1f} images/sec, "
+                    f"{summary['bound']}-bound (data wait {summary['data_wait_fraction']:.0%}), "
+                    f"run log written to {self.run_dir}")
+        return summary
@@ -0,0 +1,172 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+from typing import List, Optional
+import numpy as np
+
+EPSILON = 1e-7
+
+
+class StreamingClassificationMetrics:
+    """
+    Classification metrics accumulated batch by batch in fixed-size arrays, so
+    memory does not grow with the dataset: a confusion matrix, per-class score
+    histograms for one-vs-rest ROC-AUC and top-label confidence bins for
+    calibration.
+
+    Args:
+        num_classes (int): Number of classes
+        class_names (list, optional): Names used in the report
+        roc_bins (int): Score histogram resolution, AUC is exact up to ties within a bin
+        calibration_bins (int): Equal-width confidence bins for reliability / ECE
+    """
+    def __init__(self, num_classes: int, class_names: Optional[List[str]] = None,
+                 roc_bins: int = 4096, calibration_bins: int = 15):
+        self.num_classes = num_classes
+        self.class_names = list(class_names) if class_names is not None else [str(i) for i in range(num_classes)]
+        self.roc_bins = roc_bins
+        self.calibration_bins = calibration_bins
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        # [class, is_positive, bin]
+        self.score_histogram = np.zeros((num_classes, 2, roc_bins), dtype=np.int64)
+        self.calibration_count = np.zeros(calibration_bins, dtype=np.int64)
+        self.calibration_confidence = np.zeros(calibration_bins, dtype=np.float64)
+        self.calibration_correct = np.zeros(calibration_bins, dtype=np.int64)
+        self.loss_sum = 0.0
+        self.samples = 0
+
+    def update(self, labels: np.ndarray, probabilities: np.ndarray):
+        """
+        Args:
+            labels (np.ndarray): Integer labels, shape (n,), or one-hot, shape (n, num_classes)
+            probabilities (np.ndarray): Predicted class probabilities, shape (n, num_classes)
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        labels = np.asarray(labels)
+        if labels.ndim == 2:
+            labels = labels.argmax(axis=1)
+        labels = labels.astype(np.int64)
+        n, c = probabilities.shape
+        predictions = probabilities.argmax(axis=1)
+
+        self.confusion += np.bincount(labels * c + predictions, minlength=c * c).reshape(c, c)
+
+        bins = np.minimum((probabilities * self.roc_bins).astype(np.int64), self.roc_bins - 1)
+        is_positive = (labels[:, None] == np.arange(c)[None, :]).astype(np.int64)
+        flat = (np.arange(c)[None, :] * 2 + is_positive) * self.roc_bins + bins
+        self.score_histogram += np.bincount(flat.ravel(), minlength=c * 2 * self.roc_bins).reshape(c, 2, -1)
+
+        confidence = probabilities[np.arange(n), predictions]
+        calibration_bin = np.minimum((confidence * self.calibration_bins).astype(np.int64), self.calibration_bins - 1)
+        self.calibration_count += np.bincount(calibration_bin, minlength=self.calibration_bins)
+        self.calibration_confidence += np.bincount(calibration_bin, weights=confidence,
+                                                   minlength=self.calibration_bins)
+        self.calibration_correct += np.bincount(calibration_bin, weights=predictions == labels,
+                                                minlength=self.calibration_bins).astype(np.int64)
+
+        self.loss_sum += float(-np.log(np.clip(probabilities[np.arange(n), labels], EPSILON, 1.0)).sum())
+        self.samples += n
+
+    def roc_auc(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: One-vs-rest ROC-AUC per class, NaN when a class has no positives or no negatives
+        """
+        # sweep the threshold from the highest bin down; trapezoids treat ties within a bin as half right
+        negatives = self.score_histogram[:, 0, ::-1].cumsum(axis=1)
+        positives = self.score_histogram[:, 1, ::-1].cumsum(axis=1)
+        total_negatives = negatives[:, -1:].astype(np.float64)
+        total_positives = positives[:, -1:].astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fpr = np.concatenate([np.zeros((self.num_classes, 1)), negatives / total_negatives], axis=1)
+            tpr = np.concatenate([np.zeros((self.num_classes, 1)), positives / total_positives], axis=1)
+        return np.sum(np.diff(fpr, axis=1) * (tpr[:, 1:] + tpr[:, :-1]) / 2, axis=1)
+
+    def result(self) -> dict:
+        true_positives = np.diag(self.confusion).astype(np.float64)
+        predicted = self.confusion.sum(axis=0)
+        actual = self.confusion.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+            recall = np.where(actual > 0, true_positives / actual, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        auc = self.roc_auc()
+
+        occupied = self.calibration_count > 0
+        mean_confidence = np.where(occupied, self.calibration_confidence / np.maximum(self.calibration_count, 1), 0.0)
+        bin_accuracy = np.where(occupied, self.calibration_correct / np.maximum(self.calibration_count, 1), 0.0)
+        ece = float(np.sum(self.calibration_count * np.abs(bin_accuracy - mean_confidence)) / max(self.samples, 1))
+
+        def nan_to_none(value):
+            return None if np.isnan(value) else float(value)
+
+        return {
+            "samples": int(self.samples),
+            "loss": self.loss_sum / max(self.samples, 1),
+            "accuracy": float(true_positives.sum() / max(self.samples, 1)),
+            "macro_precision": float(precision.mean()),
+            "macro_recall": float(recall.mean()),
+            "macro_f1": float(f1.mean()),
+            "macro_roc_auc": nan_to_none(np.nanmean(auc)) if np.any(~np.isnan(auc)) else None,
+            "expected_calibration_error": ece,
+            "confusion_matrix": {"labels": self.class_names, "matrix": self.confusion.tolist()},
+            "per_class": {
+                name: {"precision": float(precision[i]), "recall": float(recall[i]), "f1": float(f1[i]),
+                       "support": int(actual[i]), "roc_auc": nan_to_none(auc[i])}
+                for i, name in enumerate(self.class_names)
+            },
+            "calibration": [
+                {"lower": i / self.calibration_bins, "upper": (i + 1) / self.calibration_bins,
+                 "count": int(self.calibration_count[i]), "mean_confidence": float(mean_confidence[i]),
+                 "accuracy": float(bin_accuracy[i])}
+                for i in range(self.calibration_bins)
+            ],
+        }
+
+
+class LatencyRecorder:
+    """
+    Per-batch latency in a fixed log-spaced histogram, so percentiles need
+    constant memory however many batches are recorded.
+
+    Args:
+        min_ms (float): Lower edge of the histogram
+        max_ms (float): Upper edge, slower batches land in the last bin
+        bins (int): Number of log-spaced bins
+    """
+    def __init__(self, min_ms: float = 0.01, max_ms: float = 600_000.0, bins: int = 2048):
+        self.edges = np.geomspace(min_ms, max_ms, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.batches = 0
+        self.items = 0
+        self.total_s = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float, batch_size: int):
+        ms = seconds * 1000.0
+        index = int(np.clip(np.searchsorted(self.edges, ms, side="right") - 1, 0, len(self.counts) - 1))
+        self.counts[index] += 1
+        self.batches += 1
+        self.items += batch_size
+        self.total_s += float(seconds)
+        self.max_ms = max(self.max_ms, float(ms))
+
+    def percentile(self, q: float) -> float:
+        if self.batches == 0:
+            return 0.0
+        index = int(np.searchsorted(self.counts.cumsum(), q / 100.0 * self.batches, side="left"))
+        index = min(index, len(self.counts) - 1)
+        # geometric midpoint of the bin
+        return float(np.sqrt(self.edges[index] * self.edges[index + 1]))
+
+    def result(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_ms": self.total_s * 1000.0 / max(self.batches, 1),
+            "p50_batch_ms": self.percentile(50),
+            "p95_batch_ms": self.percentile(95),
+            "p99_batch_ms": self.percentile(99),
+            "max_batch_ms": self.max_ms,
+            "items_per_sec": self.items / self.total_s if self.total_s > 0 else 0.0,
+        }
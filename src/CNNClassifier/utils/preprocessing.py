@@ -0,0 +1,167 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import io
+from typing import Optional, Sequence, Union
+import numpy as np
+from PIL import Image
+
+PREPROCESSING_MODES = ("rescale", "vgg16")
+RESCALE = np.float32(1. / 255)
+# ImageNet channel means in BGR order, what keras.applications.vgg16.preprocess_input subtracts
+VGG16_MEAN_BGR = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+
+
+def check_mode(mode: str) -> str:
+    if mode not in PREPROCESSING_MODES:
+        raise ValueError(f"Unknown PREPROCESSING {mode!r}, expected one of {PREPROCESSING_MODES}")
+    return mode
+
+
+def load_image(source: Union[str, bytes, io.IOBase], image_size: Sequence[int]) -> np.ndarray:
+    """
+    Decode one image as uint8 RGB at `image_size`, the way keras
+    `load_img(color_mode="rgb", interpolation="bilinear")` does for
+    `flow_from_directory`. Decoding is inherently per file, everything after
+    it should go through the batch functions below.
+
+    Args:
+        source (str, bytes or file object): Path, encoded bytes or an open file
+        image_size (Sequence[int]): (height, width, ...) to resize to
+
+    Returns:
+        np.ndarray: (height, width, 3) uint8
+    """
+    height, width = image_size[:2]
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def to_rgb_batch(batch: np.ndarray) -> np.ndarray:
+    """
+    Grayscale (n, h, w) or (n, h, w, 1) batches become a broadcast view with
+    three channels and RGBA batches a view without alpha, neither copies.
+    """
+    batch = np.asarray(batch)
+    if batch.ndim == 3:
+        batch = batch[..., None]
+    channels = batch.shape[-1]
+    if channels == 3:
+        return batch
+    if channels == 1:
+        return np.broadcast_to(batch, batch.shape[:-1] + (3,))
+    if channels == 4:
+        return batch[..., :3]
+    raise ValueError(f"expected 1, 3 or 4 channels, got a batch of shape {batch.shape}")
+
+
+def resize_batch(batch: np.ndarray, image_size: Sequence[int]) -> np.ndarray:
+    """
+    Bilinear resize of a whole (n, h, w, 3) batch in one TensorFlow op,
+    returned unchanged when it already has the target size.
+
+    Returns:
+        np.ndarray: The input, or a new float32 batch on the 0-255 pixel scale
+    """
+    height, width = image_size[:2]
+    if tuple(batch.shape[1:3]) == (height, width):
+        return batch
+    import tensorflow as tf
+
+    return tf.image.resize(batch, (height, width), method="bilinear").numpy()
+
+
+def normalize_batch(batch: np.ndarray, mode: str = "rescale", out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Pixels (uint8 or float on the 0-255 scale) to model inputs with whole-batch
+    ufuncs, no per-image loop. `rescale` divides by 255, `vgg16` flips RGB to BGR and
+    subtracts the ImageNet mean like `vgg16.preprocess_input`.
+
+    Args:
+        batch (np.ndarray): (n, h, w, 3) RGB batch
+        mode (str): One of PREPROCESSING_MODES
+        out (np.ndarray, optional): float32 destination, may be `batch` itself
+            to normalize a float32 batch in place without allocating
+
+    Returns:
+        np.ndarray: float32 batch of the same shape
+    """
+    if check_mode(mode) == "rescale":
+        return np.multiply(batch, RESCALE, out=out, dtype=np.float32)
+
+    red = batch[..., 0]
+    if out is None:
+        out = np.empty(batch.shape, dtype=np.float32)
+    elif np.shares_memory(out, batch):
+        # in place, channel 0 is overwritten before it is read
+        red = red.copy()
+    # one strided pass per channel folds the RGB -> BGR flip into the subtraction, about twice
+    # as fast as subtracting through a reversed [..., ::-1] view
+    for channel, source in enumerate((batch[..., 2], batch[..., 1], red)):
+        np.subtract(source, VGG16_MEAN_BGR[channel], out=out[..., channel], dtype=np.float32)
+    return out
+
+
+def normalize_tensor(images, mode: str = "rescale"):
+    """`normalize_batch` for tf.data pipelines and other graph code."""
+    import tensorflow as tf
+
+    images = tf.cast(images, tf.float32)
+    if check_mode(mode) == "rescale":
+        return images * RESCALE
+    return tf.reverse(images, axis=[-1]) - VGG16_MEAN_BGR
+
+
+# model inputs as an affine map of RGB pixels on the 0-255 scale, inputs = pixels @ matrix + bias:
+# the PREPROCESSING modes plus the conventions of the keras.applications backbones
+INPUT_CONVENTIONS = {
+    "rescale": (np.eye(3, dtype=np.float32) * RESCALE, np.zeros(3, dtype=np.float32)),
+    # "caffe": RGB -> BGR, then minus the ImageNet mean (VGG16, ResNet50)
+    "vgg16": (np.eye(3, dtype=np.float32)[::-1].copy(), -VGG16_MEAN_BGR),
+    # "tf": scaled to [-1, 1] (MobileNetV2)
+    "tf": (np.eye(3, dtype=np.float32) / np.float32(127.5), -np.ones(3, dtype=np.float32)),
+    # 0-255 RGB, for backbones that normalize inside the model (MobileNetV3, EfficientNet)
+    "raw": (np.eye(3, dtype=np.float32), np.zeros(3, dtype=np.float32)),
+}
+INPUT_CONVENTIONS["caffe"] = INPUT_CONVENTIONS["vgg16"]
+
+
+def input_adapter(source: str, target: str):
+    """
+    Per-pixel affine map turning inputs normalized the `source` way into
+    inputs normalized the `target` way, e.g. the PREPROCESSING mode of the
+    input pipeline into what a pretrained backbone was trained on.
+
+    Returns:
+        tuple: (3x3 matrix, bias) with target = source_inputs @ matrix + bias,
+            or None when the two conventions agree
+    """
+    source_matrix, source_bias = INPUT_CONVENTIONS[source]
+    target_matrix, target_bias = INPUT_CONVENTIONS[target]
+    # pixels = (inputs - source_bias) @ inv(source_matrix)
+    matrix = np.linalg.inv(source_matrix.astype(np.float64)) @ target_matrix
+    bias = target_bias - source_bias @ matrix
+    if np.allclose(matrix, np.eye(3)) and np.allclose(bias, 0.0):
+        return None
+    return matrix.astype(np.float32), bias.astype(np.float32)
+
+
+def preprocess_batch(batch: np.ndarray, image_size: Sequence[int], mode: str = "rescale") -> np.ndarray:
+    """
+    RGB conversion, resize and normalization of a stacked batch, e.g. the
+    micro-batch assembled by the serving batcher.
+
+    Returns:
+        np.ndarray: (n, height, width, 3) float32 model inputs
+    """
+    rgb = to_rgb_batch(batch)
+    resized = resize_batch(rgb, image_size)
+    # a resize already allocated a float32 batch that nobody else sees, reuse it
+    out = resized if resized is not rgb else None
+    return normalize_batch(resized, mode, out=out)
@@ -1,28 +1,30 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
-import yaml
 from src.CNNClassifier import logger
 import json
 from typing import Any
-import joblib
 from pathlib import Path
 from ensure import ensure_annotations
-from src.CNNClassifier.utils.box_manual import Box
+from src.CNNClassifier.config.loader import ConfigNode, read_yaml_file
 
 @ensure_annotations
-def read_yaml(path_to_yaml: Path) -> Box:
-    with open(path_to_yaml) as yaml_file:
-        content = yaml.safe_load(yaml_file)
-        return Box(content)
+def read_yaml(path_to_yaml: Path) -> ConfigNode:
+    _, content = read_yaml_file(path_to_yaml)
+    return ConfigNode(content)
 
 @ensure_annotations
-def save_json():
-    pass
+def save_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+    logger.info(f"json file saved at: {path}")
 
 @ensure_annotations
-def load_json():
-    pass
+def load_json(path: Path) -> ConfigNode:
+    with open(path) as f:
+        content = json.load(f)
+    return ConfigNode(content)
 
 @ensure_annotations
 def save_model():
@@ -0,0 +1,179 @@
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zipfile import ZipFile
+
+import pytest
+
+from src.CNNClassifier.components import stage_01_data_ingestion
+from src.CNNClassifier.components.stage_01_data_ingestion import MANIFEST_FILE, DataIngestion
+from src.CNNClassifier.entity import DataIngestionConfig
+
+
+class StandIn:
+    """Local HTTP stand-in for the dataset host: honours Range and can drop or refuse requests."""
+
+    def __init__(self, blob: bytes, drop_first: int = 0, fail_status: int = 0):
+        self.blob = blob
+        self.drop_first = drop_first
+        self.fail_status = fail_status
+        self.ranges = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stand_in.ranges.append(self.headers.get("Range"))
+                if stand_in.fail_status:
+                    self.send_error(stand_in.fail_status)
+                    return
+                start = 0
+                match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    if start >= len(stand_in.blob):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(stand_in.blob)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(stand_in.blob) - 1}/{len(stand_in.blob)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(stand_in.blob) - start))
+                self.end_headers()
+                end = len(stand_in.blob)
+                if stand_in.drop_first:
+                    # promise the whole file, send half, hang up
+                    stand_in.drop_first -= 1
+                    end = start + (end - start) // 2
+                self.wfile.write(stand_in.blob[start:end])
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data.zip"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "source.zip"
+    with ZipFile(path, "w") as zf:
+        for i in range(40):
+            zf.writestr(f"PetImages/{'Cat' if i % 2 else 'Dog'}/{i}.jpg", bytes([i]) * 5000)
+        zf.writestr("PetImages/Cat/Thumbs.db", b"not an image")
+    return path.read_bytes()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(stage_01_data_ingestion.time, "sleep", lambda seconds: None)
+
+
+def make_ingestion(tmp_path, url, sha256="", max_retries=3):
+    return DataIngestion(DataIngestionConfig(
+        root_dir=tmp_path / "ingestion",
+        source_url=url,
+        local_data_file=tmp_path / "ingestion" / "data.zip",
+        unzip_dir=tmp_path / "ingestion",
+        source_sha256=sha256,
+        num_workers=2,
+        max_retries=max_retries
+    ))
+
+
+def test_interrupted_download_resumes_with_a_range_request(tmp_path, archive):
+    with StandIn(archive, drop_first=1) as stand_in:
+        ingestion = make_ingestion(tmp_path, stand_in.url, hashlib.sha256(archive).hexdigest())
+        ingestion.download_file()
+
+    assert (tmp_path / "ingestion" / "data.zip").read_bytes() == archive
+    assert not ingestion.partial_file_path.exists()
+    assert stand_in.ranges == [None, f"bytes={len(archive) // 2}-"]
+
+
+def test_failing_download_is_retried_max_retries_times(tmp_path, archive):
+    with StandIn(archive, fail_status=503) as stand_in:
+        ingestion = make_ingestion(tmp_path, stand_in.url, max_retries=3)
+        with pytest.raises(stage_01_data_ingestion.URLError):
+            ingestion.download_file()
+
+    assert len(stand_in.ranges) == 3
+    assert not (tmp_path / "ingestion" / "data.zip").exists()
+
+
+def test_sha256_mismatch_discards_the_download(tmp_path, archive):
+    with StandIn(archive) as stand_in:
+        ingestion = make_ingestion(tmp_path, stand_in.url, sha256="0" * 64)
+        with pytest.raises(ValueError, match="sha256 mismatch"):
+            ingestion.download_file()
+
+    assert not ingestion.partial_file_path.exists()
+    assert not (tmp_path / "ingestion" / "data.zip").exists()
+
+
+def test_complete_partial_file_is_finished_on_416(tmp_path, archive):
+    with StandIn(archive) as stand_in:
+        ingestion = make_ingestion(tmp_path, stand_in.url, hashlib.sha256(archive).hexdigest())
+        # a run that died between the last byte and the rename
+        ingestion.partial_file_path.parent.mkdir(parents=True)
+        ingestion.partial_file_path.write_bytes(archive)
+        ingestion.download_file()
+
+    assert stand_in.ranges == [f"bytes={len(archive)}-"]
+    assert (tmp_path / "ingestion" / "data.zip").read_bytes() == archive
+    assert not ingestion.partial_file_path.exists()
+
+
+def test_oversized_partial_file_restarts_on_416(tmp_path, archive):
+    with StandIn(archive) as stand_in:
+        ingestion = make_ingestion(tmp_path, stand_in.url)
+        ingestion.partial_file_path.parent.mkdir(parents=True)
+        ingestion.partial_file_path.write_bytes(archive + b"garbage")
+        ingestion.download_file()
+
+    assert stand_in.ranges == [f"bytes={len(archive) + 7}-", None]
+    assert (tmp_path / "ingestion" / "data.zip").read_bytes() == archive
+
+
+def test_second_pass_skips_download_and_extraction(tmp_path, archive, monkeypatch):
+    with StandIn(archive) as stand_in:
+        ingestion = make_ingestion(tmp_path, stand_in.url, hashlib.sha256(archive).hexdigest())
+        ingestion.download_file()
+        ingestion.unzip_and_clean()
+
+        extracted = sorted(path.name for path in (tmp_path / "ingestion" / "PetImages").rglob("*.jpg"))
+        assert len(extracted) == 40
+        assert (tmp_path / "ingestion" / MANIFEST_FILE).exists()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("extraction ran although the manifest is unchanged")
+
+        monkeypatch.setattr(stage_01_data_ingestion, "ProcessPoolExecutor", fail)
+        ingestion.download_file()
+        ingestion.unzip_and_clean()
+
+    assert stand_in.ranges == [None]
+
+
+def test_changed_archive_is_extracted_again(tmp_path, archive):
+    with StandIn(archive) as stand_in:
+        ingestion = make_ingestion(tmp_path, stand_in.url)
+        ingestion.download_file()
+        ingestion.unzip_and_clean()
+
+    with ZipFile(tmp_path / "ingestion" / "data.zip", "a") as zf:
+        zf.writestr("PetImages/Dog/extra.jpg", b"\xff" * 5000)
+    ingestion.unzip_and_clean()
+
+    assert (tmp_path / "ingestion" / "PetImages" / "Dog" / "extra.jpg").exists()
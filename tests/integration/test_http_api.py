@@ -0,0 +1,101 @@
+import asyncio
+import dataclasses
+import io
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+from src.CNNClassifier.entity import ServingConfig
+from src.CNNClassifier.serving.http_api import InferenceAPI
+
+
+@pytest.fixture
+def config(tmp_path):
+    inputs = tf.keras.Input((32, 32, 3))
+    outputs = tf.keras.layers.Dense(2, activation="softmax")(tf.keras.layers.GlobalAveragePooling2D()(inputs))
+    model_path = tmp_path / "model.h5"
+    tf.keras.Model(inputs, outputs).save(model_path)
+    return ServingConfig(
+        model_path=model_path,
+        warmup_batch_sizes=[1],
+        warmup_runs=1,
+        params_image_size=[32, 32, 3],
+        params_preprocessing="rescale",
+        max_batch_size=4,
+        max_wait_ms=1,
+        max_queue_size=16,
+        request_timeout_s=30,
+        prediction_cache_path=tmp_path / "prediction_cache.sqlite",
+        prediction_cache_memory_mb=1,
+        prediction_cache_max_rows=100,
+        class_names=["Cat", "Dog"],
+        host="127.0.0.1",
+        port=0,
+        decode_workers=2,
+        max_in_flight=16,
+        max_request_images=4,
+        max_request_mb=1,
+        tta_variants=["identity"],
+        tta_crop_fraction=0.875,
+        tta_max_variants=0,
+        ensemble_members=[model_path],
+        ensemble_max_members=0,
+        ensemble_reduce="mean",
+        ensemble_max_rows=16
+    )
+
+
+def jpeg(seed: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.default_rng(seed).integers(0, 256, (40, 40, 3), dtype=np.uint8)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def serve(api, scenario):
+    async def main():
+        async with TestClient(TestServer(api.app())) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_prediction_and_health(config):
+    async def scenario(client):
+        response = await client.post("/predict", data=jpeg(0))
+        body = await response.json()
+        assert response.status == 200, body
+        assert body["predictions"][0]["label"] in ("Cat", "Dog")
+        assert body["predictions"][0]["cache"] == "miss"
+
+        again = await (await client.post("/predict", data=jpeg(0))).json()
+        assert again["predictions"][0]["cache"] == "memory"
+        assert (await client.get("/healthz")).status == 200
+
+    serve(InferenceAPI(config), scenario)
+
+
+def test_timed_out_request_leaves_the_replica_serving(config):
+    api = InferenceAPI(dataclasses.replace(config, request_timeout_s=0.001))
+
+    async def scenario(client):
+        response = await client.post("/predict", data=jpeg(1), headers={"Cache-Control": "no-cache"})
+        assert response.status == 504, await response.text()
+
+        api.config = dataclasses.replace(api.config, request_timeout_s=30)
+        # the batcher's worker outlived the cancelled request
+        await asyncio.sleep(0.2)
+        assert (await client.get("/healthz")).status == 200
+        response = await client.post("/predict", data=jpeg(2), headers={"Cache-Control": "no-cache"})
+        assert response.status == 200, await response.text()
+        assert api.predictor._worker.is_alive()
+
+    serve(api, scenario)
+
+
+def test_empty_body_is_a_bad_request(config):
+    async def scenario(client):
+        assert (await client.post("/predict", data=b"")).status == 400
+
+    serve(InferenceAPI(config), scenario)
@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[2]
+PIPELINE_DIR = ROOT / "src" / "CNNClassifier" / "pipeline"
+
+# small enough to train on CPU in seconds, the backbone without pretrained weights
+PARAMS = {
+    "IMAGE_SIZE": "[32, 32, 3]",
+    "WEIGHTS": "null",
+    "BATCH_SIZE": "4",
+    "EPOCHS": "1",
+    "AUGMENTATION": "false",
+    "INPUT_PIPELINE": "directory",
+    "TRAINING_MODE": "full",
+    "INSTRUMENTATION": "false",
+    "CHECKPOINT_EVERY_STEPS": "0",
+    "SPLIT_VALIDATION": "0.2",
+    "SPLIT_TEST": "0.1",
+}
+
+
+def run(script, cwd, env, *args, timeout=300):
+    return subprocess.run([sys.executable, str(PIPELINE_DIR / script), *args], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=timeout)
+
+
+@pytest.fixture
+def project(tmp_path):
+    """A working directory with the repo's config files, a tiny generated dataset and its split and base model."""
+    shutil.copytree(ROOT / "configs", tmp_path / "configs")
+    shutil.copy(ROOT / "params.yaml", tmp_path / "params.yaml")
+    rng = np.random.default_rng(0)
+    for class_name in ("Cat", "Dog"):
+        directory = tmp_path / "artifacts" / "data_ingestion" / "PetImages" / class_name
+        directory.mkdir(parents=True)
+        for i in range(24):
+            pixels = rng.integers(0, 256, (40, 40, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(directory / f"{i}.jpg")
+
+    env = dict(os.environ, **{f"CNNCLASSIFIER_PARAMS__{key}": value for key, value in PARAMS.items()})
+    env.pop("TF_CONFIG", None)
+    for stage in ("stage_06_validate_images.py", "stage_09_split_dataset.py", "stage_02_base_model.py"):
+        result = run(stage, tmp_path, env)
+        assert result.returncode == 0, result.stdout + result.stderr
+    return tmp_path, env
+
+
+def test_two_local_workers_train_and_the_chief_saves_the_model(project):
+    cwd, env = project
+    result = run("launch_local_workers.py", cwd, env, "--num-workers", "2", "--threads-per-worker", "1", timeout=600)
+
+    output = result.stdout + result.stderr
+    # the launcher exits 0 only once every worker has, else with the first failing worker's code
+    assert result.returncode == 0, output
+    assert "all 2 workers finished" in output
+    assert "worker 0 of 2" in output and "worker 1 of 2" in output
+    assert (cwd / "artifacts" / "training" / "model.h5").stat().st_size > 0
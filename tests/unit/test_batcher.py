@@ -0,0 +1,132 @@
+import asyncio
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.CNNClassifier.serving.batcher import BatchingPredictor
+
+
+class Model:
+    """predict_fn that records every batch and can be held inside the forward pass."""
+
+    def __init__(self, delay: float = 0.0, rows=None):
+        self.delay = delay
+        self.rows = rows
+        self.batch_sizes = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, batch):
+        self.batch_sizes.append(len(batch))
+        self.entered.set()
+        self.release.wait(5)
+        time.sleep(self.delay)
+        return batch.sum(axis=1, keepdims=True)[:self.rows]
+
+
+@pytest.fixture
+def make_predictor():
+    predictors = []
+
+    def make(model, **kwargs):
+        kwargs.setdefault("input_shape", (2,))
+        predictor = BatchingPredictor(model, **kwargs).start()
+        predictors.append(predictor)
+        return predictor
+
+    yield make
+    for predictor in predictors:
+        predictor.stop(timeout=5)
+
+
+def hold(model):
+    model.entered.clear()
+    model.release.clear()
+
+
+def test_concurrent_requests_are_batched_up_to_max_batch_size(make_predictor):
+    model = Model()
+    predictor = make_predictor(model, max_batch_size=4, max_wait_ms=1000)
+    futures = [predictor.submit(np.array([i, 1.0])) for i in range(8)]
+
+    assert [float(future.result(timeout=5)[0]) for future in futures] == [i + 1.0 for i in range(8)]
+    assert model.batch_sizes == [4, 4]
+    assert predictor.stats.snapshot()["requests"] == 8
+
+
+def test_lone_request_waits_at_most_max_wait(make_predictor):
+    model = Model()
+    predictor = make_predictor(model, max_batch_size=32, max_wait_ms=50)
+    started = time.perf_counter()
+    predictor.predict(np.ones(2), timeout=5)
+
+    assert 0.04 <= time.perf_counter() - started < 1.0
+    assert model.batch_sizes == [1]
+
+
+def test_input_of_another_shape_or_dtype_is_rejected(make_predictor):
+    predictor = make_predictor(Model())
+    with pytest.raises(ValueError, match="shape"):
+        predictor.submit(np.ones(3))
+    with pytest.raises(ValueError, match="numeric"):
+        predictor.submit(np.array(["a", "b"]))
+
+    assert predictor.stats.snapshot()["rejected"] == 2
+    assert predictor.predict(np.ones(2), timeout=5)[0] == 2.0
+
+
+def test_full_queue_rejects_the_request(make_predictor):
+    model = Model()
+    predictor = make_predictor(model, max_wait_ms=0, max_queue_size=1)
+    hold(model)
+    first = predictor.submit(np.ones(2))
+    assert model.entered.wait(5)
+    queued = predictor.submit(np.ones(2))
+    with pytest.raises(queue.Full):
+        predictor.submit(np.ones(2))
+    model.release.set()
+
+    assert first.result(timeout=5)[0] == queued.result(timeout=5)[0] == 2.0
+    assert predictor.stats.snapshot()["rejected"] == 1
+
+
+def test_cancelled_request_is_skipped(make_predictor):
+    model = Model()
+    predictor = make_predictor(model, max_wait_ms=0)
+    hold(model)
+    first = predictor.submit(np.ones(2))
+    assert model.entered.wait(5)
+    cancelled = predictor.submit(np.full(2, 5.0))
+    assert cancelled.cancel()
+    model.release.set()
+
+    assert first.result(timeout=5)[0] == 2.0
+    assert predictor.predict(np.full(2, 3.0), timeout=5)[0] == 6.0
+    assert model.batch_sizes == [1, 1]
+
+
+def test_caller_timing_out_during_the_forward_pass_leaves_the_worker_running(make_predictor):
+    predictor = make_predictor(Model(delay=0.3), max_wait_ms=0)
+
+    async def call():
+        return await asyncio.wait_for(asyncio.wrap_future(predictor.submit(np.ones(2))), timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call())
+    assert predictor.predict(np.ones(2), timeout=5)[0] == 2.0
+    assert predictor._worker.is_alive()
+
+
+def test_row_count_mismatch_fails_the_whole_batch(make_predictor):
+    predictor = make_predictor(Model(rows=1), max_batch_size=2, max_wait_ms=1000)
+    futures = [predictor.submit(np.ones(2)) for _ in range(2)]
+
+    for future in futures:
+        with pytest.raises(ValueError, match="one row per request"):
+            future.result(timeout=5)
+    assert predictor.stats.snapshot()["errors"] == 2
+    assert predictor._worker.is_alive()
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+
+from src.CNNClassifier.config import ConfigurationManager
+from src.CNNClassifier.config.loader import ConfigError, env_overrides, load_config, parse_overrides, read_yaml_file
+from src.CNNClassifier.constants import CONFIG_FILE_PATH, PARAMS_FILE_PATH
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1e-3", 0.001),
+    ("-2.5E+2", -250.0),
+    ("1_000e-3", 1.0),
+    ("0.01", 0.01),
+    ("12", 12),
+    ("[1e-4, 3]", [0.0001, 3]),
+    ("1e", "1e"),
+    ("e5", "e5"),
+])
+def test_override_values_keep_their_yaml_types(text, expected):
+    assert parse_overrides([f"params.LEARNING_RATE={text}"]) == {"params.LEARNING_RATE": expected}
+
+
+def test_exponent_learning_rate_from_the_environment_validates(monkeypatch):
+    monkeypatch.setenv("CNNCLASSIFIER_PARAMS__LEARNING_RATE", "1e-3")
+    assert env_overrides() == {"params.LEARNING_RATE": 0.001}
+
+    _, params = load_config(CONFIG_FILE_PATH, PARAMS_FILE_PATH)
+    assert params.LEARNING_RATE == 0.001
+
+
+def test_exponent_in_params_file_is_a_float(tmp_path):
+    path = tmp_path / "params.yaml"
+    path.write_text("LEARNING_RATE: 5e-4\nNAME: 1e\n")
+    _, parsed = read_yaml_file(path)
+    assert parsed == {"LEARNING_RATE": 0.0005, "NAME": "1e"}
+
+
+def test_non_numeric_learning_rate_is_still_rejected():
+    with pytest.raises(ConfigError, match="LEARNING_RATE must be"):
+        load_config(CONFIG_FILE_PATH, PARAMS_FILE_PATH, overrides={"params.LEARNING_RATE": "fast"})
+
+
+def test_evaluation_follows_overridden_model_and_data_paths(monkeypatch):
+    monkeypatch.setenv("CNNCLASSIFIER_CONFIG__data_ingestion__unzip_dir", "elsewhere/data")
+    manager = ConfigurationManager(overrides={"config.training.trained_model_path": "elsewhere/model.h5"})
+    evaluation = manager.get_validation_config()
+
+    assert evaluation.path_of_model == Path("elsewhere/model.h5")
+    assert evaluation.training_data == Path("elsewhere/data/PetImages")
@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from src.CNNClassifier.components.distributed import check_resume_position, shard_indices
+
+
+class ThreadCluster:
+    """Stand-in for the MEAN all-reduce of MultiWorkerMirroredStrategy across threads, one per worker."""
+
+    def __init__(self, num_workers: int):
+        self.barrier = threading.Barrier(num_workers)
+        self.values = [None] * num_workers
+        self.local = threading.local()
+
+    def reduce(self, op, value, axis):
+        assert op == tf.distribute.ReduceOp.MEAN and axis is None
+        self.values[self.local.index] = float(value)
+        self.barrier.wait()
+        mean = sum(self.values) / len(self.values)
+        self.barrier.wait()
+        return tf.constant(mean, tf.float64)
+
+    def run(self, start_steps):
+        errors = [None] * len(start_steps)
+
+        def worker(index):
+            self.local.index = index
+            try:
+                check_resume_position(self, start_steps[index])
+            except RuntimeError as e:
+                errors[index] = e
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(start_steps))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        return errors
+
+
+def test_single_worker_keeps_every_index():
+    indices = np.arange(7)
+    np.testing.assert_array_equal(shard_indices(indices, 1, 0), indices)
+
+
+def test_shards_are_disjoint_equal_sized_and_drop_the_remainder():
+    indices = np.arange(100, 111)
+    shards = [shard_indices(indices, 3, worker) for worker in range(3)]
+
+    assert [len(shard) for shard in shards] == [3, 3, 3]
+    combined = np.concatenate(shards)
+    assert len(set(combined.tolist())) == 9
+    np.testing.assert_array_equal(np.sort(combined), indices[:9])
+
+
+def test_shards_keep_the_class_balance_of_sorted_indices():
+    labels = np.array([0] * 8 + [1] * 8)
+    for worker in range(4):
+        shard = shard_indices(np.arange(16), 4, worker)
+        assert np.bincount(labels[shard]).tolist() == [2, 2]
+
+
+def test_matching_resume_positions_pass():
+    assert ThreadCluster(3).run([40, 40, 40]) == [None, None, None]
+
+
+def test_fresh_start_on_every_worker_passes():
+    assert ThreadCluster(2).run([0, 0]) == [None, None]
+
+
+def test_diverging_resume_positions_fail_on_every_worker():
+    errors = ThreadCluster(2).run([0, 40])
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert "resumes at step 0" in str(errors[0])
+    assert "shared by all workers" in str(errors[1])
+
+
+def test_default_strategy_passes():
+    check_resume_position(tf.distribute.get_strategy(), 12)
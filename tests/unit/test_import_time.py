@@ -0,0 +1,23 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# the budgets and the `-X importtime` parsing live with the benchmark, the CLI that also reports timings
+_spec = importlib.util.spec_from_file_location("import_time", ROOT / "benchmarks" / "import_time.py")
+import_time = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(import_time)
+
+TF_FREE = [name for name, (_, heavy_allowed) in import_time.BUDGETS.items() if not heavy_allowed]
+
+
+@pytest.mark.parametrize("name", TF_FREE)
+def test_tf_free_entry_point_does_not_import_tensorflow(name):
+    script = import_time.PIPELINE_DIR / name
+    source = import_time.entry_point_imports(script) if script.suffix == ".py" else f"import {name}"
+    _, packages = import_time.measure(source)
+
+    heavy = sorted(packages & set(import_time.HEAVY_MODULES))
+    assert not heavy, f"{name} imports {', '.join(heavy)} at start-up"
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from src.CNNClassifier.components.input_pipeline import ArraySequence, sequence_to_dataset
+
+
+def make_sequence(samples, batch_size, drop_remainder=True):
+    features = np.arange(samples * 2, dtype=np.float32).reshape(samples, 2)
+    return ArraySequence(features, np.arange(samples) % 2, np.arange(samples), num_classes=2,
+                         batch_size=batch_size, drop_remainder=drop_remainder)
+
+
+def test_each_pass_takes_steps_per_pass_full_batches():
+    sequence = make_sequence(10, 4, drop_remainder=False)
+    batches = list(sequence_to_dataset(sequence, repeat=True, steps_per_pass=2).take(4).as_numpy_iterator())
+
+    assert [len(images) for images, _ in batches] == [4, 4, 4, 4]
+    np.testing.assert_array_equal(batches[2][0], batches[0][0])
+
+
+def test_resumed_stream_continues_where_it_left_off():
+    fresh = list(sequence_to_dataset(make_sequence(12, 4), repeat=True).take(5).as_numpy_iterator())
+    resumed = list(sequence_to_dataset(make_sequence(12, 4), repeat=True, start_step=4).take(1).as_numpy_iterator())
+
+    np.testing.assert_array_equal(resumed[0][0], fresh[4][0])
+
+
+def test_subset_smaller_than_one_batch_names_the_sizes():
+    with pytest.raises(ValueError, match="subset of 34 images .* BATCH_SIZE 64"):
+        sequence_to_dataset(make_sequence(34, 64), repeat=True, steps_per_pass=34 // 64)
@@ -0,0 +1,46 @@
+import pytest
+
+from src.CNNClassifier.components.sweep import expand_search_space
+
+
+def test_grid_is_every_combination():
+    trials = expand_search_space({"BATCH_SIZE": [16, 32], "AUGMENTATION": [False, True]}, "grid", 0, 0)
+
+    assert trials == [
+        {"BATCH_SIZE": 16, "AUGMENTATION": False}, {"BATCH_SIZE": 16, "AUGMENTATION": True},
+        {"BATCH_SIZE": 32, "AUGMENTATION": False}, {"BATCH_SIZE": 32, "AUGMENTATION": True},
+    ]
+
+
+def test_random_ranges_of_integer_params_are_sampled_as_integers():
+    space = {
+        "LEARNING_RATE": {"low": 1e-4, "high": 1e-1, "log": True},
+        "BATCH_SIZE": {"low": 8, "high": 64, "log": True},
+        "EPOCHS": {"low": 1, "high": 5},
+    }
+    trials = expand_search_space(space, "random", 50, seed=7)
+
+    assert len(trials) == 50
+    for trial in trials:
+        assert 1e-4 <= trial["LEARNING_RATE"] <= 1e-1
+        assert type(trial["BATCH_SIZE"]) is int and 8 <= trial["BATCH_SIZE"] <= 64
+        assert type(trial["EPOCHS"]) is int and 1 <= trial["EPOCHS"] <= 5
+    assert trials == expand_search_space(space, "random", 50, seed=7)
+
+
+@pytest.mark.parametrize("space", [
+    {"EPOCHS": {"low": 1.5, "high": 4}},
+    {"BATCH_SIZE": [16, 24.5]},
+    {"AUGMENTATION": {"low": 0, "high": 1}},
+    {"LEARNING_RATE": {"low": 0.1, "high": 0.01}},
+    {"LEARNING_RATE": {"low": 0, "high": 0.1, "log": True}},
+    {"DROPOUT": [0.1, 0.2]},
+])
+def test_invalid_spaces_are_rejected(space):
+    with pytest.raises(ValueError):
+        expand_search_space(space, "random", 4, 0)
+
+
+def test_no_trials():
+    assert expand_search_space({"EPOCHS": [1]}, "random", 0, 0) == []
+    assert expand_search_space({"EPOCHS": []}, "grid", 0, 0) == []